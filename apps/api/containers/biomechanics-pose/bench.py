@@ -0,0 +1,827 @@
+"""
+Benchmark local do extrator de pose, sem R2 nem Worker.
+
+    python bench.py decoders clip.mp4 [--max-long-edge 640] [--runs 3]
+    python bench.py jobs [--fps 30,60,120] [--resolutions 720p,1080p,4k] [--clip real.mp4] --output atual.json
+    python bench.py roi [clip.mp4] [--runs 3]
+    python bench.py segments [clip.mp4] [--segments 4]
+    python bench.py load [--rates 2,4,6,8] [--duration 300] [--clip real.mp4] --output carga.json
+    python bench.py compare anterior.json atual.json
+
+`decoders` roda `extract_landmarks` no mesmo clipe com cada decoder e mostra
+quanto do tempo foi decodificação e quanto foi modelo — os mesmos números do
+bloco `timings` que o job devolve. O desvio de landmark contra o decoder
+OpenCV em resolução original fica junto, porque reduzir a entrada só vale se
+o número clínico não mudar.
+
+`roi` compara o quadro inteiro com o recorte em volta da pessoa
+(`POSE_ROI=person`): vazão, tempo de modelo por quadro e desvio dos landmarks
+contra o quadro inteiro. Sem clipe, monta um com a ilustração de agachamento
+do app andando num fundo 1080p — alguém em quadro é o que o modo precisa.
+
+`segments` extrai o mesmo clipe corrido e em partes paralelas
+(`POSE_SEGMENTS`), as duas no pool de processos: parede, aceleração, se `i` e
+`t` batem quadro a quadro e o desvio dos landmarks — no total e logo depois de
+cada fronteira, onde o rastreamento recomeçou. Sem clipe, gera um de 60 s com
+a mesma ilustração.
+
+`load` responde quantos jobs por minuto um container aguenta: sobe o
+`server.py` de verdade num processo à parte, com as `POSE_*` do ambiente, e
+dispara POST /analyze em chegadas de Poisson (semente fixa, reprodutível) a
+cada taxa de `--rates`, em jobs/min, por `--duration` s; entre uma taxa e a
+seguinte espera os callbacks pendentes. Por taxa: vazão, espera na fila
+(início do primeiro span do trace, que conta da chegada do job), latência
+ponta a ponta até o callback, recusas (429/503), falhas e o RSS do servidor
+somado ao dos filhos. A taxa é sustentada sem recusa, falha nem timeout, com o p95 da
+espera abaixo de `--max-wait` e sem a espera dobrar do primeiro para o último
+terço da fase. Uma taxa só com `--duration` longo é o soak: o relatório traz
+as amostras de RSS e a inclinação em MB/h — com várias taxas, a de cada fase
+é a que vale, porque o RSS acompanha a carga.
+
+`jobs` mede o caminho inteiro de um job: POST /analyze no servidor de verdade,
+vídeo servido por HTTP com Range, PUT e callback capturados por um dublê local
+do R2 e do Worker. Cada configuração roda num processo novo — o pico de RSS só
+sobe, e herdado da configuração anterior não diria nada. Os clipes sintéticos
+(`testsrc2`) não têm ninguém em quadro, então o modelo fica no detector e não
+no rastreamento: servem para comparar commits, não para prever a vazão com
+paciente. Para isso, `--clip` acrescenta vídeos reais. As variáveis
+`POSE_*` do ambiente valem como no container.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+import server
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+
+
+def read_frames(frames_path: str) -> list[dict]:
+    with open(frames_path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def run_extraction(
+    clip: str, meta: dict, decoder: str, max_long_edge: int, roi: str = "off",
+) -> tuple[list[dict], dict, float]:
+    server.DECODER = decoder
+    server.MAX_LONG_EDGE = max_long_edge
+    server.ROI_MODE = roi
+    with tempfile.TemporaryDirectory() as workdir:
+        frames_path = os.path.join(workdir, "frames.ndjson")
+        started = time.perf_counter()
+        extraction = server.extract_landmarks(clip, meta, frames_path)
+        wall = time.perf_counter() - started
+        return read_frames(frames_path), extraction, wall
+
+
+def landmark_deviation(reference: list[dict], frames: list[dict]) -> dict:
+    """Diferença média e máxima em x/y normalizados, só onde ambos detectaram."""
+    deltas = []
+    for ref, frame in zip(reference, frames):
+        if ref["c"] <= 0 or frame["c"] <= 0:
+            continue
+        a = np.asarray(ref["k"]).reshape(-1, 4)[:, :2]
+        b = np.asarray(frame["k"]).reshape(-1, 4)[:, :2]
+        deltas.append(np.abs(a - b))
+    if not deltas:
+        return {"comparedFrames": 0}
+    stacked = np.concatenate(deltas)
+    return {
+        "comparedFrames": len(deltas),
+        "meanAbs": round(float(stacked.mean()), 5),
+        "maxAbs": round(float(stacked.max()), 5),
+    }
+
+
+def bench_decoders(args: argparse.Namespace) -> dict:
+    meta = server.probe_video(args.clip)
+    variants = [("opencv", 0), ("ffmpeg", 0)]
+    if args.max_long_edge:
+        variants.append(("ffmpeg", args.max_long_edge))
+
+    reference = None
+    report = {"clip": args.clip, "meta": meta, "variants": []}
+    for decoder, max_long_edge in variants:
+        walls, decode, inference = [], [], []
+        for _ in range(args.runs):
+            frames, extraction, wall = run_extraction(args.clip, meta, decoder, max_long_edge)
+            walls.append(wall)
+            decode.append(extraction["timings"]["decodeMs"])
+            inference.append(extraction["timings"]["inferenceMs"])
+        if reference is None:
+            reference = frames
+
+        row = {
+            "decoder": decoder,
+            "maxLongEdge": max_long_edge,
+            "frames": len(frames),
+            "wallS": round(statistics.median(walls), 3),
+            "framesPerS": round(len(frames) / statistics.median(walls), 2),
+            "decodeMs": statistics.median(decode),
+            "decodeMsPerFrame": round(statistics.median(decode) / max(1, len(frames)), 2),
+            "inferenceMs": statistics.median(inference),
+            "deviation": landmark_deviation(reference, frames),
+        }
+        report["variants"].append(row)
+        print(
+            f"{decoder:>7} {max_long_edge or 'orig':>5}  {row['framesPerS']:>7} q/s  "
+            f"decode {row['decodeMsPerFrame']:>6} ms/q  desvio {row['deviation'].get('meanAbs', '-')}"
+        )
+    return report
+
+
+PERSON_IMAGE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "..", "src", "assets", "images", "exercises", "squat.png",
+)
+
+
+def person_clip(clips_dir: str, seconds: float) -> str:
+    """Clipe 1080p com uma pessoa que anda pelo quadro e sobe e desce."""
+    path = os.path.join(clips_dir, f"person-{seconds:g}s.mp4")
+    if not os.path.exists(path):
+        subprocess.run(
+            [
+                "ffmpeg", "-v", "error", "-y",
+                "-f", "lavfi", "-i", f"color=c=0x7f8c8d:size=1920x1080:rate=30:duration={seconds}",
+                "-loop", "1", "-i", PERSON_IMAGE,
+                "-filter_complex",
+                "[1]scale=-1:720[p];[0][p]overlay=x='300+400*(1-cos(t*0.6))':y='200+40*sin(t*2)':shortest=1",
+                "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                path + ".tmp.mp4",
+            ],
+            check=True,
+        )
+        os.replace(path + ".tmp.mp4", path)
+    return path
+
+
+def bench_roi(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as scratch:
+        clip = args.clip or person_clip(args.clips_dir or scratch, args.seconds)
+        meta = server.probe_video(clip)
+        report = {"clip": args.clip or "person (sintético)", "meta": meta, "modes": []}
+        reference, baseline = None, None
+        for mode in ("off", "person"):
+            walls, inference = [], []
+            for _ in range(args.runs):
+                frames, extraction, wall = run_extraction(clip, meta, server.DECODER, server.MAX_LONG_EDGE, mode)
+                walls.append(wall)
+                inference.append(extraction["timings"]["inferenceMs"])
+            if reference is None:
+                reference, baseline = frames, statistics.median(walls)
+
+            row = {
+                "roi": mode,
+                "frames": len(frames),
+                "usableFrames": extraction["usableFrames"],
+                "wallS": round(statistics.median(walls), 3),
+                "framesPerS": round(len(frames) / statistics.median(walls), 2),
+                "inferenceMsPerFrame": round(statistics.median(inference) / max(1, len(frames)), 2),
+                "speedup": round(baseline / statistics.median(walls), 3),
+                "crop": extraction["roi"],
+                "deviation": landmark_deviation(reference, frames),
+            }
+            report["modes"].append(row)
+            print(
+                f"{mode:>7}  {row['framesPerS']:>7} q/s  modelo {row['inferenceMsPerFrame']:>6} ms/q  "
+                f"x{row['speedup']}  desvio {row['deviation'].get('meanAbs', '-')} (máx {row['deviation'].get('maxAbs', '-')})"
+            )
+    return report
+
+
+def bench_segments(args: argparse.Namespace) -> dict:
+    server.SEGMENTS = args.segments
+    with tempfile.TemporaryDirectory() as scratch:
+        clip = args.clip or person_clip(args.clips_dir or scratch, args.seconds)
+        meta = server.probe_video(clip)
+        server.start_process_pool(args.segments)
+        server.wait_process_pool(args.segments)
+        try:
+            plan = server.segment_plan(clip, meta, None)
+            if not plan:
+                raise SystemExit("clipe curto demais para dividir (veja POSE_SEGMENT_MIN_SECONDS)")
+            sequential_path = os.path.join(scratch, "sequential.ndjson")
+            segmented_path = os.path.join(scratch, "segmented.ndjson")
+
+            started = time.perf_counter()
+            server._process_pool.submit(server.extract_landmarks, clip, meta, sequential_path).result()
+            sequential_wall = time.perf_counter() - started
+            started = time.perf_counter()
+            extraction = server.run_segmented(
+                clip, meta, segmented_path, server.new_progress(), server.default_variant(), None, plan,
+            )
+            segmented_wall = time.perf_counter() - started
+            reference, frames = read_frames(sequential_path), read_frames(segmented_path)
+        finally:
+            server.stop_process_pool()
+
+    step = server.decimation_step(meta["fps"])
+    boundaries = [segment["keepFrom"] // step for segment in plan[1:]]
+    near = [
+        (ref, frame) for ref, frame in zip(reference, frames)
+        if any(0 <= ref["i"] - boundary < args.boundary_frames for boundary in boundaries)
+    ]
+    report = {
+        "clip": args.clip or "person (sintético)",
+        "meta": meta,
+        "segments": plan,
+        "frames": len(frames),
+        "sequentialWallS": round(sequential_wall, 3),
+        "segmentedWallS": round(segmented_wall, 3),
+        "speedup": round(sequential_wall / segmented_wall, 3),
+        "indicesMatch": [(f["i"], f["t"]) for f in frames] == [(f["i"], f["t"]) for f in reference],
+        "deviation": landmark_deviation(reference, frames),
+        "boundaryDeviation": landmark_deviation([ref for ref, _ in near], [frame for _, frame in near]),
+        "span": extraction["span"],
+    }
+    print(
+        f"{len(plan)} partes  corrido {report['sequentialWallS']} s  em partes {report['segmentedWallS']} s  "
+        f"x{report['speedup']}  i/t {'iguais' if report['indicesMatch'] else 'DIFERENTES'}  "
+        f"desvio {report['deviation'].get('meanAbs', '-')} (fronteiras {report['boundaryDeviation'].get('meanAbs', '-')})"
+    )
+    return report
+
+
+def synthetic_clip(clips_dir: str, resolution: str, fps: int, seconds: float) -> str:
+    """Gera (ou reaproveita) um clipe H.264 com o padrão `testsrc2`."""
+    width, height = RESOLUTIONS[resolution]
+    path = os.path.join(clips_dir, f"{resolution}{fps}-{seconds:g}s.mp4")
+    if not os.path.exists(path):
+        subprocess.run(
+            [
+                "ffmpeg", "-v", "error", "-y",
+                "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+                "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                path + ".tmp.mp4",
+            ],
+            check=True,
+        )
+        os.replace(path + ".tmp.mp4", path)
+    return path
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """R2 e Worker de mentira: GET com Range nos clipes, PUT do bundle e
+    callback. Guarda só tamanho e hash do bundle, não o corpo."""
+
+    def do_GET(self):  # noqa: N802
+        path = os.path.join(self.server.clips_dir, os.path.basename(self.path))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if match and (match[1] or match[2]):
+            if match[1]:
+                start = int(match[1])
+                end = min(int(match[2]), size - 1) if match[2] else size - 1
+            else:
+                start = max(0, size - int(match[2]))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", f'"{size}-{int(os.path.getmtime(path))}"')
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        with open(path, "rb") as handle:
+            handle.seek(start)
+            remaining = end - start + 1
+            try:
+                while remaining > 0:
+                    chunk = handle.read(min(remaining, 1 << 20))
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # o ffmpeg fecha a conexão ao pular para outro Range
+
+    def do_PUT(self):  # noqa: N802
+        remaining = int(self.headers.get("Content-Length") or 0)
+        digest = hashlib.sha256()
+        size = remaining
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, 1 << 20))
+            digest.update(chunk)
+            remaining -= len(chunk)
+        self.server.uploads[self.path] = {"bytes": size, "sha256": digest.hexdigest()}
+        self._empty(200)
+
+    def do_POST(self):  # noqa: N802
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        with self.server.arrived:
+            self.server.callbacks[os.path.basename(self.path)] = (time.perf_counter(), body)
+            self.server.arrived.notify_all()
+        self._empty(200)
+
+    def _empty(self, status: int) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve(handler, **state) -> ThreadingHTTPServer:
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    for name, value in state.items():
+        setattr(httpd, name, value)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank: com poucos jobs, interpolar inventaria precisão."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def measure_configuration(name: str, clip: str, options: dict) -> dict:
+    """Roda `options["jobs"]` jobs no clipe, todos submetidos de uma vez."""
+    stand_in = serve(
+        StandIn, clips_dir=os.path.dirname(clip), uploads={}, callbacks={}, arrived=threading.Condition(),
+    )
+    if server.EXECUTOR == "process":
+        server.start_process_pool(server.JOBS.workers)
+    # Outbox próprio: pendentes de uma execução anterior iriam para portas
+    # que já não existem.
+    server.OUTBOX = server.CallbackOutbox(tempfile.mkdtemp(prefix="bench-outbox-"))
+    server.OUTBOX.start()
+    server.JOBS.start()
+    api = serve(server.Handler)
+
+    base = f"http://127.0.0.1:{stand_in.server_port}"
+    submitted = {}
+    started = time.perf_counter()
+    for index in range(options["jobs"]):
+        job_id = f"{name}-{index}"
+        payload = {
+            "jobId": job_id,
+            "assessmentId": "bench",
+            "videoUrl": f"{base}/clips/{os.path.basename(clip)}",
+            "resultPutUrl": f"{base}/results/{job_id}",
+            # Chaves distintas: o mesmo resultKey seria fundido num job só.
+            "resultKey": f"bench/{job_id}",
+            "callbackUrl": f"{base}/callbacks/{job_id}",
+            "callbackToken": "bench",
+            "view": "frontal",
+            "attempt": 1,
+            "bundleFormat": options["format"],
+            "acceptEncoding": options["encoding"],
+        }
+        submitted[job_id] = time.perf_counter()
+        requests.post(f"http://127.0.0.1:{api.server_port}/analyze", json=payload, timeout=30).raise_for_status()
+
+    deadline = time.monotonic() + options["timeout"]
+    with stand_in.arrived:
+        while len(stand_in.callbacks) < len(submitted) and time.monotonic() < deadline:
+            stand_in.arrived.wait(timeout=1)
+    finished = time.perf_counter()
+
+    results = {job_id: body for job_id, (_, body) in stand_in.callbacks.items()}
+    latencies = [arrived - submitted[job_id] for job_id, (arrived, _) in stand_in.callbacks.items()]
+    succeeded = [body for body in results.values() if body.get("status") == "succeeded"]
+    frames = sum(body["frameCount"] for body in succeeded)
+    # Pico do processo do benchmark e, pelos spans, o dos processos de extração.
+    peaks = [resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024]
+    for body in results.values():
+        peaks += [span["peakRssMb"] for span in body.get("trace", {}).get("spans", [])]
+
+    return {
+        "name": name,
+        "clip": os.path.basename(clip),
+        "jobs": len(submitted),
+        "succeeded": len(succeeded),
+        "errors": sorted({body.get("error", "") for body in results.values() if body.get("status") != "succeeded"}),
+        "timedOut": len(submitted) - len(results),
+        "frames": frames,
+        "framesPerS": round(frames / (finished - started), 2) if frames else 0.0,
+        "latencyP50S": round(percentile(latencies, 0.5), 3) if latencies else None,
+        "latencyP95S": round(percentile(latencies, 0.95), 3) if latencies else None,
+        "peakRssMb": round(max(peaks), 1),
+        "bytesUploaded": sum(upload["bytes"] for upload in stand_in.uploads.values()),
+    }
+
+
+def _configuration_process(name: str, clip: str, options: dict, results) -> None:
+    try:
+        results.put(measure_configuration(name, clip, options))
+    except Exception as error:  # noqa: BLE001 — vira linha do relatório
+        results.put({"name": name, "clip": os.path.basename(clip), "errors": [repr(error)]})
+    finally:
+        # Num processo filho do multiprocessing, a saída espera os filhos
+        # dele antes do atexit que fecharia o pool — sem isto, trava.
+        server.stop_process_pool()
+
+
+def server_settings() -> dict:
+    return {
+        "workers": server.WORKERS,
+        "executor": server.EXECUTOR,
+        "input": server.INPUT_MODE,
+        "modelPolicy": server.MODEL_POLICY,
+        **server.extraction_settings(),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_jobs(args: argparse.Namespace) -> dict:
+    clips_dir = args.clips_dir or os.path.join(tempfile.gettempdir(), "pose-bench-clips")
+    os.makedirs(clips_dir, exist_ok=True)
+    clips = [
+        (f"{resolution}{fps}", synthetic_clip(clips_dir, resolution, fps, args.seconds))
+        for resolution in args.resolutions.split(",") if resolution
+        for fps in map(int, args.fps.split(",") if args.fps else [])
+    ]
+    for path in args.clip or []:
+        # Vai para o diretório servido pelo dublê; link simbólico basta.
+        target = os.path.join(clips_dir, os.path.basename(path))
+        if not os.path.exists(target):
+            os.symlink(os.path.abspath(path), target)
+        clips.append((os.path.splitext(os.path.basename(path))[0], target))
+
+    options = {
+        "jobs": args.jobs,
+        "format": args.format,
+        "encoding": [args.encoding] if args.encoding else [],
+        "timeout": args.timeout,
+    }
+    report = {
+        "commit": git_commit(),
+        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "settings": server_settings(),
+        "options": options,
+        "configurations": [],
+    }
+    context = multiprocessing.get_context("spawn")
+    for name, clip in clips:
+        results = context.Queue()
+        worker = context.Process(target=_configuration_process, args=(name, clip, options, results))
+        worker.start()
+        row = results.get()
+        worker.join()
+        report["configurations"].append(row)
+        print(
+            f"{name:>10}  {row.get('framesPerS', '-'):>7} q/s  p50 {row.get('latencyP50S', '-')} s  "
+            f"p95 {row.get('latencyP95S', '-')} s  pico {row.get('peakRssMb', '-')} MB"
+            + (f"  erros: {row['errors']}" if row.get("errors") else "")
+        )
+    return report
+
+
+def process_rss_mb(pid: int) -> float:
+    """RSS atual do processo e de todos os descendentes — pool, Manager,
+    ffmpeg. Lido do /proc, então só no Linux, como o container."""
+    total, pending = 0.0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as handle:
+                for line in handle:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) / 1024
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as handle:
+                    pending.extend(int(child) for child in handle.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return round(total, 1)
+
+
+def growth_mb_per_hour(samples: list[tuple[float, float]]) -> float | None:
+    """Inclinação por mínimos quadrados, sem o primeiro décimo da execução:
+    o aquecimento e os primeiros buffers não são vazamento."""
+    points = samples[len(samples) // 10:]
+    if len(points) < 3:
+        return None
+    times = [t for t, _ in points]
+    mean_t = statistics.fmean(times)
+    mean_rss = statistics.fmean(rss for _, rss in points)
+    spread = sum((t - mean_t) ** 2 for t in times)
+    if not spread:
+        return None
+    slope = sum((t - mean_t) * (rss - mean_rss) for t, rss in points) / spread
+    return round(slope * 3600, 1)
+
+
+def queue_wait_seconds(body: dict) -> float | None:
+    started = [span["startMs"] for span in body.get("trace", {}).get("spans", []) if "startMs" in span]
+    return min(started) / 1000 if started else None
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    return {f"p{int(q * 100)}": round(percentile(values, q), 3) for q in (0.5, 0.95, 0.99)}
+
+
+def start_server(workdir: str) -> tuple[subprocess.Popen, str]:
+    """`server.py` num processo próprio: o RSS medido é só o dele."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "POSE_OUTBOX_DIR": os.path.join(workdir, "outbox"),
+        "POSE_CHECKPOINT_DIR": os.path.join(workdir, "checkpoints"),
+    }
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")],
+        env=env, stdout=subprocess.DEVNULL, stderr=open(os.path.join(workdir, "server.log"), "wb"),
+    )
+    base = f"http://127.0.0.1:{port}"
+    # O /ready só passa depois do aquecimento do modelo em todos os workers.
+    while True:
+        if process.poll() is not None:
+            raise SystemExit(f"server.py saiu com {process.returncode}; veja {workdir}/server.log")
+        with contextlib.suppress(requests.RequestException):
+            if requests.get(f"{base}/ready", timeout=2).status_code == 200:
+                return process, base
+        time.sleep(0.5)
+
+
+def run_load_phase(rate: float, args, clips: list[str], stand_in, api: str, rng, phase: int) -> dict:
+    """Chegadas de Poisson a `rate` jobs/min por `args.duration` s, depois a
+    espera pelos callbacks que faltam."""
+    base = f"http://127.0.0.1:{stand_in.server_port}"
+    submitted: dict[str, float] = {}
+    rejected: dict[str, int] = {}
+    started = time.perf_counter()
+    next_arrival = started
+    while True:
+        next_arrival += rng.expovariate(rate / 60)
+        if next_arrival - started > args.duration:
+            break
+        time.sleep(max(0.0, next_arrival - time.perf_counter()))
+        job_id = f"load{phase}-{len(submitted) + sum(rejected.values())}"
+        clip = clips[(len(submitted) + sum(rejected.values())) % len(clips)]
+        payload = {
+            "jobId": job_id,
+            "assessmentId": "load",
+            "videoUrl": f"{base}/clips/{os.path.basename(clip)}",
+            "resultPutUrl": f"{base}/results/{job_id}",
+            "resultKey": f"load/{job_id}",
+            "callbackUrl": f"{base}/callbacks/{job_id}",
+            "callbackToken": "load",
+            "view": "frontal",
+            "attempt": 1,
+        }
+        sent = time.perf_counter()
+        try:
+            status = requests.post(f"{api}/analyze", json=payload, timeout=30).status_code
+        except requests.RequestException:
+            status = "erro de conexão"
+        if status == 202:
+            submitted[job_id] = sent
+        else:
+            rejected[str(status)] = rejected.get(str(status), 0) + 1
+
+    deadline = time.monotonic() + args.timeout
+    with stand_in.arrived:
+        while (
+            any(job_id not in stand_in.callbacks for job_id in submitted) and time.monotonic() < deadline
+        ):
+            stand_in.arrived.wait(timeout=1)
+        arrived = {job_id: stand_in.callbacks[job_id] for job_id in submitted if job_id in stand_in.callbacks}
+    finished = max((at for at, _ in arrived.values()), default=time.perf_counter())
+
+    succeeded = {job_id: body for job_id, (_, body) in arrived.items() if body.get("status") == "succeeded"}
+    failed = [body.get("error", "") for _, body in arrived.values() if body.get("status") != "succeeded"]
+    # Pela ordem de chegada: a espera subindo ao longo da fase é fila que não
+    # drena, mesmo que o p95 ainda caiba no limite.
+    waits = [queue_wait_seconds(arrived[job_id][1]) for job_id in sorted(arrived, key=submitted.get)]
+    waits = [wait for wait in waits if wait is not None]
+    third = max(1, len(waits) // 3)
+    total = len(submitted) + sum(rejected.values())
+    errors = sum(rejected.values()) + len(failed) + len(submitted) - len(arrived)
+    wall = finished - started
+    row = {
+        "rateJobsPerMin": rate,
+        "offered": total,
+        "accepted": len(submitted),
+        "rejected": rejected,
+        "succeeded": len(succeeded),
+        "failed": len(failed),
+        "failures": sorted(set(failed)),
+        "timedOut": len(submitted) - len(arrived),
+        "errorRate": round(errors / total, 4) if total else 0.0,
+        "wallS": round(wall, 1),
+        "jobsPerMin": round(len(succeeded) / wall * 60, 2) if wall > 0 else 0.0,
+        "framesPerS": round(sum(body["frameCount"] for body in succeeded.values()) / wall, 2) if wall > 0 else 0.0,
+        "queueWaitS": percentiles(waits),
+        # Mediana da espera no primeiro e no último terço das chegadas.
+        "queueWaitTrendS": (
+            [round(statistics.median(waits[:third]), 3), round(statistics.median(waits[-third:]), 3)]
+            if len(waits) >= 3 else None
+        ),
+        "latencyS": percentiles([at - submitted[job_id] for job_id, (at, _) in arrived.items()]),
+    }
+    early, late = row["queueWaitTrendS"] or (0.0, 0.0)
+    row["sustained"] = (
+        errors == 0 and row["accepted"] > 0
+        and row["queueWaitS"]["p95"] is not None and row["queueWaitS"]["p95"] <= args.max_wait
+        # Espera que dobra ao longo da fase (com 1 s de folga para o ruído
+        # de filas quase vazias) é fila crescendo: estourava com mais tempo.
+        and late <= max(1.0, 2 * early)
+    )
+    return row
+
+
+def bench_load(args: argparse.Namespace) -> dict:
+    clips_dir = args.clips_dir or os.path.join(tempfile.gettempdir(), "pose-bench-clips")
+    os.makedirs(clips_dir, exist_ok=True)
+    clips = []
+    for path in args.clip or [person_clip(clips_dir, args.seconds)]:
+        target = os.path.join(clips_dir, os.path.basename(path))
+        if not os.path.exists(target):
+            os.symlink(os.path.abspath(path), target)
+        clips.append(target)
+
+    rng = random.Random(args.seed)
+    samples: list[tuple[float, float]] = []
+    stop = threading.Event()
+    report = {
+        "commit": git_commit(),
+        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "cpus": server.available_cpus(),
+        "settings": server_settings(),
+        "options": {
+            "rates": args.rates, "duration": args.duration, "seed": args.seed,
+            "maxWait": args.max_wait, "clips": [os.path.basename(clip) for clip in clips],
+        },
+        "phases": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="bench-load-") as workdir:
+        stand_in = serve(StandIn, clips_dir=clips_dir, uploads={}, callbacks={}, arrived=threading.Condition())
+        process, api = start_server(workdir)
+        origin = time.perf_counter()
+
+        def sample() -> None:
+            while not stop.wait(args.sample_seconds):
+                samples.append((round(time.perf_counter() - origin, 1), process_rss_mb(process.pid)))
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        try:
+            for phase, rate in enumerate(float(value) for value in args.rates.split(",") if value):
+                first = len(samples)
+                row = run_load_phase(rate, args, clips, stand_in, api, rng, phase)
+                rss = [value for _, value in samples[first:]] or [process_rss_mb(process.pid)]
+                row["rssMb"] = {
+                    "start": rss[0], "end": rss[-1], "max": max(rss),
+                    "growthMbPerHour": growth_mb_per_hour(samples[first:]),
+                }
+                report["phases"].append(row)
+                print(
+                    f"{rate:>6g} jobs/min  {row['jobsPerMin']:>6} feitos/min  "
+                    f"fila p95 {row['queueWaitS']['p95']} s  ponta a ponta p95 {row['latencyS']['p95']} s  "
+                    f"erros {row['errorRate']:.1%}  RSS {row['rssMb']['end']} MB  "
+                    + ("sustentada" if row["sustained"] else "NÃO sustentada")
+                )
+        finally:
+            stop.set()
+            sampler.join()
+            process.terminate()
+            process.wait(timeout=120)
+            stand_in.shutdown()
+
+    sustained = [row["rateJobsPerMin"] for row in report["phases"] if row["sustained"]]
+    report["sustainedJobsPerMin"] = max(sustained) if sustained else None
+    report["rssSamples"] = samples
+    report["rssGrowthMbPerHour"] = growth_mb_per_hour(samples)
+    print(
+        f"maior taxa sustentada: {report['sustainedJobsPerMin'] or '-'} jobs/min "
+        f"em {report['cpus']} CPUs; RSS {report['rssGrowthMbPerHour'] if report['rssGrowthMbPerHour'] is not None else '-'} MB/h"
+    )
+    return report
+
+
+def compare_reports(args: argparse.Namespace) -> dict:
+    """Variação por configuração entre dois relatórios de `jobs`."""
+    with open(args.before) as handle:
+        before = {row["name"]: row for row in json.load(handle)["configurations"]}
+    with open(args.after) as handle:
+        after = json.load(handle)["configurations"]
+
+    def change(old, new):
+        return round((new - old) / old * 100, 1) if old and new is not None else None
+
+    rows = []
+    for row in after:
+        old = before.get(row["name"])
+        if old is None:
+            continue
+        rows.append({
+            "name": row["name"],
+            "framesPerSPct": change(old.get("framesPerS"), row.get("framesPerS")),
+            "latencyP95SPct": change(old.get("latencyP95S"), row.get("latencyP95S")),
+            "peakRssMbPct": change(old.get("peakRssMb"), row.get("peakRssMb")),
+        })
+        print(f"{row['name']:>10}  " + "  ".join(
+            f"{label} " + ("-" if rows[-1][field] is None else f"{rows[-1][field]:+}%")
+            for label, field in (("q/s", "framesPerSPct"), ("p95", "latencyP95SPct"), ("pico", "peakRssMbPct"))
+        ))
+    return {"before": args.before, "after": args.after, "configurations": rows}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    decoders = commands.add_parser("decoders", help="compara os decoders no mesmo clipe")
+    decoders.add_argument("clip")
+    decoders.add_argument("--max-long-edge", type=int, default=0)
+    decoders.add_argument("--runs", type=int, default=3)
+    decoders.add_argument("--output", help="grava o relatório em JSON")
+    decoders.set_defaults(handler=bench_decoders)
+
+    roi = commands.add_parser("roi", help="compara quadro inteiro e recorte em volta da pessoa")
+    roi.add_argument("clip", nargs="?", help="clipe com alguém em quadro; sem ele, gera um")
+    roi.add_argument("--seconds", type=float, default=10, help="duração do clipe gerado")
+    roi.add_argument("--clips-dir", help="onde guardar o clipe gerado")
+    roi.add_argument("--runs", type=int, default=3)
+    roi.add_argument("--output", help="grava o relatório em JSON")
+    roi.set_defaults(handler=bench_roi)
+
+    segments = commands.add_parser("segments", help="compara extração corrida e em partes paralelas")
+    segments.add_argument("clip", nargs="?", help="clipe longo; sem ele, gera um com alguém em quadro")
+    segments.add_argument("--segments", type=int, default=max(2, server.available_cpus()), help="partes e processos do pool")
+    segments.add_argument("--boundary-frames", type=int, default=30, help="quadros depois de cada fronteira no desvio")
+    segments.add_argument("--seconds", type=float, default=60, help="duração do clipe gerado")
+    segments.add_argument("--clips-dir", help="onde guardar o clipe gerado")
+    segments.add_argument("--output", help="grava o relatório em JSON")
+    segments.set_defaults(handler=bench_segments)
+
+    jobs = commands.add_parser("jobs", help="mede jobs completos contra um dublê local do R2 e do Worker")
+    jobs.add_argument("--resolutions", default="720p,1080p,4k", help=f"entre {', '.join(RESOLUTIONS)}")
+    jobs.add_argument("--fps", default="30,60,120")
+    jobs.add_argument("--seconds", type=float, default=5)
+    jobs.add_argument("--clip", action="append", help="clipe real, além dos sintéticos (repetível)")
+    jobs.add_argument("--clips-dir", help="onde guardar os clipes gerados, para reaproveitar entre execuções")
+    jobs.add_argument("--jobs", type=int, default=3, help="jobs por configuração, submetidos de uma vez")
+    jobs.add_argument("--format", choices=server.BUNDLE_FORMATS, default="ndjson")
+    jobs.add_argument("--encoding", choices=("gzip",))
+    jobs.add_argument("--timeout", type=float, default=1800, help="segundos de espera pelos callbacks")
+    jobs.add_argument("--output", help="grava o relatório em JSON")
+    jobs.set_defaults(handler=bench_jobs)
+
+    load = commands.add_parser("load", help="carga e soak: chegadas de Poisson contra o servidor de verdade")
+    load.add_argument("--rates", default="2,4,6,8", help="taxas de chegada em jobs/min, uma fase cada")
+    load.add_argument("--duration", type=float, default=300, help="segundos de chegadas por taxa")
+    load.add_argument("--clip", action="append", help="clipe dos jobs (repetível, usados em rodízio)")
+    load.add_argument("--seconds", type=float, default=10, help="duração do clipe gerado sem --clip")
+    load.add_argument("--clips-dir", help="onde guardar o clipe gerado")
+    load.add_argument("--seed", type=int, default=1, help="semente das chegadas")
+    load.add_argument("--max-wait", type=float, default=60, help="p95 de espera na fila aceito, em s")
+    load.add_argument("--timeout", type=float, default=1800, help="espera pelos callbacks ao fim de cada taxa")
+    load.add_argument("--sample-seconds", type=float, default=5, help="intervalo das amostras de RSS")
+    load.add_argument("--output", help="grava o relatório em JSON")
+    load.set_defaults(handler=bench_load)
+
+    compare = commands.add_parser("compare", help="compara dois relatórios de jobs")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    compare.add_argument("--output", help="grava a comparação em JSON")
+    compare.set_defaults(handler=compare_reports)
+
+    args = parser.parse_args()
+    report = args.handler(args)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
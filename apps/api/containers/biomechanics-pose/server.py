@@ -12,8 +12,12 @@ implementação, uma suíte de testes — se o container calculasse por conta
 própria, o mesmo vídeo poderia gerar números diferentes conforme o caminho, e
 não haveria como dizer qual está certo.
 
-O container é descartável e não guarda PHI: baixa para /tmp, processa, sobe o
-resultado e apaga.
+O container é descartável e não guarda PHI: baixa para /tmp (ou, no modo
+stream, lê direto da URL assinada), processa, sobe o resultado e apaga. As
+exceções são o cache de extrações, desligado por padrão
+(`POSE_CACHE_MAX_BYTES`), que vive só enquanto o container vive, e o
+checkpoint da extração (`POSE_CHECKPOINT_EVERY`), também desligado por
+padrão, que guarda os quadros de um job só até o bundle dele chegar ao R2.
 
 ## Por que MediaPipe, e não OpenPose
 
@@ -32,7 +36,9 @@ qualquer um dos dois seria violação de licença, não otimização.
 MediaPipe é Apache 2.0. As mitigações para a acurácia menor são três, e todas
 já estão no sistema:
 
-1. `model_complexity=2` (heavy), a variante mais acurada do MediaPipe.
+1. `model_complexity=2` (heavy), a variante mais acurada do MediaPipe. A
+   política `adaptive` pode descer para full só no vídeo longo de triagem com
+   a fila acumulada, e a variante usada vai no `poseEngine.modelVariant`.
 2. O FPPA é reportado como EXCURSÃO a partir da postura inicial, nunca como
    valor absoluto — Asaeda et al. (Heliyon 2024;10(17):e36338) mediram erro de
    18,8–19,7° no absoluto com MediaPipe, mas confiabilidade adequada na
@@ -46,14 +52,31 @@ container só precisa emitir o mesmo `ff-pose-33-v1`. A matemática clínica nã
 muda de lugar.
 """
 
+import bisect
+import contextlib
+import gzip
 import hashlib
 import json
 import logging
+import multiprocessing
 import os
+import queue
+import random
+import resource
+import shutil
+import signal
+import struct
 import subprocess
 import tempfile
 import threading
+import time
 import traceback
+import types
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.managers import SyncManager
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 import cv2
@@ -75,6 +98,180 @@ ENGINE_VERSION = mp.__version__
 TARGET_FPS = 30.0
 # 5 min. Além disso é erro de uso, não captura de consultório.
 MAX_FRAMES = 9000
+MODEL_COMPLEXITY = 2
+MODEL_VARIANTS = {0: "lite", 1: "full", 2: "heavy"}
+# Quem escolhe modelo e tamanho de entrada quando o payload não diz.
+# "fixed": sempre heavy e `POSE_MAX_LONG_EDGE` — o padrão, e o que as
+# diferenças mínimas detectáveis de `clinicalThresholds.ts` pressupõem.
+# "adaptive": heavy para o clipe clínico curto; no vídeo longo de triagem,
+# full quando a fila está acumulada. Lite nunca é escolhido sozinho: só se o
+# payload pedir.
+MODEL_POLICY = os.environ.get("POSE_MODEL_POLICY", "fixed")
+MODEL_POLICIES = ("fixed", "adaptive")
+# Até aqui o vídeo é captura clínica e vai sempre no heavy.
+HEAVY_MAX_SECONDS = float(os.environ.get("POSE_HEAVY_MAX_SECONDS", "120"))
+# Jobs esperando a partir dos quais a fila conta como acumulada.
+BACKLOG_JOBS = int(os.environ.get("POSE_BACKLOG_JOBS", "0")) or None
+# Maior lado da entrada na política adaptive (só o decoder ffmpeg reduz).
+ADAPTIVE_LONG_EDGE = int(os.environ.get("POSE_ADAPTIVE_LONG_EDGE", "1280"))
+
+
+def available_cpus(cgroup_root: str = "/sys/fs/cgroup") -> int:
+    """Núcleos que este processo pode de fato usar.
+
+    `os.cpu_count()` dentro do container devolve os núcleos do host, não a
+    cota da instância: numa máquina de 64 núcleos seriam 64 workers, 64
+    modelos carregados no aquecimento disputando 4 vCPU. Vale o menor entre a
+    afinidade e a cota do cgroup (v2 `cpu.max`, v1 `cfs_quota_us`).
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    quota = period = None
+    try:
+        with open(os.path.join(cgroup_root, "cpu.max")) as handle:
+            raw_quota, raw_period = handle.read().split()
+        if raw_quota != "max":
+            quota, period = int(raw_quota), int(raw_period)
+    except (OSError, ValueError):
+        try:
+            with open(os.path.join(cgroup_root, "cpu", "cpu.cfs_quota_us")) as handle:
+                quota = int(handle.read())
+            with open(os.path.join(cgroup_root, "cpu", "cpu.cfs_period_us")) as handle:
+                period = int(handle.read())
+        except (OSError, ValueError):
+            pass
+    if quota and period and quota > 0:
+        cpus = min(cpus, max(1, -(-quota // period)))
+    return max(1, cpus)
+
+
+# Um MediaPipe heavy ocupa um núcleo inteiro durante o `pose.process`. Mais
+# jobs simultâneos que núcleos não aumenta a vazão: só divide a CPU e faz todos
+# terminarem tarde. Os excedentes esperam na fila, em ordem de chegada.
+WORKERS = int(os.environ.get("POSE_WORKERS") or available_cpus())
+# Fila cheia vira 429 com Retry-After. Aceitar sem limite só empurraria o
+# problema para o timeout do token de callback, uma hora depois.
+QUEUE_CAPACITY = int(os.environ.get("POSE_QUEUE_CAPACITY", "16"))
+RETRY_AFTER_SECONDS = int(os.environ.get("POSE_RETRY_AFTER_SECONDS", "30"))
+# "thread": a extração roda no próprio worker da fila. "process": cada worker
+# despacha para um processo dedicado, com interpretador e modelo próprios — o
+# achatamento dos landmarks em Python deixa de disputar o GIL entre jobs.
+EXECUTOR = os.environ.get("POSE_EXECUTOR", "thread")
+EXECUTORS = ("thread", "process")
+# Quadros RGB decodificados à frente da inferência. Poucos bastam para cobrir a
+# variação de custo entre quadros; cada slot em 1080p são ~6 MB.
+RING_FRAMES = int(os.environ.get("POSE_RING_FRAMES", "4"))
+# "opencv": cv2.VideoCapture no tamanho original, convertido para RGB aqui.
+# "ffmpeg": subprocesso que já entrega rgb24 decimado e, se configurado,
+# reduzido — menos banda de memória por quadro e nada alocado por quadro.
+DECODER = os.environ.get("POSE_DECODER", "opencv")
+DECODERS = ("opencv", "ffmpeg")
+# Maior lado do quadro entregue ao modelo no decoder ffmpeg; 0 mantém o
+# original. O BlazePose redimensiona internamente para 256 px, então 4K na
+# entrada só gasta banda.
+MAX_LONG_EDGE = int(os.environ.get("POSE_MAX_LONG_EDGE", "0"))
+# "person": o modelo recebe só a janela em volta da pessoa, seguida pelos
+# landmarks do quadro anterior, e volta ao quadro inteiro quando a perde. Os
+# pontos são levados de volta ao quadro inteiro, então o `coordinateSpace` não
+# muda — mas os valores mudam um pouco, e o modo fica registrado no bundle.
+# "off" (padrão): o quadro inteiro, sempre.
+ROI_MODE = os.environ.get("POSE_ROI", "off")
+ROI_MODES = ("off", "person")
+# Folga da janela em volta da pessoa, em fração do tamanho dela por lado. Folga
+# grande deixa a janela parada por mais quadros — cada mudança de janela é um
+# salto que o rastreamento interno do MediaPipe precisa absorver.
+ROI_PADDING = float(os.environ.get("POSE_ROI_PADDING", "0.35"))
+# A janela só muda quando a pessoa, com esta margem, sai de dentro dela.
+ROI_MARGIN = 0.1
+# "download": baixa o vídeo inteiro para /tmp antes de abrir. "stream": o
+# decoder lê direto da URL assinada, buscando por Range só o que precisa — a
+# decodificação começa com os primeiros bytes e o disco não é usado. O MP4 com
+# `moov` no fim (padrão do iOS) funciona porque o ffmpeg pula até ele por Range,
+# coisa que um pipe no stdin não permitiria.
+INPUT_MODE = os.environ.get("POSE_INPUT", "download")
+INPUT_MODES = ("download", "stream")
+# Teto do vídeo em bytes, nos dois modos: no download é o que vai para o disco,
+# no stream é conferido pelo tamanho que o ffprobe lê antes de decodificar.
+MAX_VIDEO_BYTES = int(os.environ.get("POSE_MAX_VIDEO_BYTES", str(2 << 30)))
+STREAM_TIMEOUT_SECONDS = int(os.environ.get("POSE_STREAM_TIMEOUT_SECONDS", "60"))
+UPLOAD_CHUNK_BYTES = 1 << 20
+# Formato do objeto no R2, escolhido pelo payload (`bundleFormat`). O Worker
+# detecta qual é pelo magic number, como já faz com gzip.
+BUNDLE_FORMATS = ("ndjson", "columnar")
+COLUMNAR_MAGIC = b"FFPC"
+COLUMNAR_VERSION = 1
+# Quadros por bloco ao reescrever o spool: limita a memória da conversão.
+COLUMNAR_CHUNK_FRAMES = 512
+# Codificações que o container sabe emitir, na ordem em que o job as aceita
+# (`acceptEncoding`). Só gzip: é o que o `decodePoseBundle` do Worker abre via
+# DecompressionStream. zstd não entra enquanto o runtime do Worker não tiver
+# como descomprimir — um bundle ilegível no destino não é economia.
+CONTENT_ENCODINGS = ("gzip", "identity")
+GZIP_LEVEL = int(os.environ.get("POSE_GZIP_LEVEL", "6"))
+# Cache local de extrações, desligado por padrão (0 bytes). Ligar significa
+# guardar landmarks de paciente no disco do container enquanto ele viver — é
+# dado derivado de PHI, então é decisão explícita de quem configura, não
+# default. Some com o container.
+CACHE_DIR = os.environ.get("POSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pose-cache"))
+CACHE_MAX_BYTES = int(os.environ.get("POSE_CACHE_MAX_BYTES", "0"))
+# Arquivo JSONL onde cada job terminado deixa o seu trace; vazio desliga. O
+# trace vai no callback de qualquer jeito — o arquivo é para quem analisa o
+# container sem acesso ao Worker.
+TRACE_FILE = os.environ.get("POSE_TRACE_FILE", "")
+# Callbacks ainda não entregues ao Worker, um arquivo por destino. Sobrevive a
+# um reinício do processo dentro do mesmo container; some com ele, como o
+# cache. Guarda o token do callback e chave/hash do bundle — nada de vídeo.
+OUTBOX_DIR = os.environ.get("POSE_OUTBOX_DIR", os.path.join(tempfile.gettempdir(), "pose-outbox"))
+CALLBACK_TIMEOUT_SECONDS = int(os.environ.get("POSE_CALLBACK_TIMEOUT_SECONDS", "30"))
+# Espera entre tentativas: dobra a cada falha seguida do mesmo host, até o
+# teto, com metade sorteada — vários containers voltando juntos de uma queda
+# do Worker não batem nele no mesmo segundo.
+CALLBACK_RETRY_BASE_SECONDS = float(os.environ.get("POSE_CALLBACK_RETRY_BASE_SECONDS", "2"))
+CALLBACK_RETRY_MAX_SECONDS = float(os.environ.get("POSE_CALLBACK_RETRY_MAX_SECONDS", "300"))
+# Depois disso o token do callback já expirou (1 h no Worker): insistir só
+# colecionaria 401.
+CALLBACK_MAX_AGE_SECONDS = float(os.environ.get("POSE_CALLBACK_MAX_AGE_SECONDS", "3600"))
+# Prazo entre o SIGTERM e a saída, em s. Tem de caber no período de graça da
+# plataforma antes do SIGKILL. Os últimos DRAIN_CANCEL_SECONDS são dos jobs
+# cancelados por prazo avisarem o Worker e do outbox esvaziar.
+DRAIN_SECONDS = float(os.environ.get("POSE_DRAIN_SECONDS", "30"))
+DRAIN_CANCEL_SECONDS = 10.0
+# Checkpoint da extração: a cada N quadros emitidos o spool é copiado para
+# fora do diretório do job, e um reenvio do mesmo resultado (mesmo resultKey,
+# mesmo vídeo, mesmas configurações) continua de onde parou em vez de refazer
+# tudo. Desligado por padrão, como o cache: são landmarks de paciente fora do
+# diretório do job por até uma hora, e isso é decisão explícita.
+#
+# O Worker cria um job novo — e portanto uma instância nova do container —
+# a cada reprocessamento, então a chave não é o jobId. Mesmo assim o
+# checkpoint só é achado por outra instância se POSE_CHECKPOINT_DIR for um
+# volume compartilhado entre elas; no /tmp padrão a retomada vale só dentro
+# da mesma instância (falha de upload, reenvio ao mesmo container).
+CHECKPOINT_DIR = os.environ.get("POSE_CHECKPOINT_DIR", os.path.join(tempfile.gettempdir(), "pose-checkpoints"))
+CHECKPOINT_EVERY = int(os.environ.get("POSE_CHECKPOINT_EVERY", "0"))
+# Passado isso o token do callback já expirou e ninguém vai reenviar o job.
+CHECKPOINT_MAX_AGE_SECONDS = float(os.environ.get("POSE_CHECKPOINT_MAX_AGE_SECONDS", "3600"))
+# Extração segmentada: um vídeo longo vira até N trechos, cada um num processo
+# do pool com o próprio modelo, emendados em ordem no fim. 1 desliga; exige
+# POSE_EXECUTOR=process. Com o pool ocioso, um vídeo de 5 min deixa de ocupar
+# um núcleo só; com a fila cheia os trechos só disputam os mesmos processos.
+SEGMENTS = int(os.environ.get("POSE_SEGMENTS", "1"))
+# Trechos mais curtos que isso (em s de vídeo) não pagam o aquecimento.
+SEGMENT_MIN_SECONDS = float(os.environ.get("POSE_SEGMENT_MIN_SECONDS", "20"))
+# Quadros (já decimados) que cada trecho passa pelo modelo antes da fronteira
+# e descarta: o rastreamento chega a ela já estabilizado, como na extração
+# corrida, em vez de recomeçar pelo detector no primeiro quadro que conta.
+SEGMENT_WARMUP_FRAMES = int(os.environ.get("POSE_SEGMENT_WARMUP_FRAMES", "15"))
+# Progresso publicado e cancelamento conferido a cada tantos quadros. No
+# executor process cada conferência é uma ida ao Manager; de 10 em 10 o custo
+# some diante da inferência e o cancelamento ainda chega em menos de 1 s.
+PROGRESS_EVERY = 10
+# Jobs terminados que GET /jobs/{id} ainda sabe responder.
+JOB_HISTORY = int(os.environ.get("POSE_JOB_HISTORY", "256"))
+
+_local = threading.local()
+_process_pool: ProcessPoolExecutor | None = None
+_process_manager = None
+_process_pool_lock = threading.Lock()
 
 
 def quantize(value: float) -> float:
@@ -84,18 +281,70 @@ def quantize(value: float) -> float:
     return round(float(value), 4)
 
 
+def is_url(path: str) -> bool:
+    return path.startswith(("http://", "https://"))
+
+
+def input_options(path: str) -> list[str]:
+    """Opções de entrada do ffmpeg/ffprobe para ler direto da URL assinada."""
+    if not is_url(path):
+        return []
+    return [
+        # Conexão parada não pode segurar um worker para sempre; queda no
+        # meio retoma do byte onde parou (o R2 aceita Range).
+        "-rw_timeout", str(STREAM_TIMEOUT_SECONDS * 1_000_000),
+        "-reconnect", "1",
+        "-reconnect_on_network_error", "1",
+        "-reconnect_delay_max", "5",
+    ]
+
+
+def open_capture(path: str) -> cv2.VideoCapture:
+    """`cv2.VideoCapture` com os mesmos limites de `input_options` para URL.
+
+    O OpenCV não repassa opções por chamada ao ffmpeg: o reconectar vai pela
+    variável que ele lê a cada abertura, e os prazos pelos parâmetros da
+    captura — sem eles, uma conexão parada segura o worker até o padrão do
+    OpenCV, e uma queda no meio encerra o vídeo como se tivesse acabado.
+    """
+    if not is_url(path):
+        return cv2.VideoCapture(path)
+    os.environ.setdefault(
+        "OPENCV_FFMPEG_CAPTURE_OPTIONS",
+        "reconnect;1|reconnect_on_network_error;1|reconnect_delay_max;5",
+    )
+    timeout_ms = STREAM_TIMEOUT_SECONDS * 1000
+    return cv2.VideoCapture(
+        path,
+        cv2.CAP_FFMPEG,
+        [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms],
+    )
+
+
+def redact(text: str, path: str) -> str:
+    """Tira a URL assinada de mensagens que vão para log e callback."""
+    return text.replace(path, "<vídeo>") if is_url(path) else text
+
+
 def probe_video(path: str) -> dict:
     """Metadados reais do arquivo — não confiamos no que o cliente declarou."""
-    result = subprocess.run(
-        [
-            "ffprobe", "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=width,height,avg_frame_rate,nb_frames",
-            "-show_entries", "format=duration",
-            "-of", "json", path,
-        ],
-        capture_output=True, text=True, check=True,
-    )
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                *input_options(path),
+                "-select_streams", "v:0",
+                "-show_entries", "stream=width,height,avg_frame_rate,nb_frames",
+                "-show_entries", "stream_side_data=rotation:stream_tags=rotate",
+                "-show_entries", "format=duration,size",
+                "-of", "json", path,
+            ],
+            capture_output=True, text=True, check=True,
+        )
+    except subprocess.CalledProcessError as error:
+        # A exceção original carrega o comando inteiro, URL assinada junto.
+        detail = redact((error.stderr or "").strip()[-300:], path)
+        raise RuntimeError(f"ffprobe falhou ({error.returncode}): {detail}") from None
     data = json.loads(result.stdout)
     stream = (data.get("streams") or [{}])[0]
 
@@ -106,94 +355,1288 @@ def probe_video(path: str) -> dict:
     except (ValueError, ZeroDivisionError):
         fps = 0.0
 
+    # Rotação de exibição: o decodificador já entrega o quadro girado, então a
+    # largura e a altura do que sai dele podem vir trocadas.
+    rotation = (stream.get("tags") or {}).get("rotate") or 0
+    for side_data in stream.get("side_data_list") or []:
+        rotation = side_data.get("rotation", rotation)
+
     return {
         "width": int(stream.get("width") or 0),
         "height": int(stream.get("height") or 0),
         "fps": fps,
         "durationMs": int(float(data.get("format", {}).get("duration") or 0) * 1000),
+        "rotation": int(float(rotation)) % 360,
+        "bytes": int(data.get("format", {}).get("size") or 0),
     }
 
 
-def extract_landmarks(video_path: str, meta: dict) -> tuple[list[dict], dict]:
-    capture = cv2.VideoCapture(video_path)
-    if not capture.isOpened():
-        raise RuntimeError("Não foi possível abrir o vídeo para leitura.")
+def acquire_pose(complexity: int = MODEL_COMPLEXITY):
+    """Pose do worker atual, carregado uma vez e reaproveitado entre jobs.
+
+    Carregar o heavy custa segundos; pagar isso por job é desperdício. O
+    `reset()` reinicia o grafo, para o rastreamento de um vídeo não vazar para
+    o próximo. Um por complexidade: a política pode alternar entre heavy e
+    full sem recarregar a cada troca.
+    """
+    poses = _local.__dict__.setdefault("poses", {})
+    pose = poses.get(complexity)
+    if pose is None:
+        pose = mp.solutions.pose.Pose(
+            static_image_mode=False,
+            model_complexity=complexity,
+            enable_segmentation=False,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5,
+        )
+        poses[complexity] = pose
+    else:
+        pose.reset()
+    return pose
+
+
+def warm_up() -> None:
+    """Carrega o modelo padrão e passa um quadro preto por ele.
+
+    O primeiro `process` inicializa o grafo e os delegates do TFLite — custa
+    quase tanto quanto carregar o modelo. Pago aqui, antes de o servidor se
+    declarar pronto, e não pelo primeiro paciente.
+    """
+    acquire_pose(MODEL_COMPLEXITY).process(np.zeros((256, 256, 3), np.uint8))
+
+
+def _ignore_sigterm() -> None:
+    # Quem encerra os filhos é o pai, depois de drenar; um SIGTERM dado ao
+    # grupo inteiro não pode derrubar a extração que o pai ainda espera.
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+def _init_pool_process() -> None:
+    _ignore_sigterm()
+    warm_up()
+
+
+def _pool_pid() -> int:
+    time.sleep(0.05)
+    return os.getpid()
+
+
+def new_process_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool de inferência; cada processo aquece o modelo ao nascer."""
+    # spawn, não fork: o processo pai tem threads vivas e um fork no meio
+    # delas herda locks travados.
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_pool_process)
+
+
+def start_process_pool(workers: int) -> None:
+    """Sobe os processos de inferência e o Manager que os liga às threads."""
+    global _process_pool, _process_manager
+    _process_pool = new_process_pool(workers)
+    # Progresso e cancelamento precisam atravessar a fronteira do processo.
+    _process_manager = SyncManager(ctx=multiprocessing.get_context("spawn"))
+    _process_manager.start(_ignore_sigterm)
+
+
+def replace_broken_pool(broken: ProcessPoolExecutor) -> None:
+    """Troca um pool quebrado por um novo e tira o servidor do /ready até ele
+    aquecer.
+
+    Um processo morto (OOM, segfault no TFLite) quebra o `ProcessPoolExecutor`
+    inteiro: sem a troca, todo job seguinte nesta instância — inclusive o
+    reenvio do mesmo jobId, que o Worker manda para a mesma instância —
+    falharia na hora. Vários jobs percebem a quebra ao mesmo tempo; só o
+    primeiro troca.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not broken:
+            return
+        _process_pool = new_process_pool(JOBS.workers)
+    broken.shutdown(wait=False, cancel_futures=True)
+    log.error("processo de inferência morreu; pool refeito")
+    METRICS.inc("pose_pool_rebuilds_total")
+    JOBS.rewarm_pool()
+
+
+def pool_result(pool: ProcessPoolExecutor, future):
+    """`future.result()` de uma tarefa do pool, trocando o pool se ele quebrou."""
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        replace_broken_pool(pool)
+        raise RuntimeError(
+            "Um processo de inferência morreu durante a extração (memória?); reenvie o job.",
+        ) from None
+
+
+def wait_process_pool(workers: int) -> None:
+    """Volta quando todos os processos do pool terminaram o aquecimento.
+
+    O pool cria processos sob demanda, e uma tarefa só roda num processo que
+    já passou pelo inicializador: quando `workers` pids distintos tiverem
+    respondido, todos estão quentes.
+    """
+    seen: set[int] = set()
+    while len(seen) < workers:
+        seen.update(future.result() for future in [_process_pool.submit(_pool_pid) for _ in range(workers)])
+
+
+def stop_process_pool() -> None:
+    """Encerra os processos de inferência e o Manager, se existirem."""
+    global _process_pool, _process_manager
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+    if _process_manager is not None:
+        _process_manager.shutdown()
+        _process_manager = None
+
+
+def run_extraction(video_path: str, meta: dict, frames_path: str, *options) -> dict:
+    """`extract_landmarks` aqui ou num processo do pool; `options` segue a
+    assinatura dela."""
+    pool = _process_pool
+    if pool is None:
+        return extract_landmarks(video_path, meta, frames_path, *options)
+    try:
+        future = pool.submit(extract_landmarks, video_path, meta, frames_path, *options)
+    except BrokenProcessPool:
+        # Quebrado por outro job antes deste chegar: troca e tenta uma vez.
+        replace_broken_pool(pool)
+        pool = _process_pool
+        future = pool.submit(extract_landmarks, video_path, meta, frames_path, *options)
+    return pool_result(pool, future)
+
+
+class JobCancelled(Exception):
+    """Cancelamento pedido por DELETE /jobs/{id}."""
+
+
+class Progress:
+    """Contador de quadros e sinal de cancelamento de uma extração.
+
+    No executor thread são objetos locais. No process, proxies de um Manager:
+    a extração roda em outro interpretador, e é o pai que lê o contador e
+    aciona o cancelamento.
+    """
+
+    def __init__(self, frames, cancel) -> None:
+        self.frames = frames
+        self.cancel = cancel
+        self.parts: list[Progress] = []
+
+    def report(self, emitted: int) -> None:
+        """Publica os quadros já gravados e interrompe se pediram cancelamento."""
+        self.frames.value = emitted
+        if self.cancel.is_set():
+            raise JobCancelled("Job cancelado.")
+
+    def part(self) -> "Progress":
+        """Contador próprio para um trecho da extração segmentada, com o mesmo
+        sinal de cancelamento do job."""
+        part = Progress(new_counter(), self.cancel)
+        self.parts.append(part)
+        return part
+
+    @property
+    def total(self) -> int:
+        return self.frames.value + sum(part.frames.value for part in self.parts)
+
+
+def new_counter():
+    if _process_manager is None:
+        return types.SimpleNamespace(value=0)
+    return _process_manager.Value("i", 0)
+
+
+def new_progress() -> Progress:
+    cancel = threading.Event() if _process_manager is None else _process_manager.Event()
+    return Progress(new_counter(), cancel)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss vem em KiB no Linux e só sobe: é o pico do processo até agora.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def elapsed_ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+class Trace:
+    """Spans de um job, para dizer se a lentidão foi da rede, do codec ou do
+    modelo. Vai no callback e, com `POSE_TRACE_FILE`, numa linha JSONL.
+
+    Cada span leva tempo de parede, CPU e o pico de RSS do processo ao fim
+    dele — como o pico só sobe, é o salto entre dois spans que aponta quem
+    alocou. A CPU é do processo inteiro: no executor thread com vários workers
+    ela inclui os jobs vizinhos; no process a extração roda sozinha no seu
+    processo, e o span dela é medido lá.
+    """
+
+    def __init__(self) -> None:
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: list[dict] = []
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        """Mede o bloco. O dict entregue ao bloco pode sobrescrever campos
+        medidos por quem enxerga melhor — a extração, no outro processo."""
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        extra: dict = {}
+        try:
+            yield extra
+        except BaseException:
+            extra["failed"] = True
+            raise
+        finally:
+            measured = {
+                "startMs": elapsed_ms(started - self._origin),
+                "wallMs": elapsed_ms(time.perf_counter() - started),
+                "cpuMs": elapsed_ms(time.process_time() - cpu_started),
+            }
+            self.add(name, **{**measured, **extra})
+
+    def add(self, name: str, **fields) -> None:
+        span = {"name": name, **fields}
+        span.setdefault("peakRssMb", peak_rss_mb())
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"spans": list(self.spans)}
+
+
+# Fases de um job, na ordem. Nas de trabalho um cancelamento pendente
+# interrompe o job logo na entrada; as demais só registram tempo.
+PHASES = ("queued", "download", "probe", "extract", "upload", "notify", "succeeded", "failed", "cancelled")
+CANCELLABLE_PHASES = ("download", "probe", "extract", "upload")
+FINAL_PHASES = ("succeeded", "failed", "cancelled")
+
+
+class JobStatus:
+    """O que GET /jobs/{id} mostra de um job: fase atual, tempo gasto em cada
+    fase e quadros processados contra os estimados."""
+
+    def __init__(self, job_id: str) -> None:
+        self.job_id = job_id
+        self.phase = "queued"
+        self.progress = new_progress()
+        self.frames_estimated = 0
+        self.trace = Trace()
+        self.retryable = False
+        self._lock = threading.Lock()
+        self._phase_started = time.monotonic()
+        self._elapsed: dict[str, float] = {}
+
+    @property
+    def finished(self) -> bool:
+        return self.phase in FINAL_PHASES
+
+    def enter(self, phase: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._elapsed[self.phase] = self._elapsed.get(self.phase, 0.0) + now - self._phase_started
+            self.phase = phase
+            self._phase_started = now
+        if phase in CANCELLABLE_PHASES and self.progress.cancel.is_set():
+            raise JobCancelled("Job cancelado.")
+
+    def cancel(self, retryable: bool = False) -> bool:
+        """Pede o cancelamento; False se o job já terminou.
+
+        `retryable`: foi o container que desistiu (encerramento), não quem
+        pediu o job — o callback avisa que vale reenviar.
+        """
+        if self.finished:
+            return False
+        self.retryable = self.retryable or retryable
+        self.progress.cancel.set()
+        return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            phase = self.phase
+            elapsed = dict(self._elapsed)
+            if phase not in FINAL_PHASES:
+                elapsed[phase] = elapsed.get(phase, 0.0) + time.monotonic() - self._phase_started
+        return {
+            "jobId": self.job_id,
+            "phase": phase,
+            "framesProcessed": self.progress.total,
+            "framesEstimated": self.frames_estimated,
+            "elapsedMs": {name: round(elapsed[name] * 1000, 1) for name in PHASES if name in elapsed},
+            "cancelRequested": self.progress.cancel.is_set(),
+        }
+
+
+class FrameRing:
+    """Anel de buffers RGB pré-alocados entre o decodificador e a inferência.
+
+    O decodificador pega um slot livre, escreve o quadro direto nele e o
+    publica em `ready` como (slot, índice na fonte, segundos de decodificação);
+    a inferência consome e devolve o slot a `free`. Com o
+    anel limitado, um decodificador mais rápido que o modelo espera em vez de
+    acumular quadros de 6 MB na memória.
+    """
+
+    def __init__(self, slots: int) -> None:
+        self.slots = max(2, slots)
+        self.buffers: list[np.ndarray | None] = [None] * self.slots
+        self.free: queue.Queue = queue.Queue()
+        self.ready: queue.Queue = queue.Queue()
+        for slot in range(self.slots):
+            self.free.put(slot)
+
+    def acquire(self, stop: threading.Event, timings: dict) -> int | None:
+        """Slot livre para o próximo quadro, ou None se a inferência parou."""
+        started = time.perf_counter()
+        slot = self.free.get()
+        timings["decodeBlocked"] += time.perf_counter() - started
+        return None if stop.is_set() else slot
+
+
+_END_OF_STREAM = object()
+
+
+class OpenCvSource:
+    """Decodificação pelo OpenCV: quadro BGR inteiro, convertido em Python."""
+
+    def __init__(self, video_path: str, meta: dict, time_range: dict | None = None, skip: int = 0) -> None:
+        self.capture = open_capture(video_path)
+        if not self.capture.isOpened():
+            raise RuntimeError("Não foi possível abrir o vídeo para leitura.")
+        self.fps = meta["fps"] or self.capture.get(cv2.CAP_PROP_FPS) or TARGET_FPS
+        self.frame_limit = None
+        self.skip = skip
+        start = 0
+        if time_range:
+            start, self.frame_limit = range_frames(time_range, self.fps)
+        if start + skip:
+            # Por número de quadro, não por ms: o backend FFmpeg do OpenCV
+            # busca o keyframe anterior e decodifica até o quadro exato.
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, start + skip)
+
+    def produce(self, step: int, ring: FrameRing, stop: threading.Event, timings: dict) -> None:
+        # Índices contam do início do trecho, mesmo retomando do meio dele.
+        source_index = self.skip
+        # Custo do quadro entregue, incluindo os grab() dos descartados antes dele.
+        spent = 0.0
+        while not stop.is_set():
+            if self.frame_limit is not None and source_index >= self.frame_limit:
+                return
+            # grab() só avança o demuxer/decoder; a conversão para BGR fica no
+            # retrieve(), que só roda para o quadro que vai ao modelo. Em 60 ou
+            # 120 fps, metade ou três quartos dos quadros nunca são convertidos.
+            keep = source_index % step == 0
+            started = time.perf_counter()
+            ok = self.capture.grab()
+            if ok and keep:
+                ok, frame = self.capture.retrieve()
+            elapsed = time.perf_counter() - started
+            timings["decode"] += elapsed
+            spent += elapsed
+            if not ok:
+                return
+
+            if not keep:
+                source_index += 1
+                continue
+
+            slot = ring.acquire(stop, timings)
+            if slot is None:
+                return
+
+            started = time.perf_counter()
+            ring.buffers[slot] = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=ring.buffers[slot])
+            elapsed = time.perf_counter() - started
+            timings["decode"] += elapsed
+
+            ring.ready.put((slot, source_index, spent + elapsed))
+            source_index += 1
+            spent = 0.0
+
+    def release(self) -> None:
+        self.capture.release()
+
 
-    source_fps = meta["fps"] or capture.get(cv2.CAP_PROP_FPS) or TARGET_FPS
+class FfmpegSource:
+    """Decodificação por `ffmpeg` em subprocesso, já em rgb24 e já decimada.
+
+    O filtro `select` descarta os quadros fora do passo dentro do ffmpeg, antes
+    de escalar e converter — e, por ser seleção por índice e não o filtro
+    `fps`, o k-ésimo quadro que sai é exatamente o quadro k·passo da fonte, com
+    o timestamp ancorado nele. A redução de resolução também acontece no
+    decoder: o Python nunca vê o 4K.
+    """
+
+    def __init__(
+        self,
+        video_path: str,
+        meta: dict,
+        step: int,
+        max_long_edge: int,
+        time_range: dict | None = None,
+        skip: int = 0,
+    ) -> None:
+        self.fps = meta["fps"] or TARGET_FPS
+        self.step = step
+        self.frame_limit = None
+        # `skip` é múltiplo do passo: o quadro seguinte ao último emitido.
+        self.first_kept = skip // step
+        seek = []
+        start_seconds = 0.0
+        if time_range:
+            start, self.frame_limit = range_frames(time_range, self.fps)
+            start_seconds = time_range["startMs"] / 1000
+        if skip:
+            # Meio quadro antes do alvo: o accurate_seek entrega o primeiro
+            # quadro com pts >= -ss, e o arredondamento do tempo não pode
+            # empurrar o alvo para depois do pts dele.
+            start_seconds = ((start if time_range else 0) + skip - 0.5) / self.fps
+        if start_seconds:
+            # -ss antes do -i: o demuxer pula para o keyframe anterior e o
+            # decoder descarta até o instante exato (accurate_seek, padrão).
+            # O -t de entrada para de ler no fim; o `frame_limit` corta o
+            # quadro a mais que o arredondamento possa deixar passar.
+            seek = ["-ss", f"{start_seconds:.4f}"]
+        if time_range and time_range.get("endMs") is not None:
+            seek += ["-t", f"{time_range['endMs'] / 1000 - start_seconds:.4f}"]
+        width, height = meta["width"], meta["height"]
+        if meta.get("rotation") in (90, 270):
+            width, height = height, width
+        if not width or not height:
+            raise RuntimeError("Não foi possível abrir o vídeo para leitura.")
+        self.width, self.height = scaled_size(width, height, max_long_edge)
+        self.frame_bytes = self.width * self.height * 3
+
+        filters = [rf"select=not(mod(n\,{step}))"]
+        if (self.width, self.height) != (width, height):
+            # area: média dos pixels de origem, sem o serrilhado do bilinear ao
+            # reduzir muito — borda serrilhada vira jitter de landmark.
+            filters.append(f"scale={self.width}:{self.height}:flags=area")
+
+        self.video_path = video_path
+        self._stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [
+                "ffmpeg", "-v", "error", "-nostdin",
+                *input_options(video_path),
+                *seek,
+                "-i", video_path,
+                "-an", "-sn", "-dn",
+                "-vf", ",".join(filters),
+                "-fps_mode", "passthrough",
+                "-pix_fmt", "rgb24",
+                "-f", "rawvideo", "pipe:1",
+            ],
+            stdout=subprocess.PIPE,
+            # Arquivo, não PIPE: um vídeo corrompido pode encher o pipe de
+            # stderr e travar o ffmpeg enquanto lemos só o stdout.
+            stderr=self._stderr,
+            bufsize=0,
+        )
+
+    def produce(self, step: int, ring: FrameRing, stop: threading.Event, timings: dict) -> None:
+        kept = self.first_kept
+        while not stop.is_set():
+            if self.frame_limit is not None and kept * self.step >= self.frame_limit:
+                return
+            slot = ring.acquire(stop, timings)
+            if slot is None:
+                return
+            if ring.buffers[slot] is None:
+                # View numpy sobre um bytearray: o ffmpeg escreve direto na
+                # memória que o modelo lê, sem cópia nem alocação por quadro.
+                ring.buffers[slot] = np.frombuffer(
+                    bytearray(self.frame_bytes), dtype=np.uint8,
+                ).reshape(self.height, self.width, 3)
+
+            started = time.perf_counter()
+            ok = self._read_into(ring.buffers[slot])
+            elapsed = time.perf_counter() - started
+            timings["decode"] += elapsed
+            if not ok:
+                ring.free.put(slot)
+                self._check_exit(kept - self.first_kept)
+                return
+
+            ring.ready.put((slot, kept * self.step, elapsed))
+            kept += 1
+
+    def _read_into(self, buffer: np.ndarray) -> bool:
+        view = memoryview(buffer).cast("B")
+        filled = 0
+        while filled < self.frame_bytes:
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                return False
+            filled += count
+        return True
+
+    def _check_exit(self, kept: int) -> None:
+        code = self.process.wait()
+        if code != 0 and kept == 0:
+            self._stderr.seek(0)
+            detail = redact(self._stderr.read().decode("utf-8", "replace").strip()[-300:], self.video_path)
+            raise RuntimeError(f"ffmpeg falhou ao decodificar ({code}): {detail}")
+
+    def release(self) -> None:
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdout.close()
+        self._stderr.close()
+
+
+def scaled_size(width: int, height: int, max_long_edge: int) -> tuple[int, int]:
+    """Reduz mantendo a proporção; dimensões pares, exigência do rgb24 do swscale."""
+    long_edge = max(width, height)
+    if not max_long_edge or long_edge <= max_long_edge:
+        return width, height
+    scale = max_long_edge / long_edge
+    return max(2, int(round(width * scale / 2)) * 2), max(2, int(round(height * scale / 2)) * 2)
+
+
+def open_source(
+    video_path: str, meta: dict, max_long_edge: int = 0, time_range: dict | None = None, skip: int = 0,
+):
+    """Abre o decodificador configurado. Devolve a fonte e o passo de decimação.
+
+    `skip`: quadros da fonte já processados desde o início do trecho, para
+    retomar de um checkpoint.
+    """
+    if DECODER == "ffmpeg":
+        source_fps = meta["fps"] or TARGET_FPS
+        step = decimation_step(source_fps)
+        return FfmpegSource(video_path, meta, step, max_long_edge, time_range, skip), step
+    source = OpenCvSource(video_path, meta, time_range, skip)
+    return source, decimation_step(source.fps)
+
+
+def range_frames(time_range: dict, fps: float) -> tuple[int, int | None]:
+    """Quadro inicial e quantos quadros da fonte o trecho tem (None: até o fim)."""
+    start = int(round(time_range["startMs"] * fps / 1000))
+    if time_range.get("endMs") is None:
+        return start, None
+    return start, max(0, int(round(time_range["endMs"] * fps / 1000)) - start)
+
+
+def decimation_step(source_fps: float) -> int:
     # Decima para ~30 Hz mantendo o passo inteiro, para o timestamp continuar
     # ancorado no frame real do vídeo em vez de num tempo interpolado.
-    step = max(1, int(round(source_fps / TARGET_FPS)))
+    return max(1, int(round(source_fps / TARGET_FPS)))
+
+
+def decode_frames(source, step: int, ring: FrameRing, stop: threading.Event, timings: dict) -> None:
+    """Produtor: enche o anel com quadros RGB até o fim do vídeo ou o stop."""
+    cpu_started = time.thread_time()
+    try:
+        source.produce(step, ring, stop, timings)
+    except Exception as error:  # noqa: BLE001 — repassado para a thread de inferência
+        ring.ready.put(error)
+        return
+    finally:
+        # Lido só depois do join() da thread, então não precisa de lock.
+        timings["decodeCpu"] = time.thread_time() - cpu_started
+    ring.ready.put(_END_OF_STREAM)
+
+
+def quantize_array(values: np.ndarray) -> np.ndarray:
+    """`quantize` vetorizado, com resultado idêntico bit a bit."""
+    clean = np.where(np.isfinite(values), values, 0.0)
+    scaled = clean * 1e4
+    rounded = np.rint(scaled) / 1e4
+    # O round() do Python arredonda o decimal exato; rint arredonda x·10⁴ já
+    # em ponto flutuante. Os dois só podem discordar quando x·10⁴ cai a um fio
+    # de ,5 — esses poucos vão pelo caminho escalar, e o byte não muda.
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(float(value), 4) for value in clean[near_half]]
+    return rounded
+
+
+# Frame sem pessoa detectada entra como buraco explícito, com stride fixo. O
+# pipeline rejeita a métrica se houver buracos demais — em vez de interpolar
+# por cima e parecer medida.
+_EMPTY_POINTS = ",".join(["0.0"] * (LANDMARK_COUNT * 4))
+
+
+class PersonRoi:
+    """Janela do quadro entregue ao modelo no modo `POSE_ROI=person`.
+
+    Parte do quadro inteiro; depois de cada detecção, a janela passa a ser a
+    caixa dos landmarks com `ROI_PADDING` de folga. Ela fica parada enquanto a
+    pessoa couber dentro com `ROI_MARGIN` — o MediaPipe rastreia pelo quadro
+    anterior, e uma janela que anda a cada quadro desloca a pessoa dentro da
+    imagem que ele vê. Sem pessoa, volta ao quadro inteiro e o detector do
+    próprio MediaPipe a reencontra.
+
+    Não há `reset()` na troca de janela: forçaria o detector, que custa mais
+    do que o recorte economiza.
+    """
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.window: tuple[int, int, int, int] | None = None
+        self.cropped = 0
+        self.moves = 0
+        self.losses = 0
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """A parte do quadro que vai para o modelo. Uma view, sem cópia: o
+        MediaPipe copia a entrada de qualquer jeito."""
+        if self.window is None:
+            return frame
+        self.cropped += 1
+        x0, y0, x1, y1 = self.window
+        return frame[y0:y1, x0:x1]
+
+    def observe(self, points: np.ndarray | None) -> None:
+        """Leva `points`, normalizados na janela usada, ao quadro inteiro (no
+        lugar) e reposiciona a janela para o próximo quadro."""
+        if points is None:
+            if self.window is not None:
+                self.window = None
+                self.losses += 1
+            return
+        if self.window is not None:
+            x0, y0, x1, y1 = self.window
+            points[:, 0] = (points[:, 0] * (x1 - x0) + x0) / self.width
+            points[:, 1] = (points[:, 1] * (y1 - y0) + y0) / self.height
+            # O z do MediaPipe está na escala do x.
+            points[:, 2] *= (x1 - x0) / self.width
+
+        xs = np.clip(points[:, 0], 0.0, 1.0) * self.width
+        ys = np.clip(points[:, 1], 0.0, 1.0) * self.height
+        left, right, top, bottom = xs.min(), xs.max(), ys.min(), ys.max()
+        if self.window is not None:
+            margin_x = (right - left) * ROI_MARGIN
+            margin_y = (bottom - top) * ROI_MARGIN
+            x0, y0, x1, y1 = self.window
+            if left - margin_x >= x0 and top - margin_y >= y0 and right + margin_x <= x1 and bottom + margin_y <= y1:
+                return
+
+        pad_x = (right - left) * ROI_PADDING
+        pad_y = (bottom - top) * ROI_PADDING
+        window = (
+            max(0, int(left - pad_x)),
+            max(0, int(top - pad_y)),
+            min(self.width, int(np.ceil(right + pad_x))),
+            min(self.height, int(np.ceil(bottom + pad_y))),
+        )
+        if window[2] - window[0] < 2 or window[3] - window[1] < 2 or window == (0, 0, self.width, self.height):
+            window = None
+        if window != self.window:
+            self.moves += 1
+        self.window = window
+
+    def stats(self) -> dict:
+        return {"mode": "person", "croppedFrames": self.cropped, "windowMoves": self.moves, "trackingLost": self.losses}
+
+
+def landmark_frame(
+    result, index: int, source_index: int, source_fps: float, roi: PersonRoi | None = None,
+) -> tuple[str, float]:
+    """Linha `ff-pose-33-v1` do quadro e a confiança média dele.
+
+    Os 33 pontos viram uma matriz (33, 4) quantizada numa operação só, e a
+    linha é montada direto em texto: `repr` de float é exatamente o que o
+    `json.dumps` escreveria. Com `roi`, os pontos vieram de um recorte e são
+    levados ao quadro inteiro antes de quantizar.
+    """
+    t = int(round((source_index / source_fps) * 1000)) if source_fps else 0
+
+    if result.pose_landmarks:
+        points = np.array(
+            [(lm.x, lm.y, lm.z, lm.visibility) for lm in result.pose_landmarks.landmark],
+            dtype=np.float64,
+        )
+        # + 0.0 transforma -0.0 em 0.0, como o antigo `visibility or 0.0`.
+        points[:, 3] += 0.0
+        if roi is not None:
+            roi.observe(points)
+        confidence = quantize(float(np.mean(points[:, 3])))
+        flat = ",".join(map(repr, quantize_array(points).ravel().tolist()))
+    else:
+        if roi is not None:
+            roi.observe(None)
+        confidence = 0.0
+        flat = _EMPTY_POINTS
+
+    return f'{{"i":{index},"t":{t},"k":[{flat}],"c":{confidence!r}}}', confidence
+
+
+class FrameWriter:
+    """Grava cada quadro no spool assim que sai do modelo.
+
+    O cabeçalho do bundle depende do total de quadros, então ele só é escrito
+    no upload; aqui vão apenas as linhas de quadro, cada uma precedida de
+    `\\n`. A memória do job fica constante, seja o vídeo de 5 s ou de 5 min.
+    """
+
+    def __init__(self, path: str, resume: dict | None = None) -> None:
+        # Retomando, o spool já traz os quadros do checkpoint: acrescenta.
+        self._handle = open(path, "a" if resume else "w", encoding="utf-8")
+        self.count = resume["frames"] if resume else 0
+        self.usable = resume["usable"] if resume else 0
+
+    def add(self, line: str, confidence: float) -> None:
+        self._handle.write("\n")
+        self._handle.write(line)
+        self.count += 1
+        if confidence >= 0.5:
+            self.usable += 1
+
+    def flush(self) -> None:
+        self._handle.flush()
+
+    def close(self) -> None:
+        self._handle.close()
+
+
+class Checkpoint:
+    """Cópia do spool de um job fora do diretório temporário dele.
+
+    Cresce só com os bytes novos a cada gravação, e o `state.json`, gravado
+    por último e por rename, diz até onde a cópia vale: uma queda no meio da
+    cópia deixa bytes a mais no fim, que a retomada corta. Sobrevive ao job
+    que falhou e é apagado quando o bundle chega ao R2.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self._frames = os.path.join(root, "frames.ndjson")
+        self._state = os.path.join(root, "state.json")
+        self._saved = 0
+
+    def restore(self, frames_path: str) -> dict | None:
+        """Põe em `frames_path` os quadros salvos e devolve o estado deles, ou
+        None quando não há de onde retomar."""
+        os.makedirs(self.root, exist_ok=True)
+        os.utime(self.root)
+        try:
+            with open(self._state, encoding="utf-8") as handle:
+                state = json.load(handle)
+        except (OSError, ValueError):
+            state = None
+        with open(self._frames, "ab") as handle:
+            if state and handle.tell() < state["bytes"]:
+                state = None
+            handle.truncate(state["bytes"] if state else 0)
+        if state:
+            shutil.copyfile(self._frames, frames_path)
+            self._saved = state["bytes"]
+        return state
+
+    def save(self, frames_path: str, state: dict) -> None:
+        """Acrescenta o que o spool ganhou desde a última gravação. O spool
+        precisa estar com o buffer descarregado."""
+        with open(frames_path, "rb") as source, open(self._frames, "ab") as target:
+            source.seek(self._saved)
+            shutil.copyfileobj(source, target)
+            self._saved = target.tell()
+        staging = self._state + ".tmp"
+        with open(staging, "w", encoding="utf-8") as handle:
+            json.dump({**state, "bytes": self._saved}, handle)
+        os.replace(staging, self._state)
+
+    def discard(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def checkpoint_path(result_key: str, video_id: str, settings: dict) -> str:
+    """Diretório do checkpoint. O resultKey entra na chave: o Worker o repete
+    ao reenviar a mesma captura com outro jobId, e o spool parcial é daquele
+    resultado, não do conteúdo — não vai para o resultado de outra captura."""
+    return os.path.join(CHECKPOINT_DIR, cache_key(f"{result_key}|{video_id}", settings))
+
+
+def purge_checkpoints() -> None:
+    """Apaga checkpoints de jobs que não voltaram a tempo."""
+    cutoff = time.time() - CHECKPOINT_MAX_AGE_SECONDS
+    with contextlib.suppress(FileNotFoundError):
+        for name in os.listdir(CHECKPOINT_DIR):
+            entry = os.path.join(CHECKPOINT_DIR, name)
+            with contextlib.suppress(FileNotFoundError):
+                if os.path.getmtime(entry) < cutoff:
+                    shutil.rmtree(entry, ignore_errors=True)
+
+
+def extract_landmarks(
+    video_path: str,
+    meta: dict,
+    frames_path: str,
+    progress: Progress | None = None,
+    variant: dict | None = None,
+    time_range: dict | None = None,
+    checkpoint_root: str | None = None,
+    segment: dict | None = None,
+) -> dict:
+    """`time_range` ({startMs, endMs}) restringe a um trecho; o `t` dos quadros
+    conta a partir do início dele.
+
+    Com `checkpoint_root`, retoma do checkpoint que houver lá e o atualiza a
+    cada `CHECKPOINT_EVERY` quadros e ao sair, inclusive por erro ou
+    cancelamento. O rastreamento do MediaPipe recomeça no ponto de retomada,
+    então os quadros logo depois dele podem diferir de uma extração corrida.
+
+    `segment` ({skip, keepFrom, end}, em quadros da fonte contados do início
+    do trecho) extrai só uma parte, para `run_segmented`: começa a decodificar
+    em `skip`, passa pelo modelo sem gravar até `keepFrom` e para em `end`. O
+    `i` de cada quadro sai do índice na fonte, para as partes emendarem.
+    """
+    variant = variant or default_variant()
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    checkpoint = Checkpoint(checkpoint_root) if checkpoint_root else None
+    resume = checkpoint.restore(frames_path) if checkpoint else None
+    if resume and resume["complete"]:
+        # A inferência já tinha terminado; faltou o upload ou o callback.
+        return resumed_extraction(variant, time_range, resume, time.process_time() - cpu_started)
+
+    skip = resume["nextSourceIndex"] if resume else segment["skip"] if segment else 0
+    keep_from = segment["keepFrom"] if segment else 0
+    end = segment["end"] if segment else None
+    warmup = 0
+    source, step = open_source(video_path, meta, variant["maxLongEdge"], time_range, skip)
+    source_fps = source.fps
     effective_fps = source_fps / step
 
-    frames: list[dict] = []
-    source_index = 0
-    emitted = 0
+    writer = FrameWriter(frames_path, resume)
+    emitted = writer.count
+    next_source_index = skip
+    completed = False
 
-    pose = mp.solutions.pose.Pose(
-        static_image_mode=False,
-        model_complexity=2,          # o mais preciso; o custo é aceitável em 4 vCPU
-        enable_segmentation=False,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5,
+    pose = acquire_pose(variant["modelComplexity"])
+
+    # Decodificação e inferência em paralelo: decoder e MediaPipe soltam o GIL
+    # no trabalho pesado, então enquanto o modelo roda o próximo quadro já
+    # está sendo decodificado.
+    ring = FrameRing(RING_FRAMES)
+    stop = threading.Event()
+    timings = {"decode": 0.0, "decodeBlocked": 0.0, "inference": 0.0, "inferenceWait": 0.0, "decodeCpu": 0.0}
+    # Histogramas locais, devolvidos junto com a extração: no executor process
+    # este código roda em outro processo, e é o pai que os soma ao /metrics.
+    decode_hist = Histogram(FRAME_BUCKETS)
+    inference_hist = Histogram(FRAME_BUCKETS)
+    roi = None
+    decoder = threading.Thread(
+        target=decode_frames, args=(source, step, ring, stop, timings), name="pose-decoder", daemon=True,
     )
+    decoder.start()
 
     try:
         while emitted < MAX_FRAMES:
-            ok, frame = capture.read()
-            if not ok:
+            started = time.perf_counter()
+            item = ring.ready.get()
+            timings["inferenceWait"] += time.perf_counter() - started
+            if item is _END_OF_STREAM:
                 break
+            if isinstance(item, Exception):
+                raise item
 
-            if source_index % step != 0:
-                source_index += 1
+            slot, source_index, decode_seconds = item
+            if end is not None and source_index >= end:
+                ring.free.put(slot)
+                break
+            frame = ring.buffers[slot]
+            if ROI_MODE == "person" and roi is None:
+                # Pelo quadro decodificado, não pelo ffprobe: o decoder ffmpeg
+                # pode ter reduzido.
+                roi = PersonRoi(frame.shape[1], frame.shape[0])
+            started = time.perf_counter()
+            result = pose.process(roi.crop(frame) if roi else frame)
+            index = source_index // step if segment else emitted
+            line, confidence = landmark_frame(result, index, source_index, source_fps, roi)
+            if source_index >= keep_from:
+                writer.add(line, confidence)
+            elapsed = time.perf_counter() - started
+            timings["inference"] += elapsed
+            ring.free.put(slot)
+            decode_hist.observe(decode_seconds)
+            inference_hist.observe(elapsed)
+            if source_index < keep_from:
+                warmup += 1
                 continue
 
-            result = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-
-            flat: list[float] = []
-            scores: list[float] = []
-
-            if result.pose_landmarks:
-                for landmark in result.pose_landmarks.landmark:
-                    score = float(getattr(landmark, "visibility", 1.0) or 0.0)
-                    flat.extend([
-                        quantize(landmark.x),
-                        quantize(landmark.y),
-                        quantize(landmark.z),
-                        quantize(score),
-                    ])
-                    scores.append(score)
-            else:
-                # Frame sem pessoa detectada entra como buraco explícito, com
-                # stride fixo. O pipeline rejeita a métrica se houver buracos
-                # demais — em vez de interpolar por cima e parecer medida.
-                flat = [0.0] * (LANDMARK_COUNT * 4)
-                scores = [0.0]
-
-            frames.append({
-                "i": emitted,
-                "t": int(round((source_index / source_fps) * 1000)) if source_fps else 0,
-                "k": flat,
-                "c": quantize(float(np.mean(scores))),
-            })
-
             emitted += 1
-            source_index += 1
+            next_source_index = source_index + step
+            if checkpoint and emitted % CHECKPOINT_EVERY == 0:
+                writer.flush()
+                checkpoint.save(frames_path, checkpoint_state(writer, next_source_index, effective_fps, False))
+            # Cancelar só entre quadros: o spool fica consistente e o
+            # MediaPipe nunca é interrompido no meio de um `process`.
+            if progress is not None and emitted % PROGRESS_EVERY == 0:
+                progress.report(emitted)
+        completed = True
     finally:
-        pose.close()
-        capture.release()
+        # Destrava o decodificador se ele estiver esperando slot e só solta a
+        # fonte depois que ele parou de ler.
+        stop.set()
+        while decoder.is_alive():
+            try:
+                item = ring.ready.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            if isinstance(item, tuple):
+                ring.free.put(item[0])
+        decoder.join()
+        source.release()
+        writer.close()
+        if checkpoint and writer.count > (resume["frames"] if resume else 0):
+            # Também no erro e no cancelamento: o que já saiu do modelo é o
+            # que o job reenviado não precisa refazer.
+            try:
+                checkpoint.save(
+                    frames_path, checkpoint_state(writer, next_source_index, effective_fps, completed),
+                )
+            except OSError as exc:
+                log.warning("checkpoint não gravado: %s", exc)
 
+    if progress is not None:
+        progress.report(emitted)
     truncated = emitted >= MAX_FRAMES
-    return frames, {"fps": effective_fps, "truncated": truncated}
+    span = extraction_span(timings, time.process_time() - cpu_started)
+    if resume:
+        span["resumedFrom"] = resume["frames"]
+    if segment:
+        # A parede de cada parte, sem a espera por um processo livre.
+        span.update(wallMs=elapsed_ms(time.perf_counter() - wall_started), warmupFrames=warmup)
+    return {
+        "variant": variant,
+        "timeRange": time_range,
+        "fps": effective_fps,
+        "truncated": truncated,
+        "frameCount": writer.count,
+        "usableFrames": writer.usable,
+        "timings": stage_timings(timings, ring.slots),
+        "roi": roi_summary(roi),
+        "frameMetrics": {"decode": decode_hist, "inference": inference_hist},
+        "span": span,
+    }
+
 
+def roi_summary(roi: PersonRoi | None) -> dict | None:
+    """Sem recorte criado — retomada sem quadro novo — o modo ainda vale
+    para os quadros do checkpoint, e o cabeçalho precisa dele."""
+    if roi is not None:
+        return roi.stats()
+    return {"mode": ROI_MODE} if ROI_MODE != "off" else None
+
+
+def checkpoint_state(writer: FrameWriter, next_source_index: int, fps: float, complete: bool) -> dict:
+    """`nextSourceIndex` conta do início do trecho, como o `source_index`."""
+    return {
+        "frames": writer.count,
+        "usable": writer.usable,
+        "nextSourceIndex": next_source_index,
+        "fps": fps,
+        "complete": complete,
+        "truncated": complete and writer.count >= MAX_FRAMES,
+    }
+
+
+def resumed_extraction(variant: dict, time_range: dict | None, state: dict, cpu_seconds: float) -> dict:
+    """Extração inteira vinda do checkpoint, sem abrir o vídeo."""
+    timings = {"decode": 0.0, "decodeBlocked": 0.0, "inference": 0.0, "inferenceWait": 0.0, "decodeCpu": 0.0}
+    return {
+        "variant": variant,
+        "timeRange": time_range,
+        "fps": state["fps"],
+        "truncated": state["truncated"],
+        "frameCount": state["frames"],
+        "usableFrames": state["usable"],
+        "timings": stage_timings(timings, 0),
+        "roi": roi_summary(None),
+        "frameMetrics": {"decode": Histogram(FRAME_BUCKETS), "inference": Histogram(FRAME_BUCKETS)},
+        "span": {**extraction_span(timings, cpu_seconds), "resumedFrom": state["frames"]},
+    }
+
+
+def keyframe_indices(video_path: str, fps: float) -> list[int]:
+    """Quadros-chave do vídeo, em índice de quadro da fonte.
+
+    Só lê os pacotes, sem decodificar. Vazio quando o ffprobe não sabe dizer
+    — os trechos então caem onde caírem, e a busca exata do decoder paga a
+    decodificação desde o keyframe anterior.
+    """
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-select_streams", "v:0",
+                "-show_entries", "packet=pts_time,flags",
+                "-of", "csv=p=0", video_path,
+            ],
+            capture_output=True, text=True, check=True, timeout=60,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return []
+    times, keys = [], []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(",")
+        try:
+            seconds = float(pts)
+        except ValueError:
+            continue
+        times.append(seconds)
+        if "K" in flags:
+            keys.append(seconds)
+    if not keys:
+        return []
+    # Pacotes vêm em ordem de decodificação; o menor pts é o quadro 0.
+    origin = min(times)
+    return sorted({int(round((seconds - origin) * fps)) for seconds in keys})
+
+
+def plan_segments(meta: dict, time_range: dict | None, keyframes: list[int], count: int) -> list[dict]:
+    """Divide a extração em até `count` partes de pelo menos
+    SEGMENT_MIN_SECONDS. Lista vazia quando não vale dividir.
+
+    Cada parte menos a primeira começa a decodificar num keyframe — a busca
+    exata não descarta nada — e grava a partir de SEGMENT_WARMUP_FRAMES
+    quadros depois dele. Tudo em múltiplos do passo de decimação, contado do
+    início do trecho: as partes amostram os mesmos quadros da extração
+    corrida.
+    """
+    fps = meta["fps"]
+    if count < 2 or not fps:
+        return []
+    step = decimation_step(fps)
+    start, limit = range_frames(time_range, fps) if time_range else (0, None)
+    available = int(clip_duration_ms(meta, time_range) / 1000 * fps)
+    total = min(available if limit is None else min(limit, available), MAX_FRAMES * step)
+    count = min(count, int(total / fps / SEGMENT_MIN_SECONDS))
+    if count < 2:
+        return []
+
+    warmup = SEGMENT_WARMUP_FRAMES * step
+    relative = [key - start for key in keyframes if key >= start]
+    segments = [{"skip": 0, "keepFrom": 0}]
+    for n in range(1, count):
+        skip = total * n // count - warmup
+        if relative:
+            # O keyframe mais próximo do ponto ideal, desde que a parte
+            # anterior não fique vazia.
+            skip = min(relative, key=lambda key: abs(key - skip))
+        skip -= skip % step
+        if skip + warmup <= segments[-1]["keepFrom"] or skip + warmup >= total:
+            continue
+        segments.append({"skip": skip, "keepFrom": skip + warmup})
+    # A última vai até o fim de verdade, seja qual for a duração declarada.
+    ends = [segment["keepFrom"] for segment in segments[1:]] + [MAX_FRAMES * step if limit is None else limit]
+    return [{**segment, "end": end} for segment, end in zip(segments, ends)] if len(segments) > 1 else []
+
+
+def segment_plan(video_path: str, meta: dict, time_range: dict | None) -> list[dict]:
+    """Partes da extração deste vídeo, ou lista vazia para extrair corrido."""
+    if SEGMENTS < 2 or _process_pool is None:
+        return []
+    if clip_duration_ms(meta, time_range) < 2 * SEGMENT_MIN_SECONDS * 1000:
+        return []
+    # No modo stream, listar os pacotes leria o vídeo remoto inteiro: as
+    # partes ficam sem alinhamento, e a busca decodifica desde o keyframe
+    # anterior.
+    keyframes = [] if is_url(video_path) else keyframe_indices(video_path, meta["fps"])
+    return plan_segments(meta, time_range, keyframes, SEGMENTS)
+
+
+def run_segmented(
+    video_path: str,
+    meta: dict,
+    frames_path: str,
+    progress: Progress,
+    variant: dict,
+    time_range: dict | None,
+    segments: list[dict],
+) -> dict:
+    """Extrai as partes em paralelo no pool e emenda os spools em ordem.
+
+    As partes não dependem umas das outras: com os processos ocupados por
+    outros jobs, elas só esperam a vez, sem travar ninguém. Uma parte que
+    falha derruba o job; as que ainda não começaram são descartadas.
+    """
+    parts = [f"{frames_path}.{n}" for n in range(len(segments))]
+    pool = _process_pool
+    futures = [
+        pool.submit(
+            extract_landmarks, video_path, meta, part, progress.part(), variant, time_range, None, segment,
+        )
+        for segment, part in zip(segments, parts)
+    ]
+    try:
+        results = [pool_result(pool, future) for future in futures]
+        with open(frames_path, "wb") as target:
+            for part in parts:
+                with open(part, "rb") as source:
+                    shutil.copyfileobj(source, target)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        # As partes que já rodavam ainda escrevem nos arquivos delas.
+        for future in futures:
+            with contextlib.suppress(BaseException):
+                future.exception()
+        for part in parts:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(part)
+    return merge_segments(results)
 
-def build_bundle(frames: list[dict], meta: dict, extraction: dict, payload: dict) -> str:
+
+def merge_segments(results: list[dict]) -> dict:
+    """Uma extração só a partir das partes. Os tempos por estágio somam o
+    tempo ocupado de cada processo; a parede do job é a do trace."""
+    frame_count = sum(result["frameCount"] for result in results)
+    timings = {
+        name: round(sum(result["timings"][name] for result in results), 1)
+        for name in ("decodeMs", "decodeBlockedMs", "inferenceMs", "inferenceWaitMs")
+    }
+    timings["ringSlots"] = results[0]["timings"]["ringSlots"]
+    timings["bottleneck"] = "decode" if timings["inferenceWaitMs"] > timings["decodeBlockedMs"] else "inference"
+    decode_hist, inference_hist = Histogram(FRAME_BUCKETS), Histogram(FRAME_BUCKETS)
+    for result in results:
+        decode_hist.merge(result["frameMetrics"]["decode"])
+        inference_hist.merge(result["frameMetrics"]["inference"])
+    rois = [result["roi"] for result in results if result["roi"]]
+    roi = None
+    if rois:
+        roi = {"mode": rois[0]["mode"]}
+        for key in ("croppedFrames", "windowMoves", "trackingLost"):
+            roi[key] = sum(part.get(key, 0) for part in rois)
+    children = [
+        {
+            "name": "segment",
+            "index": n,
+            "wallMs": result["span"]["wallMs"],
+            "cpuMs": result["span"]["cpuMs"],
+            "peakRssMb": result["span"]["peakRssMb"],
+            "frames": result["frameCount"],
+            "warmupFrames": result["span"]["warmupFrames"],
+        }
+        for n, result in enumerate(results)
+    ]
+    return {
+        "variant": results[0]["variant"],
+        "timeRange": results[0]["timeRange"],
+        "fps": results[0]["fps"],
+        "truncated": frame_count >= MAX_FRAMES,
+        "frameCount": frame_count,
+        "usableFrames": sum(result["usableFrames"] for result in results),
+        "timings": timings,
+        "roi": roi,
+        "frameMetrics": {"decode": decode_hist, "inference": inference_hist},
+        "span": {
+            "cpuMs": round(sum(child["cpuMs"] for child in children), 1),
+            "peakRssMb": max(child["peakRssMb"] for child in children),
+            "segments": len(results),
+            "children": children,
+        },
+    }
+
+
+def extraction_span(timings: dict, cpu_seconds: float) -> dict:
+    """CPU e pico de RSS da extração, medidos no processo que a rodou.
+
+    Decodificação e inferência correm em paralelo, então os filhos trazem o
+    tempo ocupado de cada estágio, não um intervalo. A CPU da decodificação é
+    a da thread do decoder — com o decoder ffmpeg o grosso roda no subprocesso
+    e fica de fora; a da inferência é o resto do processo.
+    """
+    peak = peak_rss_mb()
+    return {
+        "cpuMs": elapsed_ms(cpu_seconds),
+        "peakRssMb": peak,
+        "children": [
+            {
+                "name": "decode",
+                "wallMs": elapsed_ms(timings["decode"]),
+                "cpuMs": elapsed_ms(timings["decodeCpu"]),
+                "peakRssMb": peak,
+            },
+            {
+                "name": "inference",
+                "wallMs": elapsed_ms(timings["inference"]),
+                "cpuMs": elapsed_ms(max(0.0, cpu_seconds - timings["decodeCpu"])),
+                "peakRssMb": peak,
+            },
+        ],
+    }
+
+
+def stage_timings(timings: dict, slots: int) -> dict:
+    """Tempos por estágio em ms. O estágio que menos espera é o gargalo."""
+    return {
+        "decodeMs": round(timings["decode"] * 1000, 1),
+        "decodeBlockedMs": round(timings["decodeBlocked"] * 1000, 1),
+        "inferenceMs": round(timings["inference"] * 1000, 1),
+        "inferenceWaitMs": round(timings["inferenceWait"] * 1000, 1),
+        "ringSlots": slots,
+        "bottleneck": "decode" if timings["inferenceWait"] > timings["decodeBlocked"] else "inference",
+    }
+
+
+class BundleStream:
+    """Corpo do PUT lido em blocos: cabeçalho e depois o spool de quadros.
+
+    O SHA-256 é calculado enquanto os bytes saem, numa passada só — o bundle
+    nunca existe inteiro na memória. O tamanho é conhecido de antemão, então o
+    PUT vai com Content-Length, que a URL pré-assinada do R2 exige (ela não
+    aceita Transfer-Encoding: chunked).
+    """
+
+    def __init__(self, header: bytes, frames_path: str) -> None:
+        self._header = header
+        self._frames = open(frames_path, "rb")
+        self.length = len(header) + os.path.getsize(frames_path)
+        self.sent = 0
+        self._hash = hashlib.sha256()
+        # O hash acontece dentro do PUT (ou do gzip); medido à parte para o trace.
+        self.hash_seconds = 0.0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self):
+        while chunk := self.read(UPLOAD_CHUNK_BYTES):
+            yield chunk
+
+    def read(self, size: int = -1) -> bytes:
+        if self._header:
+            chunk, self._header = self._header, b""
+        else:
+            chunk = self._frames.read(size if size and size > 0 else UPLOAD_CHUNK_BYTES)
+        started = time.thread_time()
+        self._hash.update(chunk)
+        self.hash_seconds += time.thread_time() - started
+        self.sent += len(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        if self.sent != self.length:
+            raise RuntimeError("Bundle enviado pela metade; hash não corresponde ao objeto.")
+        return self._hash.hexdigest()
+
+    def close(self) -> None:
+        self._frames.close()
+
+
+def bundle_header(meta: dict, extraction: dict, payload: dict) -> dict:
+    variant = extraction.get("variant", default_variant())
     header = {
         "schema": SCHEMA,
         "landmarkCount": LANDMARK_COUNT,
         "order": "blazepose33",
         "fps": round(extraction["fps"], 3),
-        "frameCount": len(frames),
-        "durationMs": meta["durationMs"],
+        "frameCount": extraction["frameCount"],
+        "durationMs": clip_duration_ms(meta, extraction.get("timeRange")),
         "view": payload.get("view", "sagittal"),
         "attempt": payload.get("attempt", 1),
         "capturedAt": payload.get("capturedAt"),
@@ -213,102 +1656,1176 @@ def build_bundle(frames: list[dict], meta: dict, extraction: dict, payload: dict
             "version": ENGINE_VERSION,
             "platform": "container",
             "mode": "video",
-            "modelVariant": "heavy",
+            # Heavy e full têm erros diferentes; a DMD só vale entre sessões
+            # medidas com a mesma variante, então ela segue no bundle.
+            "modelVariant": MODEL_VARIANTS[variant["modelComplexity"]],
         },
         "protocolSlug": payload.get("protocolSlug"),
     }
+    input_size = scaled_size(meta["width"], meta["height"], variant["maxLongEdge"])
+    if input_size != (meta["width"], meta["height"]):
+        # Quadros reduzidos antes do modelo — pela política adaptativa ou pelo
+        # `maxLongEdge` do job. O landmark sai mais ruidoso em resolução menor,
+        # então quem compara sessões precisa saber em qual cada uma foi medida.
+        header["poseEngine"]["inputLongEdge"] = max(input_size)
+    if extraction.get("roi"):
+        # Recortado em volta da pessoa: landmarks no mesmo espaço, mas não
+        # idênticos aos do quadro inteiro.
+        header["poseEngine"]["inputCrop"] = extraction["roi"]["mode"]
+    if extraction.get("timeRange"):
+        # Os `t` dos quadros contam do início do trecho; somar `startMs` dá o
+        # instante no vídeo original.
+        header["sourceRange"] = {
+            "startMs": extraction["timeRange"]["startMs"],
+            "endMs": extraction["timeRange"]["startMs"] + header["durationMs"],
+        }
     if extraction["truncated"]:
         header["truncated"] = True
+    return header
 
-    lines = [json.dumps(header, separators=(",", ":"))]
-    lines.extend(json.dumps(frame, separators=(",", ":")) for frame in frames)
-    return "\n".join(lines)
 
+def clip_duration_ms(meta: dict, time_range: dict | None) -> int:
+    if not time_range:
+        return meta["durationMs"]
+    end = meta["durationMs"]
+    if time_range.get("endMs") is not None:
+        end = min(end, time_range["endMs"]) if end else time_range["endMs"]
+    return max(0, end - time_range["startMs"])
 
-def analyze(payload: dict) -> dict:
-    job_id = payload["jobId"]
-    log.info("job %s: iniciando", job_id)
 
-    with tempfile.TemporaryDirectory() as workdir:
-        video_path = os.path.join(workdir, "input.mp4")
+def build_bundle(frames_path: str, meta: dict, extraction: dict, payload: dict) -> BundleStream:
+    header = bundle_header(meta, extraction, payload)
+    if payload.get("bundleFormat") == "columnar":
+        columnar_path = os.path.splitext(frames_path)[0] + ".ffpc"
+        write_columnar(frames_path, header, columnar_path)
+        return BundleStream(b"", columnar_path)
+    return BundleStream(json.dumps(header, separators=(",", ":")).encode("utf-8"), frames_path)
+
+
+def negotiate_encoding(payload: dict) -> str:
+    """Primeira codificação aceita pelo job que o container sabe emitir."""
+    accepted = payload.get("acceptEncoding") or []
+    if isinstance(accepted, str):
+        accepted = [accepted]
+    for encoding in accepted:
+        if encoding in CONTENT_ENCODINGS:
+            return encoding
+    return "identity"
+
+
+def gzip_bundle(bundle: BundleStream, output_path: str) -> BundleStream:
+    """Comprime o bundle em fluxo para o disco e devolve o corpo comprimido.
+
+    O PUT pré-assinado exige Content-Length, e o tamanho comprimido só existe
+    no fim — por isso passa pelo disco em vez de ir direto para a rede. mtime
+    zero e sem nome de arquivo: o mesmo bundle sempre gera os mesmos bytes, e
+    o mesmo hash.
+    """
+    with open(output_path, "wb") as out:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=out, mtime=0, compresslevel=GZIP_LEVEL) as packed:
+            for chunk in bundle:
+                packed.write(chunk)
+    bundle.close()
+    return BundleStream(b"", output_path)
+
+
+def write_columnar(frames_path: str, header: dict, output_path: str) -> None:
+    """Reescreve o spool NDJSON no bundle colunar binário.
+
+    Layout, tudo little-endian:
+
+        "FFPC" | u8 versão | u8 bytes por coordenada (2 ou 4) | u16 zero
+        | u32 tamanho do cabeçalho | cabeçalho JSON (o mesmo do NDJSON)
+        | t: i32[n] | c: u16[n] | k: i16 ou i32[n·33·4]
+
+    Coordenadas e confiança são o valor já quantizado vezes 10⁴, em inteiro.
+    Como o quantizado é o double mais próximo de m/10⁴, dividir m por 10⁴ na
+    leitura devolve exatamente o mesmo número do NDJSON — em Python e em JS.
+    `i` é implícito: o quadro n é a posição n.
+
+    int16 cobre ±3,2767, folga para landmark fora do quadro. Se algum valor
+    passar disso o arquivo inteiro vai em int32, nunca saturado.
+    """
+    count = header["frameCount"]
+    times = np.zeros(count, dtype="<i4")
+    confidences = np.zeros(count, dtype="<u2")
+    # Os pontos não ficam em memória: vão em blocos, já em int32, para um
+    # arquivo ao lado; só no fim se sabe se cabem em int16.
+    points_path = output_path + ".k"
+    chunk = np.zeros((COLUMNAR_CHUNK_FRAMES, LANDMARK_COUNT * 4), dtype="<i4")
+    low, high = 0, 0
+
+    try:
+        with open(frames_path, encoding="utf-8") as handle, open(points_path, "wb") as spill:
+            row = 0
+            for line in handle:
+                if not line.strip():
+                    continue
+                frame = json.loads(line)
+                if frame["i"] != row:
+                    raise RuntimeError(f"Spool fora de ordem: quadro {frame['i']} na posição {row}.")
+                if row >= count:
+                    raise RuntimeError(f"Spool tem mais quadros que os {count} do cabeçalho.")
+                times[row] = frame["t"]
+                confidences[row] = int(round(frame["c"] * 1e4))
+                chunk[row % COLUMNAR_CHUNK_FRAMES] = np.rint(np.asarray(frame["k"], dtype=np.float64) * 1e4)
+                row += 1
+                if row % COLUMNAR_CHUNK_FRAMES == 0:
+                    low, high = min(low, int(chunk.min())), max(high, int(chunk.max()))
+                    spill.write(chunk.tobytes())
+            tail = chunk[: row % COLUMNAR_CHUNK_FRAMES]
+            if tail.size:
+                low, high = min(low, int(tail.min())), max(high, int(tail.max()))
+                spill.write(tail.tobytes())
+        if row != count:
+            raise RuntimeError(f"Spool tem {row} quadros; o cabeçalho declara {count}.")
+
+        limit = np.iinfo(np.int16)
+        wide = low < limit.min or high > limit.max
+        width = 4 if wide else 2
+
+        header_raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        with open(output_path, "wb") as out, open(points_path, "rb") as spill:
+            out.write(COLUMNAR_MAGIC)
+            out.write(struct.pack("<BBHI", COLUMNAR_VERSION, width, 0, len(header_raw)))
+            out.write(header_raw)
+            out.write(times.tobytes())
+            out.write(confidences.tobytes())
+            while block := spill.read(chunk.nbytes):
+                out.write(block if wide else np.frombuffer(block, dtype="<i4").astype("<i2").tobytes())
+    finally:
+        if os.path.exists(points_path):
+            os.unlink(points_path)
+
+
+def decode_columnar(data: bytes) -> tuple[dict, list[dict]]:
+    """Decodificador de referência do bundle colunar.
+
+    Devolve o cabeçalho e os quadros no mesmo formato de `json.loads` de cada
+    linha do NDJSON, para comparação direta.
+    """
+    if data[:4] != COLUMNAR_MAGIC:
+        raise ValueError("Não é um bundle colunar.")
+    version, width, _, header_len = struct.unpack_from("<BBHI", data, 4)
+    if version != COLUMNAR_VERSION or width not in (2, 4):
+        raise ValueError(f"Bundle colunar v{version} com largura {width} não suportado.")
+
+    offset = 12
+    header = json.loads(data[offset:offset + header_len])
+    offset += header_len
+    count = header["frameCount"]
+
+    times = np.frombuffer(data, dtype="<i4", count=count, offset=offset)
+    offset += 4 * count
+    confidences = np.frombuffer(data, dtype="<u2", count=count, offset=offset)
+    offset += 2 * count
+    points = np.frombuffer(
+        data, dtype="<i4" if width == 4 else "<i2", count=count * LANDMARK_COUNT * 4, offset=offset,
+    ).reshape(count, LANDMARK_COUNT * 4)
+    if offset + points.nbytes != len(data):
+        raise ValueError("Bundle colunar com tamanho inconsistente.")
+
+    frames = [
+        {
+            "i": row,
+            "t": int(times[row]),
+            "k": (points[row] / 1e4).tolist(),
+            "c": float(confidences[row]) / 1e4,
+        }
+        for row in range(count)
+    ]
+    return header, frames
+
+
+def download_video(url: str, video_path: str) -> str:
+    """Baixa para o disco e devolve o SHA-256 do conteúdo, calculado no caminho."""
+    written = 0
+    digest = hashlib.sha256()
+    with requests.get(url, stream=True, timeout=300) as response:
+        response.raise_for_status()
+        with open(video_path, "wb") as handle:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                written += len(chunk)
+                if written > MAX_VIDEO_BYTES:
+                    raise RuntimeError(f"Vídeo excede o limite de {MAX_VIDEO_BYTES} bytes.")
+                handle.write(chunk)
+                digest.update(chunk)
+    return digest.hexdigest()
 
-        with requests.get(payload["videoUrl"], stream=True, timeout=300) as response:
+
+def remote_etag(url: str) -> str | None:
+    """ETag do objeto no R2, sem baixar o vídeo: um GET de um byte só.
+
+    A URL é assinada para GET, então HEAD não passa na assinatura.
+    """
+    try:
+        with requests.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=30) as response:
             response.raise_for_status()
-            with open(video_path, "wb") as handle:
-                for chunk in response.iter_content(chunk_size=1 << 20):
-                    handle.write(chunk)
+            etag = response.headers.get("ETag")
+    except requests.RequestException:
+        return None
+    return "etag:" + etag.strip('"') if etag else None
 
-        meta = probe_video(video_path)
-        log.info("job %s: %dx%d @ %.2ffps", job_id, meta["width"], meta["height"], meta["fps"])
 
-        frames, extraction = extract_landmarks(video_path, meta)
-        if not frames:
-            raise RuntimeError("Nenhum quadro pôde ser lido do vídeo.")
+class ResultCache:
+    """Extrações já feitas, endereçadas pelo conteúdo do vídeo. LRU por bytes.
 
-        bundle = build_bundle(frames, meta, extraction, payload)
-        raw = bundle.encode("utf-8")
-        digest = hashlib.sha256(raw).hexdigest()
+    Guarda o spool de quadros e a extração, não o bundle: o cabeçalho leva
+    `view`, `attempt` e `capturedAt` do job, que mudam no reprocessamento. Um
+    acerto pula a inferência inteira e só remonta e reenvia o bundle.
+    """
+
+    def __init__(self, root: str, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._bytes = 0
+        if self.enabled:
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _load(self) -> None:
+        """Reaproveita o que já está no disco, do mais antigo ao mais recente."""
+        os.makedirs(self.root, exist_ok=True)
+        found = []
+        for name in os.listdir(self.root):
+            entry = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            found.append((os.path.getmtime(entry), name, size))
+        with self._lock:
+            for _, name, size in sorted(found):
+                self._entries[name] = size
+                self._bytes += size
+            self._evict()
+
+    def get(self, key: str, frames_path: str) -> dict | None:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry = os.path.join(self.root, key)
+            # Cópia sob o lock: uma evicção concorrente não apaga o spool no
+            # meio da leitura.
+            shutil.copyfile(os.path.join(entry, "frames.ndjson"), frames_path)
+            with open(os.path.join(entry, "extraction.json"), encoding="utf-8") as handle:
+                record = json.load(handle)
+            os.utime(entry)
+            self.hits += 1
+        return record
+
+    def put(self, key: str, frames_path: str, record: dict) -> None:
+        raw = json.dumps(record).encode("utf-8")
+        size = os.path.getsize(frames_path) + len(raw)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            staging = os.path.join(self.root, f".{key}")
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            shutil.copyfile(frames_path, os.path.join(staging, "frames.ndjson"))
+            with open(os.path.join(staging, "extraction.json"), "wb") as handle:
+                handle.write(raw)
+            os.rename(staging, os.path.join(self.root, key))
+            self._entries[key] = size
+            self._bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
 
-        put = requests.put(
-            payload["resultPutUrl"],
-            data=raw,
-            headers={"Content-Type": "application/x-ndjson"},
-            timeout=300,
-        )
-        put.raise_for_status()
 
-    usable = sum(1 for frame in frames if frame["c"] >= 0.5)
-    log.info("job %s: %d frames, %d utilizáveis", job_id, len(frames), usable)
+RESULTS = ResultCache(CACHE_DIR, CACHE_MAX_BYTES)
 
+
+def default_variant() -> dict:
+    # O decoder OpenCV não reduz a entrada; registrar um tamanho que não foi
+    # aplicado faria a chave do cache e o relatório mentirem.
+    return {"modelComplexity": MODEL_COMPLEXITY, "maxLongEdge": MAX_LONG_EDGE if DECODER == "ffmpeg" else 0}
+
+
+def choose_variant(payload: dict, duration_ms: int, queued: int) -> dict:
+    """Complexidade do modelo e maior lado da entrada para este job.
+
+    O payload manda quando diz (`modelComplexity`, `maxLongEdge`); no resto,
+    vale a política do servidor. `duration_ms` é a do que será extraído — o
+    trecho pedido, não o vídeo inteiro: 5 s de um vídeo longo são clínicos.
+    `reason` vai no callback, para que uma troca de variante seja
+    explicável depois.
+    """
+    variant = default_variant()
+    reason = "fixed"
+    if MODEL_POLICY == "adaptive":
+        reason = "clinical"
+        if DECODER == "ffmpeg" and not MAX_LONG_EDGE:
+            variant["maxLongEdge"] = ADAPTIVE_LONG_EDGE
+        if duration_ms > HEAVY_MAX_SECONDS * 1000:
+            reason = "screening"
+            if queued >= (BACKLOG_JOBS or WORKERS):
+                variant["modelComplexity"] = 1
+                reason = "screening-backlog"
+    if payload.get("modelComplexity") is not None:
+        variant["modelComplexity"] = int(payload["modelComplexity"])
+        reason = "payload"
+    if payload.get("maxLongEdge") is not None and DECODER == "ffmpeg":
+        variant["maxLongEdge"] = int(payload["maxLongEdge"])
+        reason = "payload"
+    return {**variant, "reason": reason}
+
+
+def extraction_settings(variant: dict | None = None, time_range: dict | None = None) -> dict:
+    """Tudo o que muda os landmarks de um mesmo vídeo. Entra na chave do cache."""
+    variant = variant or default_variant()
     return {
+        "timeRange": time_range,
+        "engine": ENGINE_VERSION,
+        "modelComplexity": variant["modelComplexity"],
+        "targetFps": TARGET_FPS,
+        "maxFrames": MAX_FRAMES,
+        "decoder": DECODER,
+        "maxLongEdge": variant["maxLongEdge"],
+        "roi": ROI_MODE,
+    }
+
+
+def cache_key(video_id: str, settings: dict) -> str:
+    return hashlib.sha256(json.dumps([video_id, settings], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def estimate_frames(meta: dict, time_range: dict | None = None) -> int:
+    """Quadros que a extração deve emitir, pelo que o ffprobe declarou."""
+    fps = meta["fps"] or TARGET_FPS
+    return min(MAX_FRAMES, int(clip_duration_ms(meta, time_range) / 1000 * fps / decimation_step(fps)))
+
+
+def requested_range(payload: dict) -> dict | None:
+    """Trecho pedido pelo payload, ou None para o vídeo inteiro."""
+    if payload.get("startMs") is None and payload.get("endMs") is None:
+        return None
+    return {"startMs": int(payload.get("startMs") or 0), "endMs": payload.get("endMs")}
+
+
+def obtain_frames(payload: dict, workdir: str, frames_path: str, status: JobStatus) -> tuple[dict, dict]:
+    """Deixa em `frames_path` o spool de quadros do vídeo do job.
+
+    Vem do cache quando o mesmo conteúdo já foi extraído com a mesma variante
+    e as mesmas configurações; senão, extrai. Num acerto o vídeo ainda é
+    baixado (no modo download, é o download que dá o hash) e sondado (a
+    variante depende da duração) — o que se economiza é o modelo.
+    """
+    job_id = payload["jobId"]
+    status.enter("download")
+    if INPUT_MODE == "stream":
+        video_path = payload["videoUrl"]
+        video_id = remote_etag(video_path) if RESULTS.enabled or CHECKPOINT_EVERY else None
+    else:
+        video_path = os.path.join(workdir, "input.mp4")
+        with status.trace.span("download"), METRICS.timer("pose_download_seconds"):
+            video_id = "sha256:" + download_video(payload["videoUrl"], video_path)
+
+    status.enter("probe")
+    with status.trace.span("probe"), METRICS.timer("pose_probe_seconds"):
+        meta = probe_video(video_path)
+    if meta["bytes"] > MAX_VIDEO_BYTES:
+        raise RuntimeError(f"Vídeo de {meta['bytes']} bytes excede o limite de {MAX_VIDEO_BYTES}.")
+    time_range = requested_range(payload)
+    if time_range and meta["durationMs"] and time_range["startMs"] >= meta["durationMs"]:
+        raise RuntimeError(f"startMs {time_range['startMs']} além do fim do vídeo ({meta['durationMs']} ms).")
+    chosen = choose_variant(payload, clip_duration_ms(meta, time_range), JOBS.stats()["queued"])
+    log.info(
+        "job %s: %dx%d @ %.2ffps, %s (%s)",
+        job_id, meta["width"], meta["height"], meta["fps"], MODEL_VARIANTS[chosen["modelComplexity"]], chosen["reason"],
+    )
+    # O motivo não muda os landmarks: fica fora da chave e do cache.
+    variant = {"modelComplexity": chosen["modelComplexity"], "maxLongEdge": chosen["maxLongEdge"]}
+
+    settings = extraction_settings(variant, time_range)
+    key = cache_key(video_id, settings) if RESULTS.enabled and video_id else None
+    if key:
+        with status.trace.span("cache"):
+            cached = RESULTS.get(key, frames_path)
+        if cached:
+            log.info("job %s: extração reaproveitada do cache", job_id)
+            status.frames_estimated = status.progress.frames.value = cached["extraction"]["frameCount"]
+            return cached["meta"], {**cached["extraction"], "cached": True, "variantReason": chosen["reason"]}
+
+    segments = segment_plan(video_path, meta, time_range)
+    # Sem identidade do vídeo não há como saber se o checkpoint é dele. A
+    # extração em partes não tem checkpoint: cada parte é curta, e retomar
+    # exigiria saber quais terminaram.
+    checkpoint_root = (
+        checkpoint_path(payload["resultKey"], video_id, settings)
+        if CHECKPOINT_EVERY and video_id and not segments else None
+    )
+    if checkpoint_root:
+        purge_checkpoints()
+
+    status.frames_estimated = estimate_frames(meta, time_range)
+    status.enter("extract")
+    with status.trace.span("extract") as span:
+        if segments:
+            log.info("job %s: extração em %d partes", job_id, len(segments))
+            extraction = run_segmented(video_path, meta, frames_path, status.progress, variant, time_range, segments)
+        else:
+            extraction = run_extraction(
+                video_path, meta, frames_path, status.progress, variant, time_range, checkpoint_root,
+            )
+        span.update(extraction.pop("span"))
+    if "resumedFrom" in span:
+        log.info("job %s: retomado do checkpoint no quadro %d", job_id, span["resumedFrom"])
+    frame_metrics = extraction.pop("frameMetrics")
+    METRICS.merge("pose_decode_frame_seconds", frame_metrics["decode"])
+    METRICS.merge("pose_inference_frame_seconds", frame_metrics["inference"])
+    if not extraction["frameCount"]:
+        raise RuntimeError("Nenhum quadro pôde ser lido do vídeo.")
+
+    if key:
+        RESULTS.put(key, frames_path, {"meta": meta, "extraction": extraction})
+    return meta, {**extraction, "variantReason": chosen["reason"], "checkpoint": checkpoint_root}
+
+
+def analyze(payload: dict, status: JobStatus) -> dict:
+    job_id = payload["jobId"]
+    log.info("job %s: iniciando", job_id)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        frames_path = os.path.join(workdir, "frames.ndjson")
+        meta, extraction = obtain_frames(payload, workdir, frames_path, status)
+
+        status.enter("upload")
+        # A URL pré-assinada foi gerada com este Content-Type; o formato real
+        # (NDJSON, colunar, gzip) o Worker reconhece pelo magic number.
+        headers = {"Content-Type": "application/x-ndjson"}
+        encoding = negotiate_encoding(payload)
+        raw = None
+        with status.trace.span("encode"), METRICS.timer("pose_bundle_encode_seconds"):
+            bundle = build_bundle(frames_path, meta, extraction, payload)
+            if encoding == "gzip":
+                raw = bundle
+                bundle = gzip_bundle(raw, frames_path + ".gz")
+                headers["Content-Encoding"] = "gzip"
+        try:
+            with status.trace.span("upload"), METRICS.timer("pose_upload_seconds"):
+                put = requests.put(payload["resultPutUrl"], data=bundle, headers=headers, timeout=300)
+                put.raise_for_status()
+            digest = bundle.hexdigest()
+        finally:
+            bundle.close()
+        if extraction.get("checkpoint"):
+            # Só com o bundle no R2: até aqui, um job reenviado ainda retoma.
+            Checkpoint(extraction["checkpoint"]).discard()
+        # Somado, não intervalo: o hash corre dentro do gzip e do PUT.
+        hash_seconds = bundle.hash_seconds + (raw.hash_seconds if raw is not None else 0.0)
+        status.trace.add("hash", wallMs=elapsed_ms(hash_seconds), cpuMs=elapsed_ms(hash_seconds))
+
+    log.info("job %s: %d frames, %d utilizáveis", job_id, extraction["frameCount"], extraction["usableFrames"])
+    METRICS.inc("pose_uploaded_bytes_total", bundle.length)
+    METRICS.inc("pose_frames_total", extraction["frameCount"])
+    METRICS.inc("pose_usable_frames_total", extraction["usableFrames"])
+    METRICS.observe("pose_usable_frame_ratio", extraction["usableFrames"] / extraction["frameCount"])
+
+    result = {
         "status": "succeeded",
         "key": payload["resultKey"],
+        # sha256 e bytes são do objeto como ficou no R2 — é o que o Worker
+        # confere ao ler. Os do bundle descomprimido vão à parte.
         "sha256": digest,
-        "frameCount": len(frames),
+        "frameCount": extraction["frameCount"],
         "fps": round(extraction["fps"], 3),
         "engine": f"{ENGINE_NAME}@{ENGINE_VERSION}/container",
-        "usableFrames": usable,
-        "bytes": len(raw),
+        "modelVariant": MODEL_VARIANTS[extraction["variant"]["modelComplexity"]],
+        "variant": {**extraction["variant"], "reason": extraction["variantReason"]},
+        "usableFrames": extraction["usableFrames"],
+        "bytes": bundle.length,
+        "format": payload.get("bundleFormat", "ndjson"),
+        "encoding": encoding,
+        "cached": extraction.get("cached", False),
+        "timings": extraction["timings"],
+        "trace": status.trace.to_dict(),
     }
+    if extraction.get("roi"):
+        result["roi"] = extraction["roi"]
+    if raw is not None:
+        result["rawBytes"] = raw.length
+        result["rawSha256"] = raw.hexdigest()
+    return result
+
+
+class CallbackOutbox:
+    """Callbacks gravados em disco antes da primeira tentativa e reenviados
+    até o Worker aceitar.
+
+    Um callback perdido deixa o bundle órfão no R2 e faz o Worker reenviar o
+    job inteiro — a extração sai de novo por causa de um POST. Aqui a falha
+    vira espera: uma thread entrega em ordem de chegada, e uma falha de rede
+    ou 5xx adia todos os callbacks do mesmo host, com backoff exponencial,
+    em vez de cada um martelar sozinho um Worker fora do ar.
+
+    Um arquivo por `callbackUrl`: um resultado novo para o mesmo destino (o
+    job reenviado e refeito) substitui o pendente, e só o último é entregue.
+    4xx que não seja 408/429 é definitivo — token expirado, job apagado — e
+    o callback é descartado.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self._cond = threading.Condition()
+        self._entries: dict[str, dict] = {}
+        # host -> (falhas seguidas, monotonic a partir do qual pode tentar)
+        self._hosts: dict[str, tuple[int, float]] = {}
+        self._thread: threading.Thread | None = None
+        self._sending: str | None = None
+        self._counts = {"delivered": 0, "retried": 0, "dropped": 0, "coalesced": 0}
+
+    def start(self) -> None:
+        """Carrega o que ficou de um processo anterior e começa a entregar."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            for name in sorted(os.listdir(self.root)):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(self.root, name), encoding="utf-8") as handle:
+                        self._entries[name] = json.load(handle)
+                except (OSError, ValueError):
+                    log.warning("outbox: %s ilegível, descartado", name)
+                    self._remove(name)
+            if self._entries:
+                log.info("outbox: %d callbacks pendentes retomados", len(self._entries))
+            self._thread = threading.Thread(target=self._run, name="pose-outbox", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, url: str, token: str | None, body: dict, label: str) -> None:
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ".json"
+        with self._cond:
+            previous = self._entries.get(name)
+            if previous is not None:
+                self._counts["coalesced"] += 1
+            entry = {
+                "url": url,
+                "token": token,
+                "body": body,
+                "label": label,
+                "createdAt": time.time(),
+                "attempts": 0,
+                # Distingue o pendente substituído durante um envio do novo.
+                "seq": (previous or {}).get("seq", 0) + 1,
+            }
+            self._entries[name] = entry
+            self._write(name, entry)
+            self._cond.notify_all()
+
+    def flush(self, timeout: float) -> bool:
+        """Espera esvaziar; False se o prazo acabou antes."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._entries:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(timeout=min(remaining, 0.5))
+        return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"pending": len(self._entries), **self._counts}
+
+    def _write(self, name: str, entry: dict) -> None:
+        path = os.path.join(self.root, name)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as handle:
+                json.dump(entry, handle)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            # Sem disco o callback ainda sai da memória; só não sobrevive a
+            # um reinício.
+            log.error("outbox: %s não gravado\n%s", entry["label"], traceback.format_exc())
+
+    def _remove(self, name: str) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(os.path.join(self.root, name))
+
+    def _next_due(self) -> tuple[str, dict] | None:
+        now = time.monotonic()
+        due = [
+            (entry["createdAt"], name, entry) for name, entry in self._entries.items()
+            if self._hosts.get(host_of(entry["url"]), (0, 0.0))[1] <= now
+        ]
+        if not due:
+            return None
+        _, name, entry = min(due, key=lambda item: item[:2])
+        return name, dict(entry)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                picked = self._next_due()
+                while picked is None:
+                    waits = [until - time.monotonic() for _, until in self._hosts.values()]
+                    pending = [wait for wait in waits if wait > 0]
+                    self._cond.wait(timeout=min(pending) if self._entries and pending else None)
+                    picked = self._next_due()
+                name, entry = picked
+            outcome = self._send(entry)
+            with self._cond:
+                self._settle(name, entry, outcome)
+                self._cond.notify_all()
+
+    def _send(self, entry: dict) -> str:
+        """"delivered", "dropped" ou "retry"."""
+        headers = {"X-Pose-Callback-Token": entry["token"]} if entry["token"] else {}
+        try:
+            response = requests.post(entry["url"], json=entry["body"], headers=headers, timeout=CALLBACK_TIMEOUT_SECONDS)
+        except requests.RequestException as error:
+            log.warning("%s: callback falhou (%s), tentativa %d", entry["label"], error, entry["attempts"] + 1)
+            return "retry"
+        if response.ok:
+            return "delivered"
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            log.error("%s: callback recusado com %d, descartado", entry["label"], response.status_code)
+            return "dropped"
+        log.warning("%s: callback respondeu %d, tentativa %d", entry["label"], response.status_code, entry["attempts"] + 1)
+        return "retry"
+
+    def _settle(self, name: str, sent: dict, outcome: str) -> None:
+        host = host_of(sent["url"])
+        current = self._entries.get(name)
+        if outcome == "retry":
+            failures = self._hosts.get(host, (0, 0.0))[0] + 1
+            ceiling = min(CALLBACK_RETRY_MAX_SECONDS, CALLBACK_RETRY_BASE_SECONDS * 2 ** (failures - 1))
+            self._hosts[host] = (failures, time.monotonic() + ceiling / 2 + random.uniform(0, ceiling / 2))
+            if current is None or current["seq"] != sent["seq"]:
+                return
+            if time.time() - current["createdAt"] > CALLBACK_MAX_AGE_SECONDS:
+                log.error("%s: callback desistido após %d tentativas", current["label"], current["attempts"] + 1)
+                outcome = "dropped"
+            else:
+                current["attempts"] += 1
+                self._counts["retried"] += 1
+                METRICS.inc("pose_callbacks_total", label='outcome="retried"')
+                self._write(name, current)
+                return
+        else:
+            # O host respondeu: está de pé, e os outros callbacks dele podem
+            # sair já.
+            self._hosts.pop(host, None)
+        self._counts[outcome] += 1
+        METRICS.inc("pose_callbacks_total", label=f'outcome="{outcome}"')
+        # Se um resultado novo chegou durante o envio, é ele que fica.
+        if current is not None and current["seq"] == sent["seq"]:
+            del self._entries[name]
+            self._remove(name)
+        if not any(host_of(entry["url"]) == host for entry in self._entries.values()):
+            self._hosts.pop(host, None)
+
+
+def host_of(url: str) -> str:
+    return urllib.parse.urlsplit(url).netloc
+
+
+OUTBOX = CallbackOutbox(OUTBOX_DIR)
 
 
 def notify(payload: dict, body: dict) -> None:
-    """Callback com token HMAC. O container não é confiável para autenticação."""
-    try:
-        requests.post(
-            payload["callbackUrl"],
-            json=body,
-            headers={"X-Pose-Callback-Token": payload["callbackToken"]},
-            timeout=60,
-        ).raise_for_status()
-    except Exception:
-        log.error("job %s: callback falhou\n%s", payload.get("jobId"), traceback.format_exc())
+    """Callback com token HMAC, entregue pelo outbox. O container não é
+    confiável para autenticação."""
+    OUTBOX.enqueue(payload["callbackUrl"], payload["callbackToken"], body, f"job {payload.get('jobId')}")
 
 
-def run_job(payload: dict) -> None:
+def run_job(payload: dict, status: JobStatus) -> dict:
     try:
-        result = analyze(payload)
+        return analyze(payload, status)
+    except JobCancelled as error:
+        log.info("job %s: cancelado em %s", payload.get("jobId"), status.phase)
+        if status.retryable:
+            return {
+                "status": "cancelled",
+                "error": "Container encerrando antes do fim do job; reenvie.",
+                "retryable": True,
+                "trace": status.trace.to_dict(),
+            }
+        return {"status": "cancelled", "error": str(error), "trace": status.trace.to_dict()}
     except Exception as error:
         log.error("job %s: falhou\n%s", payload.get("jobId"), traceback.format_exc())
-        result = {"status": "failed", "error": str(error)[:500]}
-    notify(payload, result)
+        return {"status": "failed", "error": str(error)[:500], "trace": status.trace.to_dict()}
+
+
+_trace_lock = threading.Lock()
+
+
+def write_trace(payload: dict, result: dict) -> None:
+    """Uma linha por job em `POSE_TRACE_FILE`, sem URLs nem token."""
+    if not TRACE_FILE:
+        return
+    line = json.dumps({
+        "jobId": payload.get("jobId"),
+        "status": result["status"],
+        "finishedAt": time.time(),
+        **result["trace"],
+    }, separators=(",", ":"))
+    try:
+        with _trace_lock, open(TRACE_FILE, "a", encoding="utf-8") as handle:
+            handle.write(line + "\n")
+    except OSError:
+        log.error("job %s: trace não gravado\n%s", payload.get("jobId"), traceback.format_exc())
+
+
+# Limites dos histogramas, em segundos (a razão de quadros úteis vai de 0 a 1).
+# Por quadro: de 1 ms (decodificação de 480p) a 1 s (heavy em CPU lenta).
+FRAME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0)
+# Por etapa do job: de uma sonda local a um upload de 5 min.
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+class Histogram:
+    """Contagens por faixa, soma e total — o que o Prometheus chama de histograma.
+
+    Sem lock próprio: os histogramas por quadro têm um único escritor, e os do
+    registro global são protegidos pelo `Metrics`.
+    """
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "Histogram") -> None:
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.sum += other.sum
+        self.count += other.count
+
+    def render(self, name: str) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum {self.sum!r}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+class Metrics:
+    """Registro exposto em GET /metrics, no formato texto do Prometheus.
+
+    Feito à mão em vez de `prometheus_client`: são meia dúzia de histogramas e
+    contadores, e o formato é estável — não justifica mais uma dependência na
+    imagem.
+    """
+
+    HISTOGRAMS = {
+        "pose_download_seconds": ("Tempo de download do vídeo.", STAGE_BUCKETS),
+        "pose_probe_seconds": ("Tempo do ffprobe.", STAGE_BUCKETS),
+        "pose_decode_frame_seconds": ("Decodificação por quadro entregue ao modelo.", FRAME_BUCKETS),
+        "pose_inference_frame_seconds": ("Inferência e serialização por quadro.", FRAME_BUCKETS),
+        "pose_bundle_encode_seconds": (
+            "Montagem do bundle antes do upload (colunar, gzip); o NDJSON é montado durante o PUT.",
+            STAGE_BUCKETS,
+        ),
+        "pose_upload_seconds": ("Tempo do PUT do bundle no R2.", STAGE_BUCKETS),
+        "pose_usable_frame_ratio": ("Fração de quadros com confiança >= 0,5, por job.", RATIO_BUCKETS),
+    }
+    COUNTERS = {
+        "pose_uploaded_bytes_total": "Bytes gravados no R2.",
+        "pose_frames_total": "Quadros entregues em bundles.",
+        "pose_usable_frames_total": "Quadros com confiança >= 0,5.",
+        "pose_jobs_total": "Jobs terminados, por desfecho.",
+        "pose_pool_rebuilds_total": "Pools de inferência refeitos depois de um processo morrer.",
+        "pose_callbacks_total": "Tentativas de callback, por desfecho (delivered, retried, dropped).",
+    }
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms = {name: Histogram(buckets) for name, (_, buckets) in self.HISTOGRAMS.items()}
+        self._counters: dict[str, dict[str, float]] = {name: {} for name in self.COUNTERS}
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self._histograms[name].observe(value)
+
+    def merge(self, name: str, histogram: Histogram) -> None:
+        with self._lock:
+            self._histograms[name].merge(histogram)
+
+    def inc(self, name: str, amount: float = 1, label: str = "") -> None:
+        """`label` já no formato do Prometheus, ex.: 'status="failed"'."""
+        with self._lock:
+            series = self._counters[name]
+            series[label] = series.get(label, 0) + amount
+
+    def timer(self, name: str) -> "MetricTimer":
+        return MetricTimer(self, name)
+
+    def render(self, gauges: dict[str, tuple[str, float]]) -> str:
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                lines += self._histograms[name].render(name)
+            for name, help_text in self.COUNTERS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                series = self._counters[name] or {"": 0}
+                lines += [f"{name}{{{label}}} {value}" if label else f"{name} {value}" for label, value in series.items()]
+        for name, (help_text, value) in gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class MetricTimer:
+    """`with METRICS.timer(nome):` observa a duração do bloco se ele terminar
+    sem exceção — um download que estourou o timeout não é latência típica."""
+
+    def __init__(self, metrics: Metrics, name: str) -> None:
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self) -> None:
+        self._started = time.perf_counter()
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self._metrics.observe(self._name, time.perf_counter() - self._started)
+
+
+METRICS = Metrics()
+
+
+# Campos do payload que mudam o objeto gravado. Dois pedidos só se fundem se
+# concordarem em todos — senão o segundo receberia um bundle que não pediu.
+COALESCE_FIELDS = (
+    "resultKey", "bundleFormat", "acceptEncoding", "view", "attempt", "capturedAt", "protocolSlug",
+    "modelComplexity", "maxLongEdge", "startMs", "endMs",
+)
+
+
+def coalesce_key(payload: dict) -> str:
+    return json.dumps([payload.get(field) for field in COALESCE_FIELDS], sort_keys=True)
+
+
+class JobQueue:
+    """Fila limitada drenada por um número fixo de workers.
+
+    Pedidos repetidos para o mesmo resultado enquanto o primeiro ainda está na
+    fila ou rodando — o Worker reenviando por timeout — não viram uma segunda
+    extração: entram como ouvintes do job em curso e recebem o mesmo callback,
+    cada um com o próprio token. Também compartilham o mesmo `JobStatus`, então
+    consultar ou cancelar por qualquer um dos jobIds afeta a extração única.
+    """
+
+    def __init__(self, workers: int, capacity: int) -> None:
+        self.workers = max(1, workers)
+        self.capacity = max(1, capacity)
+        self._pending: queue.Queue = queue.Queue(maxsize=self.capacity)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._coalesced = 0
+        self._inflight: dict[str, tuple[JobStatus, list[dict]]] = {}
+        self._statuses: OrderedDict[str, JobStatus] = OrderedDict()
+        self._threads: list[threading.Thread] = []
+        self._warmed = 0
+        self._pool_warmed = True
+        self.draining = False
+
+    def start(self, warm: bool = False) -> None:
+        """Sobe os workers. Com `warm`, cada modelo é aquecido antes de o
+        worker contar como pronto — por thread no executor thread, por
+        processo no process."""
+        if warm and _process_pool is not None:
+            # No process as threads não têm modelo: quem conta é o pool.
+            self._pool_warmed = False
+            threading.Thread(target=self._warm_pool, name="pose-warmup", daemon=True).start()
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, args=(warm and _process_pool is None,), name=f"pose-worker-{index}", daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def ready(self) -> bool:
+        """Pronto para receber job: aquecido e não encerrando."""
+        with self._lock:
+            return self._warmed >= self.workers and self._pool_warmed and not self.draining
+
+    def rewarm_pool(self) -> None:
+        """Pool trocado: fora do /ready até os processos novos aquecerem."""
+        with self._lock:
+            self._pool_warmed = False
+        threading.Thread(target=self._warm_pool, name="pose-warmup", daemon=True).start()
+
+    def _warm_pool(self) -> None:
+        started = time.monotonic()
+        try:
+            wait_process_pool(self.workers)
+        except Exception:
+            log.error("aquecimento do pool falhou; o servidor não fica pronto\n%s", traceback.format_exc())
+            return
+        log.info("pool aquecido em %.1f s", time.monotonic() - started)
+        with self._lock:
+            self._pool_warmed = True
+
+    def submit(self, payload: dict) -> str:
+        """Enfileira sem bloquear: "queued", "coalesced", "full" ou "draining"."""
+        with self._lock:
+            if self.draining:
+                return "draining"
+            return self._enqueue(payload)
+
+    def drain(self, finish_by: float, stop_by: float) -> bool:
+        """Para de aceitar e esvazia a fila. Prazos em `time.monotonic()`.
+
+        Os que ainda não começaram são cancelados na hora: não terminariam a
+        tempo, e cancelados ainda devolvem callback, em vez de sumir com o
+        container. Os em curso têm até `finish_by`; os que passarem disso são
+        cancelados e têm até `stop_by` para parar e avisar o Worker. True se
+        a fila esvaziou.
+        """
+        with self._lock:
+            self.draining = True
+            statuses = [status for status, _ in self._inflight.values()]
+        for status in statuses:
+            if status.phase == "queued":
+                status.cancel(retryable=True)
+        if self._wait_idle(finish_by):
+            return True
+        with self._lock:
+            statuses = [status for status, _ in self._inflight.values()]
+        log.info("encerrando: %d jobs passaram do prazo e serão cancelados", len(statuses))
+        for status in statuses:
+            status.cancel(retryable=True)
+        return self._wait_idle(stop_by)
+
+    def _wait_idle(self, deadline: float) -> bool:
+        # `unfinished_tasks` só cai no `task_done`, depois do callback:
+        # nenhum job fica entre tirado da fila e contado como ativo.
+        while self._pending.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def _enqueue(self, payload: dict) -> str:
+        key = coalesce_key(payload)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            status, waiters = inflight
+            waiters.append(payload)
+            self._coalesced += 1
+            self._track(payload["jobId"], status)
+            return "coalesced"
+        status = JobStatus(payload["jobId"])
+        try:
+            self._pending.put_nowait((payload, status))
+        except queue.Full:
+            return "full"
+        self._inflight[key] = (status, [payload])
+        self._track(payload["jobId"], status)
+        return "queued"
+
+    def _track(self, job_id: str, status: JobStatus) -> None:
+        self._statuses[job_id] = status
+        self._statuses.move_to_end(job_id)
+        # Esquece os terminados mais antigos; os em curso ficam sempre.
+        excess = len(self._statuses) - JOB_HISTORY
+        for old_id in [old_id for old_id, old in self._statuses.items() if old.finished][:max(0, excess)]:
+            del self._statuses[old_id]
+
+    def status(self, job_id: str) -> JobStatus | None:
+        with self._lock:
+            return self._statuses.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = self._active
+            coalesced = self._coalesced
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "queued": self._pending.qsize(),
+            "active": active,
+            "coalesced": coalesced,
+        }
+
+    def _warm_thread(self) -> bool:
+        started = time.monotonic()
+        try:
+            warm_up()
+        except Exception:
+            log.error("aquecimento falhou\n%s", traceback.format_exc())
+            return False
+        log.info("%s aquecido em %.1f s", threading.current_thread().name, time.monotonic() - started)
+        return True
+
+    def _work(self, warm: bool) -> None:
+        # Um worker que não aqueceu segue atendendo — o job é que vai falhar e
+        # dizer por quê —, mas não conta como pronto.
+        if not warm or self._warm_thread():
+            with self._lock:
+                self._warmed += 1
+        while True:
+            payload, status = self._pending.get()
+            with self._lock:
+                self._active += 1
+            try:
+                # Cancelado ainda na fila: o `enter("download")` interrompe
+                # antes de qualquer byte, e o callback avisa do mesmo jeito.
+                result = run_job(payload, status)
+                write_trace(payload, result)
+                # Fecha a fusão antes de avisar: um pedido que chegue depois
+                # daqui começa um job novo, não espera um callback que já saiu.
+                with self._lock:
+                    _, waiters = self._inflight.pop(coalesce_key(payload), (status, [payload]))
+                status.enter("notify")
+                for waiter in waiters:
+                    notify(waiter, result)
+                status.enter(result["status"])
+                METRICS.inc("pose_jobs_total", label=f'status="{result["status"]}"')
+            finally:
+                with self._lock:
+                    self._active -= 1
+                self._pending.task_done()
+
+
+JOBS = JobQueue(WORKERS, QUEUE_CAPACITY)
+
+JOB_FIELDS = ("jobId", "videoUrl", "resultPutUrl", "resultKey", "callbackUrl", "callbackToken")
+
+
+def is_count(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def payload_error(payload: dict, required: tuple[str, ...]) -> str | None:
+    """Mensagem do primeiro problema do payload de um job, ou None."""
+    faltando = [campo for campo in required if not payload.get(campo)]
+    if faltando:
+        return f"campos obrigatórios ausentes: {', '.join(faltando)}"
+    # bool é subclasse de int: `true` passaria por 1 sem isto.
+    complexity = payload.get("modelComplexity")
+    if complexity is not None and (isinstance(complexity, bool) or complexity not in MODEL_VARIANTS):
+        return "modelComplexity inválido (use 0, 1 ou 2)"
+    max_long_edge = payload.get("maxLongEdge")
+    if max_long_edge is not None and (not is_count(max_long_edge) or max_long_edge < 0):
+        return "maxLongEdge inválido (inteiro >= 0; 0 mantém o original)"
+    start_ms, end_ms = payload.get("startMs"), payload.get("endMs")
+    if any(value is not None and (not is_count(value) or value < 0) for value in (start_ms, end_ms)):
+        return "startMs e endMs são inteiros >= 0, em ms"
+    if end_ms is not None and end_ms <= (start_ms or 0):
+        return "endMs deve ser maior que startMs"
+    if payload.get("bundleFormat", "ndjson") not in BUNDLE_FORMATS:
+        return f"bundleFormat inválido (use {', '.join(BUNDLE_FORMATS)})"
+    return None
 
 
 class Handler(BaseHTTPRequestHandler):
-    def _json(self, status: int, body: dict) -> None:
-        raw = json.dumps(body).encode("utf-8")
+    def _json(self, status: int, body: dict, headers: dict | None = None) -> None:
+        self._send(status, json.dumps(body).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status: int, raw: bytes, content_type: str, headers: dict | None = None) -> None:
         self.send_response(status)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
         self.send_header("Content-Length", str(len(raw)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
         self.wfile.write(raw)
 
     def do_GET(self):  # noqa: N802
         if self.path == "/health":
-            self._json(200, {"ok": True, "engine": ENGINE_NAME, "version": ENGINE_VERSION})
+            self._json(200, {
+                "ok": True,
+                "engine": ENGINE_NAME,
+                "version": ENGINE_VERSION,
+                "executor": EXECUTOR,
+                "decoder": DECODER,
+                "input": INPUT_MODE,
+                "modelPolicy": MODEL_POLICY,
+                "roi": ROI_MODE,
+                "ready": JOBS.ready,
+                "draining": JOBS.draining,
+                "queue": JOBS.stats(),
+                "cache": RESULTS.stats(),
+                "outbox": OUTBOX.stats(),
+            })
+        elif self.path == "/ready":
+            # /health é vivacidade: responde enquanto o processo vive. Esta é
+            # prontidão: 503 aquecendo o modelo ou encerrando, para o
+            # balanceador mandar o próximo job a outra instância.
+            if JOBS.ready:
+                self._json(200, {"ready": True})
+            else:
+                self._json(503, {"error": "encerrando" if JOBS.draining else "aquecendo", "ready": False})
+        elif self.path == "/metrics":
+            stats = JOBS.stats()
+            text = METRICS.render({
+                "pose_queue_depth": ("Jobs esperando worker.", stats["queued"]),
+                "pose_active_jobs": ("Jobs em execução.", stats["active"]),
+                "pose_workers": ("Workers da fila.", stats["workers"]),
+                "pose_outbox_pending": ("Callbacks esperando entrega.", OUTBOX.stats()["pending"]),
+            })
+            self._send(200, text.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        elif self.path.startswith("/jobs/"):
+            status = JOBS.status(self.path[len("/jobs/"):])
+            if status is None:
+                self._json(404, {"error": "job não encontrado"})
+            else:
+                self._json(200, status.snapshot())
         else:
             self._json(404, {"error": "not found"})
 
+    def do_DELETE(self):  # noqa: N802
+        if not self.path.startswith("/jobs/"):
+            self._json(404, {"error": "not found"})
+            return
+        status = JOBS.status(self.path[len("/jobs/"):])
+        if status is None:
+            self._json(404, {"error": "job não encontrado"})
+        elif not status.cancel():
+            self._json(409, {"error": "job já terminou", **status.snapshot()})
+        else:
+            # Cooperativo: o job para na próxima fronteira de fase ou no
+            # próximo lote de quadros, e o callback sai como "cancelled".
+            self._json(202, status.snapshot())
+
     def do_POST(self):  # noqa: N802
         if self.path != "/analyze":
             self._json(404, {"error": "not found"})
@@ -321,24 +2838,90 @@ class Handler(BaseHTTPRequestHandler):
             self._json(400, {"error": "corpo inválido"})
             return
 
-        faltando = [
-            campo for campo in ("jobId", "videoUrl", "resultPutUrl", "resultKey", "callbackUrl", "callbackToken")
-            if not payload.get(campo)
-        ]
-        if faltando:
-            self._json(400, {"error": f"campos obrigatórios ausentes: {', '.join(faltando)}"})
+        error = payload_error(payload, JOB_FIELDS)
+        if error:
+            self._json(400, {"error": error})
             return
 
         # Responde na hora e processa em segundo plano: a extração leva de
         # dezenas de segundos a poucos minutos, muito além de qualquer timeout
         # razoável de requisição. O resultado chega pelo callback.
-        threading.Thread(target=run_job, args=(payload,), daemon=True).start()
-        self._json(202, {"accepted": True, "jobId": payload["jobId"]})
+        status = JOBS.submit(payload)
+        if status in ("full", "draining"):
+            self._refuse(status)
+            return
+        self._json(202, {"accepted": True, "jobId": payload["jobId"], "coalesced": status == "coalesced"})
+
+    def _refuse(self, status: str) -> None:
+        if status == "draining":
+            # Este container não volta; o Worker reenvia e cai numa instância
+            # nova.
+            self._json(503, {"error": "servidor encerrando"}, headers={"Retry-After": "1"})
+            return
+        self._json(
+            429,
+            {"error": "fila cheia, tente novamente", "queue": JOBS.stats()},
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
 
     def log_message(self, fmt, *args):
         log.info("%s - %s", self.address_string(), fmt % args)
 
 
+# Tomado uma vez, na própria chamada do sinal: `JOBS.draining` só vira na
+# thread de drenagem, e um segundo SIGTERM que chegue antes dela abriria outra.
+_shutdown_requested = threading.Lock()
+
+
+def request_shutdown(httpd: ThreadingHTTPServer) -> None:
+    """Reação ao SIGTERM: drena numa thread e devolve o controle já — o
+    handler roda na thread do `serve_forever`, que precisa seguir atendendo
+    /jobs e /ready durante a drenagem."""
+    if not _shutdown_requested.acquire(blocking=False):
+        return
+    threading.Thread(target=shutdown, args=(httpd,), name="pose-shutdown", daemon=True).start()
+
+
+def shutdown(httpd: ThreadingHTTPServer) -> None:
+    started = time.monotonic()
+    deadline = started + DRAIN_SECONDS
+    log.info("SIGTERM: parando de aceitar jobs; prazo de %.0f s", DRAIN_SECONDS)
+    drained = JOBS.drain(finish_by=deadline - DRAIN_CANCEL_SECONDS, stop_by=deadline - DRAIN_CANCEL_SECONDS / 2)
+    delivered = OUTBOX.flush(max(0.0, deadline - time.monotonic()))
+    log.info(
+        "drenagem em %.1f s: fila %s, callbacks %s",
+        time.monotonic() - started,
+        "vazia" if drained else "com jobs ainda parando",
+        "entregues" if delivered else f"{OUTBOX.stats()['pending']} pendentes no outbox",
+    )
+    httpd.shutdown()
+
+
 if __name__ == "__main__":
-    log.info("extrator de pose ouvindo em :%d (mediapipe %s)", PORT, ENGINE_VERSION)
-    ThreadingHTTPServer(("0.0.0.0", PORT), Handler).serve_forever()
+    if EXECUTOR not in EXECUTORS:
+        raise SystemExit(f"POSE_EXECUTOR inválido: {EXECUTOR!r} (use {', '.join(EXECUTORS)})")
+    if DECODER not in DECODERS:
+        raise SystemExit(f"POSE_DECODER inválido: {DECODER!r} (use {', '.join(DECODERS)})")
+    if INPUT_MODE not in INPUT_MODES:
+        raise SystemExit(f"POSE_INPUT inválido: {INPUT_MODE!r} (use {', '.join(INPUT_MODES)})")
+    if MODEL_POLICY not in MODEL_POLICIES:
+        raise SystemExit(f"POSE_MODEL_POLICY inválido: {MODEL_POLICY!r} (use {', '.join(MODEL_POLICIES)})")
+    if ROI_MODE not in ROI_MODES:
+        raise SystemExit(f"POSE_ROI inválido: {ROI_MODE!r} (use {', '.join(ROI_MODES)})")
+    if SEGMENTS > 1 and EXECUTOR != "process":
+        raise SystemExit("POSE_SEGMENTS > 1 exige POSE_EXECUTOR=process: cada parte roda num processo do pool.")
+    log.info(
+        "extrator de pose ouvindo em :%d (mediapipe %s, %d workers, executor %s, decoder %s, entrada %s)",
+        PORT, ENGINE_VERSION, JOBS.workers, EXECUTOR, DECODER, INPUT_MODE,
+    )
+    if EXECUTOR == "process":
+        start_process_pool(JOBS.workers)
+    OUTBOX.start()
+    # O HTTP sobe já, para a vivacidade responder; o aquecimento corre nos
+    # workers e só ele libera o /ready. Job que chegue antes espera na fila.
+    JOBS.start(warm=True)
+    httpd = ThreadingHTTPServer(("0.0.0.0", PORT), Handler)
+    signal.signal(signal.SIGTERM, lambda signum, frame: request_shutdown(httpd))
+    httpd.serve_forever()
+    stop_process_pool()
+    log.info("extrator de pose encerrado")
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+# O container é um script solto, sem pacote instalável: os testes importam
+# `server` direto da pasta dele.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from types import SimpleNamespace  # noqa: E402
+
+import server  # noqa: E402
+
+
+def fake_result(points) -> SimpleNamespace:
+    """Resultado no formato do MediaPipe a partir de (x, y, z, visibility);
+    `None` é quadro sem pessoa."""
+    if points is None:
+        return SimpleNamespace(pose_landmarks=None)
+    landmarks = [SimpleNamespace(x=x, y=y, z=z, visibility=v) for x, y, z, v in points]
+    return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=landmarks))
+
+
+class GrayPose:
+    """Devolve o cinza médio do quadro como coordenada de todos os pontos: o
+    quadro que chega ao modelo diz de onde o decoder leu."""
+
+    def process(self, frame):
+        value = float(frame.mean()) / 255
+        landmark = SimpleNamespace(x=value, y=value, z=0.0, visibility=0.9)
+        return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=[landmark] * server.LANDMARK_COUNT))
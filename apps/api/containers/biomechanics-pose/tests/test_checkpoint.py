@@ -0,0 +1,109 @@
+import shutil
+import threading
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+import server
+from conftest import GrayPose
+
+META = {"fps": 60.0, "durationMs": 2000, "width": 64, "height": 48}
+
+
+@pytest.fixture
+def video(tmp_path):
+    """2 s a 60 fps, cada quadro com um cinza diferente: o quadro que chega ao
+    modelo diz de onde o decoder retomou."""
+    path = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 60.0, (64, 48))
+    for index in range(120):
+        writer.write(np.full((48, 64, 3), index * 2, np.uint8))
+    writer.release()
+    return path
+
+
+class CancelAfter(server.Progress):
+    def __init__(self, frames: int) -> None:
+        super().__init__(types.SimpleNamespace(value=0), threading.Event())
+        self.limit = frames
+
+    def report(self, emitted: int) -> None:
+        if emitted >= self.limit:
+            self.cancel.set()
+        super().report(emitted)
+
+
+@pytest.fixture(autouse=True)
+def gray_pose(monkeypatch):
+    monkeypatch.setattr(server, "acquire_pose", lambda complexity=server.MODEL_COMPLEXITY: GrayPose())
+    monkeypatch.setattr(server, "CHECKPOINT_EVERY", 10)
+
+
+def test_estado_vale_so_ate_os_bytes_gravados(tmp_path):
+    spool = tmp_path / "frames.ndjson"
+    spool.write_text("\na\nb")
+    checkpoint = server.Checkpoint(str(tmp_path / "ckpt"))
+    assert checkpoint.restore(str(tmp_path / "out")) is None
+    checkpoint.save(str(spool), {"frames": 2})
+    # Uma gravação interrompida depois da cópia e antes do estado.
+    with open(tmp_path / "ckpt" / "frames.ndjson", "a") as handle:
+        handle.write("\nc")
+
+    state = server.Checkpoint(str(tmp_path / "ckpt")).restore(str(tmp_path / "out"))
+    assert state == {"frames": 2, "bytes": 4}
+    assert (tmp_path / "out").read_text() == "\na\nb"
+
+
+def test_chave_e_o_resultado_nao_o_job():
+    settings = server.extraction_settings()
+    key = server.checkpoint_path("org/a-container-v1.ndjson", "sha256:v", settings)
+    # Reenvio da mesma captura: jobId novo, mesmo resultKey.
+    assert key == server.checkpoint_path("org/a-container-v1.ndjson", "sha256:v", settings)
+    assert key != server.checkpoint_path("org/b-container-v1.ndjson", "sha256:v", settings)
+    assert key != server.checkpoint_path("org/a-container-v1.ndjson", "sha256:w", settings)
+
+
+@pytest.mark.parametrize("decoder", ["opencv", "ffmpeg"])
+def test_retomada_emenda_igual_a_extracao_corrida(tmp_path, video, monkeypatch, decoder):
+    if decoder == "ffmpeg" and shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg ausente")
+    monkeypatch.setattr(server, "DECODER", decoder)
+    full = tmp_path / "full.ndjson"
+    whole = server.extract_landmarks(video, META, str(full))
+
+    root = str(tmp_path / "ckpt")
+    with pytest.raises(server.JobCancelled):
+        server.extract_landmarks(video, META, str(tmp_path / "a.ndjson"), CancelAfter(20), None, None, root)
+    resumed = tmp_path / "b.ndjson"
+    extraction = server.extract_landmarks(video, META, str(resumed), None, None, None, root)
+
+    assert extraction["span"]["resumedFrom"] == 20
+    assert extraction["frameCount"] == whole["frameCount"] == 60
+    assert resumed.read_text() == full.read_text()
+
+
+def test_retomada_dentro_de_um_trecho_mantem_o_t(tmp_path, video):
+    time_range = {"startMs": 500, "endMs": 1500}
+    full = tmp_path / "full.ndjson"
+    server.extract_landmarks(video, META, str(full), None, None, time_range)
+
+    root = str(tmp_path / "ckpt")
+    with pytest.raises(server.JobCancelled):
+        server.extract_landmarks(video, META, str(tmp_path / "a.ndjson"), CancelAfter(10), None, time_range, root)
+    resumed = tmp_path / "b.ndjson"
+    server.extract_landmarks(video, META, str(resumed), None, None, time_range, root)
+    assert resumed.read_text() == full.read_text()
+
+
+def test_extracao_completa_nao_reabre_o_video(tmp_path, video):
+    root = str(tmp_path / "ckpt")
+    first = server.extract_landmarks(video, META, str(tmp_path / "a.ndjson"), None, None, None, root)
+
+    again = tmp_path / "b.ndjson"
+    extraction = server.extract_landmarks("/nao/existe.mp4", META, str(again), None, None, None, root)
+    assert extraction["frameCount"] == first["frameCount"]
+    assert extraction["usableFrames"] == first["usableFrames"]
+    assert extraction["span"]["resumedFrom"] == first["frameCount"]
+    assert again.read_text() == (tmp_path / "a.ndjson").read_text()
@@ -0,0 +1,86 @@
+"""
+O bundle colunar tem de devolver exatamente os números do NDJSON: a matemática
+clínica não pode mudar conforme o formato que o job pediu.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+import server
+from conftest import fake_result
+
+HEADER = {"schema": server.SCHEMA, "landmarkCount": server.LANDMARK_COUNT, "order": "blazepose33", "fps": 30.0}
+
+
+def write_spool(path, frames) -> int:
+    writer = server.FrameWriter(str(path))
+    for index, points in enumerate(frames):
+        writer.add(*server.landmark_frame(fake_result(points), index, index * 2, 60.0))
+    writer.close()
+    return writer.count
+
+
+def round_trip(tmp_path, frames) -> tuple[list[dict], list[dict], bytes]:
+    spool = tmp_path / "frames.ndjson"
+    count = write_spool(spool, frames)
+    header = {**HEADER, "frameCount": count}
+    columnar = tmp_path / "frames.ffpc"
+    server.write_columnar(str(spool), header, str(columnar))
+
+    data = columnar.read_bytes()
+    decoded_header, decoded = server.decode_columnar(data)
+    assert decoded_header == header
+    expected = [json.loads(line) for line in spool.read_text().splitlines() if line]
+    return expected, decoded, data
+
+
+def random_frames(rng, count, spread=1.2):
+    frames = []
+    for n in range(count):
+        if n % 7 == 3:
+            frames.append(None)
+            continue
+        points = rng.uniform(-spread, spread, size=(server.LANDMARK_COUNT, 4))
+        points[:, 3] = rng.uniform(0.0, 1.0, size=server.LANDMARK_COUNT)
+        frames.append(points.tolist())
+    return frames
+
+
+def test_mesmos_numeros_que_o_ndjson(tmp_path):
+    expected, decoded, data = round_trip(tmp_path, random_frames(np.random.default_rng(7), 300))
+    assert decoded == expected
+    assert data[5] == 2  # cabe em int16
+    assert len(data) < (tmp_path / "frames.ndjson").stat().st_size / 3
+
+
+def test_valores_fora_do_int16_vao_em_int32_sem_saturar(tmp_path):
+    expected, decoded, data = round_trip(tmp_path, random_frames(np.random.default_rng(11), 20, spread=5.0))
+    assert decoded == expected
+    assert data[5] == 4
+
+
+def test_rejeita_arquivo_truncado(tmp_path):
+    _, _, data = round_trip(tmp_path, random_frames(np.random.default_rng(3), 5))
+    with pytest.raises(ValueError):
+        server.decode_columnar(data[:-2])
+
+
+@pytest.mark.parametrize("delta", [1, -1])
+def test_rejeita_spool_que_nao_bate_com_o_cabecalho(tmp_path, delta):
+    spool = tmp_path / "frames.ndjson"
+    count = write_spool(spool, random_frames(np.random.default_rng(5), 4))
+    with pytest.raises(RuntimeError):
+        server.write_columnar(str(spool), {**HEADER, "frameCount": count + delta}, str(tmp_path / "x.ffpc"))
+    assert not (tmp_path / "x.ffpc.k").exists()
+
+
+def test_blocos_emendam_e_nao_deixam_sobra(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "COLUMNAR_CHUNK_FRAMES", 64)
+    frames = random_frames(np.random.default_rng(13), 300)
+    frames[200] = np.full((server.LANDMARK_COUNT, 4), 4.0).tolist()  # só um bloco passa do int16
+    expected, decoded, data = round_trip(tmp_path, frames)
+    assert decoded == expected
+    assert data[5] == 4
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["frames.ffpc", "frames.ndjson"]
@@ -0,0 +1,79 @@
+"""
+Golden do `ff-pose-33-v1`: a linha de quadro vetorizada tem de sair byte a
+byte igual à do laço original (quantize por landmark + json.dumps). Um dígito
+diferente muda o SHA-256 gravado e, pior, o número que a matemática clínica lê.
+"""
+
+import json
+import math
+
+import numpy as np
+import pytest
+
+import server
+from conftest import fake_result
+
+
+def reference_line(result, index: int, source_index: int, source_fps: float) -> str:
+    """O laço de antes da vetorização, copiado literalmente."""
+    flat: list[float] = []
+    scores: list[float] = []
+    if result.pose_landmarks:
+        for landmark in result.pose_landmarks.landmark:
+            score = float(getattr(landmark, "visibility", 1.0) or 0.0)
+            flat.extend([
+                server.quantize(landmark.x),
+                server.quantize(landmark.y),
+                server.quantize(landmark.z),
+                server.quantize(score),
+            ])
+            scores.append(score)
+    else:
+        flat = [0.0] * (server.LANDMARK_COUNT * 4)
+        scores = [0.0]
+    frame = {
+        "i": index,
+        "t": int(round((source_index / source_fps) * 1000)) if source_fps else 0,
+        "k": flat,
+        "c": server.quantize(float(np.mean(scores))),
+    }
+    return json.dumps(frame, separators=(",", ":"))
+
+
+def assert_same(points, index=0, source_index=0, source_fps=30.0) -> None:
+    result = fake_result(points)
+    line, confidence = server.landmark_frame(result, index, source_index, source_fps)
+    expected = reference_line(result, index, source_index, source_fps)
+    assert line == expected
+    assert confidence == json.loads(expected)["c"]
+
+
+def test_frame_sem_pessoa():
+    assert_same(None, index=7, source_index=14, source_fps=59.94)
+
+
+def test_quadros_aleatorios_identicos_ao_laco_original():
+    rng = np.random.default_rng(20260806)
+    for index in range(500):
+        points = rng.uniform(-1.5, 1.5, size=(server.LANDMARK_COUNT, 4))
+        points[:, 3] = rng.uniform(0.0, 1.0, size=server.LANDMARK_COUNT)
+        assert_same(points.tolist(), index=index, source_index=index * 2, source_fps=60.0)
+
+
+def test_valores_no_limite_do_arredondamento():
+    # Meios exatos em decimal, que em binário caem um fio acima ou abaixo.
+    halves = [0.00005, 0.12345, -0.12345, 0.99995, 1.00005, 0.5, -0.00005, 2.67495]
+    points = [(h, -h, h / 3, abs(h) % 1) for h in halves]
+    points += [(0.1, 0.2, 0.3, 0.4)] * (server.LANDMARK_COUNT - len(points))
+    assert_same(points)
+
+
+def test_nao_finitos_e_zero_negativo():
+    points = [(math.nan, math.inf, -math.inf, math.nan), (-0.0, -0.00001, 0.0, -0.0)]
+    points += [(0.5, 0.5, -0.0, 0.9)] * (server.LANDMARK_COUNT - len(points))
+    assert_same(points)
+
+
+@pytest.mark.parametrize("value", [0.123449999, 0.12345, 0.123450001, -3.14159265, 1e-9, 123.456789])
+def test_quantize_array_igual_ao_escalar(value):
+    assert server.quantize_array(np.array([value]))[0] == server.quantize(value)
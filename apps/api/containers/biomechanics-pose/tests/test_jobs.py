@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+import server
+
+
+def payload(job_id: str, **extra) -> dict:
+    return {"jobId": job_id, "resultKey": "k", "view": "frontal", "attempt": 1, **extra}
+
+
+def test_status_acumula_tempo_por_fase():
+    status = server.JobStatus("j1")
+    status.enter("download")
+    status.enter("probe")
+    status.frames_estimated = 90
+    status.progress.report(30)
+
+    snapshot = status.snapshot()
+    assert snapshot["phase"] == "probe"
+    assert snapshot["framesProcessed"] == 30
+    assert snapshot["framesEstimated"] == 90
+    assert list(snapshot["elapsedMs"]) == ["queued", "download", "probe"]
+
+
+def test_cancelamento_interrompe_na_proxima_fronteira():
+    status = server.JobStatus("j1")
+    status.enter("extract")
+    assert status.cancel()
+
+    with pytest.raises(server.JobCancelled):
+        status.progress.report(10)
+    with pytest.raises(server.JobCancelled):
+        status.enter("upload")
+
+    # Registrar o desfecho nunca é interrompido.
+    status.enter("notify")
+    status.enter("cancelled")
+    assert not status.cancel()
+
+
+def test_pedido_fundido_compartilha_o_status():
+    jobs = server.JobQueue(workers=1, capacity=4)
+    assert jobs.submit(payload("j1")) == "queued"
+    assert jobs.submit(payload("j2")) == "coalesced"
+
+    assert jobs.status("j1") is jobs.status("j2")
+    assert jobs.status("j3") is None
+
+
+def eventually(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_pronto_so_depois_de_aquecer(monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(server, "warm_up", gate.wait)
+    jobs = server.JobQueue(workers=2, capacity=4)
+    jobs.start(warm=True)
+
+    assert not jobs.ready
+    gate.set()
+    assert eventually(lambda: jobs.ready)
+
+
+def test_drenagem_cancela_quem_nao_comecou_e_recusa_novos(monkeypatch):
+    sent = []
+    monkeypatch.setattr(server, "notify", lambda target, body: sent.append(body))
+    jobs = server.JobQueue(workers=1, capacity=4)
+    jobs.submit(payload("j1", resultKey="k1"))
+    jobs.submit(payload("j2", resultKey="k2"))
+
+    # Prazo já vencido: só cancela e volta.
+    assert not jobs.drain(finish_by=0, stop_by=0)
+    assert jobs.submit(payload("j3", resultKey="k3")) == "draining"
+    assert not jobs.ready
+
+    jobs.start()
+    assert jobs._wait_idle(time.monotonic() + 5)
+    assert [(body["status"], body.get("retryable")) for body in sent] == [("cancelled", True)] * 2
+
+
+def test_segundo_sigterm_nao_abre_outra_drenagem(monkeypatch):
+    monkeypatch.setattr(server, "_shutdown_requested", threading.Lock())
+    started = []
+    monkeypatch.setattr(server, "shutdown", started.append)
+
+    # O segundo sinal chega antes de a thread de drenagem marcar `draining`.
+    server.request_shutdown("httpd")
+    server.request_shutdown("httpd")
+    for thread in threading.enumerate():
+        if thread.name == "pose-shutdown":
+            thread.join(1)
+    assert started == ["httpd"]
+
+
+def test_workers_seguem_a_cota_do_cgroup_e_nao_o_host(tmp_path, monkeypatch):
+    monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: set(range(64)))
+    (tmp_path / "cpu.max").write_text("400000 100000\n")
+    assert server.available_cpus(str(tmp_path)) == 4
+    # Cota fracionária arredonda para cima: 2,5 vCPU ainda comportam 3 workers.
+    (tmp_path / "cpu.max").write_text("250000 100000\n")
+    assert server.available_cpus(str(tmp_path)) == 3
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert server.available_cpus(str(tmp_path)) == 64
+
+    v1 = tmp_path / "v1"
+    (v1 / "cpu").mkdir(parents=True)
+    (v1 / "cpu" / "cpu.cfs_quota_us").write_text("200000")
+    (v1 / "cpu" / "cpu.cfs_period_us").write_text("100000")
+    assert server.available_cpus(str(v1)) == 2
@@ -0,0 +1,79 @@
+import server
+
+
+def test_histograma_acumula_por_faixa():
+    histogram = server.Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.render("x") == [
+        'x_bucket{le="0.1"} 2',
+        'x_bucket{le="1.0"} 3',
+        'x_bucket{le="+Inf"} 4',
+        "x_sum 2.65",
+        "x_count 4",
+    ]
+
+
+def test_histograma_do_processo_filho_soma_no_registro():
+    metrics = server.Metrics()
+    local = server.Histogram(server.FRAME_BUCKETS)
+    local.observe(0.03)
+    local.observe(0.04)
+    metrics.merge("pose_inference_frame_seconds", local)
+    metrics.merge("pose_inference_frame_seconds", local)
+
+    text = metrics.render({})
+    assert "pose_inference_frame_seconds_count 4" in text
+    assert 'pose_inference_frame_seconds_bucket{le="0.035"} 2' in text
+
+
+def test_contador_com_rotulo_e_gauge():
+    metrics = server.Metrics()
+    metrics.inc("pose_jobs_total", label='status="failed"')
+    metrics.inc("pose_jobs_total", label='status="failed"')
+
+    text = metrics.render({"pose_queue_depth": ("Fila.", 3)})
+    assert 'pose_jobs_total{status="failed"} 2' in text
+    assert "pose_uploaded_bytes_total 0" in text
+    assert "# TYPE pose_queue_depth gauge\npose_queue_depth 3\n" in text
+
+
+def test_timer_ignora_bloco_que_falhou():
+    metrics = server.Metrics()
+    try:
+        with metrics.timer("pose_upload_seconds"):
+            raise RuntimeError("PUT falhou")
+    except RuntimeError:
+        pass
+    with metrics.timer("pose_upload_seconds"):
+        pass
+
+    assert "pose_upload_seconds_count 1" in metrics.render({})
+
+
+def test_trace_registra_span_que_falhou():
+    trace = server.Trace()
+    with trace.span("probe"):
+        pass
+    try:
+        with trace.span("download"):
+            raise RuntimeError("rede")
+    except RuntimeError:
+        pass
+
+    probe, download = trace.to_dict()["spans"]
+    assert list(probe) == ["name", "startMs", "wallMs", "cpuMs", "peakRssMb"]
+    assert "failed" not in probe
+    assert download["failed"] is True
+
+
+def test_trace_aceita_medidas_de_outro_processo():
+    trace = server.Trace()
+    with trace.span("extract") as span:
+        span.update({"cpuMs": 1234.5, "peakRssMb": 512.0, "children": []})
+
+    (extract,) = trace.to_dict()["spans"]
+    assert extract["cpuMs"] == 1234.5
+    assert extract["peakRssMb"] == 512.0
+    assert extract["wallMs"] >= 0
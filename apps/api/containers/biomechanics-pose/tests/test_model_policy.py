@@ -0,0 +1,75 @@
+import pytest
+
+import server
+
+CLINICAL = 30_000
+SCREENING = 600_000
+
+
+@pytest.fixture
+def adaptive(monkeypatch):
+    monkeypatch.setattr(server, "MODEL_POLICY", "adaptive")
+    monkeypatch.setattr(server, "DECODER", "ffmpeg")
+    monkeypatch.setattr(server, "MAX_LONG_EDGE", 0)
+    monkeypatch.setattr(server, "WORKERS", 2)
+    monkeypatch.setattr(server, "BACKLOG_JOBS", None)
+
+
+def test_fixed_mantem_heavy_em_qualquer_fila():
+    variant = server.choose_variant({}, SCREENING, queued=50)
+    assert variant["modelComplexity"] == 2
+    assert variant["reason"] == "fixed"
+
+
+def test_adaptive_mantem_heavy_no_clipe_clinico(adaptive):
+    variant = server.choose_variant({}, CLINICAL, queued=50)
+    assert variant == {"modelComplexity": 2, "maxLongEdge": server.ADAPTIVE_LONG_EDGE, "reason": "clinical"}
+
+
+def test_adaptive_desce_para_full_so_com_fila_acumulada(adaptive):
+    assert server.choose_variant({}, SCREENING, queued=1)["modelComplexity"] == 2
+    variant = server.choose_variant({}, SCREENING, queued=2)
+    assert variant["modelComplexity"] == 1
+    assert variant["reason"] == "screening-backlog"
+
+
+def test_trecho_curto_de_video_longo_e_clinico(adaptive):
+    meta = {"fps": 30.0, "durationMs": 600_000, "width": 1920, "height": 1080}
+    duration = server.clip_duration_ms(meta, server.requested_range({"startMs": 120_000, "endMs": 125_000}))
+    variant = server.choose_variant({}, duration, queued=50)
+    assert variant["modelComplexity"] == 2
+    assert variant["reason"] == "clinical"
+
+
+def test_payload_prevalece_sobre_a_politica(adaptive):
+    variant = server.choose_variant({"modelComplexity": 0, "maxLongEdge": 640}, SCREENING, queued=50)
+    assert variant == {"modelComplexity": 0, "maxLongEdge": 640, "reason": "payload"}
+
+
+def test_opencv_nao_registra_reducao_que_nao_aplica(adaptive, monkeypatch):
+    monkeypatch.setattr(server, "DECODER", "opencv")
+    assert server.choose_variant({"maxLongEdge": 640}, CLINICAL, queued=0)["maxLongEdge"] == 0
+
+
+def test_variante_vai_no_cabecalho():
+    meta = {"fps": 30.0, "durationMs": 1000, "width": 1280, "height": 720}
+    extraction = {"fps": 30.0, "frameCount": 30, "truncated": False, "variant": {"modelComplexity": 1, "maxLongEdge": 0}}
+    header = server.bundle_header(meta, extraction, {"view": "frontal", "attempt": 1})
+    assert header["poseEngine"]["modelVariant"] == "full"
+    assert "inputLongEdge" not in header["poseEngine"]
+
+
+def test_reducao_da_entrada_vai_no_cabecalho():
+    meta = {"fps": 30.0, "durationMs": 1000, "width": 1920, "height": 1080}
+    extraction = {"fps": 30.0, "frameCount": 30, "truncated": False, "variant": {"modelComplexity": 2, "maxLongEdge": 960}}
+    assert server.bundle_header(meta, extraction, {})["poseEngine"]["inputLongEdge"] == 960
+    # Vídeo já menor que o teto: nada foi reduzido.
+    small = {**meta, "width": 640, "height": 360}
+    assert "inputLongEdge" not in server.bundle_header(small, extraction, {})["poseEngine"]
+
+
+def test_complexidade_booleana_e_recusada():
+    job = {field: "x" for field in server.JOB_FIELDS}
+    assert server.payload_error({**job, "modelComplexity": 0}, server.JOB_FIELDS) is None
+    assert "modelComplexity" in server.payload_error({**job, "modelComplexity": True}, server.JOB_FIELDS)
+    assert "maxLongEdge" in server.payload_error({**job, "maxLongEdge": False}, server.JOB_FIELDS)
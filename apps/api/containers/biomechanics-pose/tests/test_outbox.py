@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import server
+
+
+class FakeWorker:
+    """Responde cada POST com o próximo desfecho da lista (status ou exceção)."""
+
+    def __init__(self, *outcomes) -> None:
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def post(self, url, json, headers, timeout):
+        self.calls.append((url, json, headers))
+        outcome = self.outcomes.pop(0) if self.outcomes else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(ok=200 <= outcome < 300, status_code=outcome)
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    def install(*outcomes):
+        fake = FakeWorker(*outcomes)
+        monkeypatch.setattr(server.requests, "post", fake.post)
+        return fake
+
+    monkeypatch.setattr(server, "CALLBACK_RETRY_BASE_SECONDS", 0.01)
+    return install
+
+
+def test_entrega_com_token_e_apaga_do_disco(tmp_path, worker):
+    fake = worker(200)
+    outbox = server.CallbackOutbox(str(tmp_path))
+    outbox.start()
+    outbox.enqueue("http://worker/cb/j1", "tok", {"status": "succeeded"}, "job j1")
+
+    assert outbox.flush(5)
+    assert fake.calls == [("http://worker/cb/j1", {"status": "succeeded"}, {"X-Pose-Callback-Token": "tok"})]
+    assert list(tmp_path.iterdir()) == []
+    assert outbox.stats()["delivered"] == 1
+
+
+def test_falha_de_rede_e_5xx_tentam_de_novo(tmp_path, worker):
+    fake = worker(requests.ConnectionError("fora"), 503, 200)
+    outbox = server.CallbackOutbox(str(tmp_path))
+    outbox.start()
+    outbox.enqueue("http://worker/cb/j1", None, {"status": "failed"}, "job j1")
+
+    assert outbox.flush(5)
+    assert len(fake.calls) == 3
+    assert fake.calls[0][2] == {}
+    assert outbox.stats()["retried"] == 2
+
+
+def test_4xx_definitivo_descarta(tmp_path, worker):
+    fake = worker(401)
+    outbox = server.CallbackOutbox(str(tmp_path))
+    outbox.start()
+    outbox.enqueue("http://worker/cb/j1", "tok", {}, "job j1")
+
+    assert outbox.flush(5)
+    assert len(fake.calls) == 1
+    assert outbox.stats()["dropped"] == 1
+
+
+def test_mesmo_destino_entrega_so_o_ultimo(tmp_path, worker):
+    fake = worker()
+    outbox = server.CallbackOutbox(str(tmp_path))
+    outbox.enqueue("http://worker/cb/j1", "tok", {"n": 1}, "job j1")
+    outbox.enqueue("http://worker/cb/j1", "tok", {"n": 2}, "job j1")
+    outbox.start()
+
+    assert outbox.flush(5)
+    assert [body for _, body, _ in fake.calls] == [{"n": 2}]
+    assert outbox.stats()["coalesced"] == 1
+
+
+def test_pendente_sobrevive_a_reinicio(tmp_path, worker):
+    fake = worker()
+    server.CallbackOutbox(str(tmp_path)).enqueue("http://worker/cb/j1", "tok", {"n": 1}, "job j1")
+
+    outbox = server.CallbackOutbox(str(tmp_path))
+    outbox.start()
+    assert outbox.flush(5)
+    assert [url for url, _, _ in fake.calls] == ["http://worker/cb/j1"]
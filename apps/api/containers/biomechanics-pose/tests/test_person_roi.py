@@ -0,0 +1,76 @@
+import numpy as np
+
+import server
+
+
+def person(left: float, top: float, right: float, bottom: float) -> np.ndarray:
+    """33 pontos normalizados com a caixa pedida: cantos repetidos, z e
+    visibilidade fixos."""
+    points = np.zeros((server.LANDMARK_COUNT, 4))
+    points[:, 0] = np.linspace(left, right, server.LANDMARK_COUNT)
+    points[:, 1] = np.linspace(top, bottom, server.LANDMARK_COUNT)
+    points[:, 2] = -0.2
+    points[:, 3] = 0.9
+    return points
+
+
+def test_primeiro_quadro_vai_inteiro_e_depois_recorta_com_folga():
+    roi = server.PersonRoi(1000, 500)
+    frame = np.zeros((500, 1000, 3), np.uint8)
+    assert roi.crop(frame) is frame
+
+    roi.observe(person(0.4, 0.2, 0.6, 0.8))
+    x0, y0, x1, y1 = roi.window
+    assert x0 == int(400 - 200 * server.ROI_PADDING)
+    assert y0 == max(0, int(100 - 300 * server.ROI_PADDING))
+    assert roi.crop(frame).shape == (y1 - y0, x1 - x0, 3)
+
+
+def test_pontos_do_recorte_voltam_ao_quadro_inteiro():
+    roi = server.PersonRoi(1000, 500)
+    roi.window = (200, 100, 600, 300)
+    points = person(0.5, 0.5, 0.5, 0.5)
+    roi.observe(points)
+    assert np.allclose(points[:, 0], 400 / 1000)
+    assert np.allclose(points[:, 1], 200 / 500)
+    assert np.allclose(points[:, 2], -0.2 * 400 / 1000)
+    assert np.allclose(points[:, 3], 0.9)
+
+
+def test_janela_fica_parada_enquanto_a_pessoa_cabe():
+    roi = server.PersonRoi(1000, 500)
+    roi.observe(person(0.4, 0.2, 0.6, 0.8))
+    window = roi.window
+    x0, y0, x1, y1 = window
+    # A mesma pessoa, um pouco deslocada, nas coordenadas da janela.
+    roi.observe(person(
+        (410 - x0) / (x1 - x0), (100 - y0) / (y1 - y0), (610 - x0) / (x1 - x0), (400 - y0) / (y1 - y0),
+    ))
+    assert roi.window == window
+    assert roi.moves == 1
+
+
+def test_sem_pessoa_volta_ao_quadro_inteiro():
+    roi = server.PersonRoi(1000, 500)
+    roi.observe(person(0.4, 0.2, 0.6, 0.8))
+    roi.observe(None)
+    assert roi.window is None
+    assert roi.stats()["trackingLost"] == 1
+
+
+def test_pessoa_ocupando_o_quadro_nao_recorta():
+    roi = server.PersonRoi(1000, 500)
+    roi.observe(person(0.05, 0.05, 0.95, 0.95))
+    assert roi.window is None
+
+
+def test_modo_vai_no_cabecalho_e_na_chave(monkeypatch):
+    meta = {"fps": 30.0, "durationMs": 1000, "width": 1280, "height": 720}
+    extraction = {"fps": 30.0, "frameCount": 30, "truncated": False, "roi": {"mode": "person"}}
+    header = server.bundle_header(meta, extraction, {})
+    assert header["poseEngine"]["inputCrop"] == "person"
+    assert "inputCrop" not in server.bundle_header(meta, {**extraction, "roi": None}, {})["poseEngine"]
+
+    off = server.extraction_settings()
+    monkeypatch.setattr(server, "ROI_MODE", "person")
+    assert server.cache_key("sha256:v", off) != server.cache_key("sha256:v", server.extraction_settings())
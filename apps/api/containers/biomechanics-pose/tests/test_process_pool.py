@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import server
+
+
+def eventually(condition, timeout: float = 60) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Pool sem o aquecimento do MediaPipe e uma fila que conta como pronta."""
+    context = multiprocessing.get_context("spawn")
+    pools = []
+
+    def new_pool(workers):
+        pools.append(ProcessPoolExecutor(max_workers=workers, mp_context=context))
+        return pools[-1]
+
+    monkeypatch.setattr(server, "new_process_pool", new_pool)
+    jobs = server.JobQueue(workers=1, capacity=2)
+    jobs._warmed = 1
+    monkeypatch.setattr(server, "JOBS", jobs)
+    monkeypatch.setattr(server, "_process_pool", new_pool(1))
+    yield jobs
+    for created in pools:
+        created.shutdown(wait=True, cancel_futures=True)
+
+
+def test_processo_morto_refaz_o_pool_e_tira_do_ready(pool):
+    broken = server._process_pool
+    # Um processo que morre sem levantar exceção: o que o OOM killer faz.
+    future = broken.submit(os._exit, 1)
+    with pytest.raises(RuntimeError, match="processo de inferência morreu"):
+        server.pool_result(broken, future)
+
+    assert server._process_pool is not broken
+    assert not pool.ready
+    assert eventually(lambda: pool.ready)
+
+
+def test_job_seguinte_roda_no_pool_novo(pool):
+    broken = server._process_pool
+    broken.submit(os._exit, 1).exception()
+
+    # Quem chega com o pool já quebrado não herda a quebra: o erro é o do
+    # próprio job, vindo de um processo vivo.
+    with pytest.raises(RuntimeError, match="abrir o vídeo"):
+        server.run_extraction("/nao/existe.mp4", {"fps": 30.0}, "/tmp/nada.ndjson")
+    assert server._process_pool is not broken
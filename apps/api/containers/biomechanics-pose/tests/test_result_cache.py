@@ -0,0 +1,45 @@
+import server
+
+
+def spool(tmp_path, name: str, size: int) -> str:
+    path = tmp_path / name
+    path.write_text("x" * size)
+    return str(path)
+
+
+def test_acerto_devolve_o_spool_e_conta(tmp_path):
+    cache = server.ResultCache(str(tmp_path / "cache"), 10_000)
+    cache.put("a", spool(tmp_path, "a.ndjson", 100), {"meta": {"fps": 30}, "extraction": {"frameCount": 1}})
+
+    target = tmp_path / "out.ndjson"
+    record = cache.get("a", str(target))
+    assert record == {"meta": {"fps": 30}, "extraction": {"frameCount": 1}}
+    assert target.read_text() == "x" * 100
+    assert cache.get("b", str(target)) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_evicta_o_menos_usado_recentemente(tmp_path):
+    cache = server.ResultCache(str(tmp_path / "cache"), 2_500)
+    for key in ("a", "b"):
+        cache.put(key, spool(tmp_path, f"{key}.ndjson", 1_000), {})
+    cache.get("a", str(tmp_path / "out"))
+    cache.put("c", spool(tmp_path, "c.ndjson", 1_000), {})
+
+    assert cache.get("b", str(tmp_path / "out")) is None
+    assert cache.get("a", str(tmp_path / "out")) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sobrevive_a_reinicio_do_processo(tmp_path):
+    root = str(tmp_path / "cache")
+    server.ResultCache(root, 10_000).put("a", spool(tmp_path, "a.ndjson", 10), {"ok": True})
+    assert server.ResultCache(root, 10_000).get("a", str(tmp_path / "out")) == {"ok": True}
+
+
+def test_chave_muda_com_a_configuracao():
+    settings = server.extraction_settings()
+    assert server.cache_key("sha256:v", settings) != server.cache_key(
+        "sha256:v", {**settings, "maxLongEdge": 640},
+    )
@@ -0,0 +1,91 @@
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+
+import server
+from conftest import GrayPose
+
+LONG = {"fps": 60.0, "durationMs": 120_000, "width": 1280, "height": 720}
+CLIP = {"fps": 60.0, "durationMs": 4000, "width": 64, "height": 48}
+
+
+@pytest.fixture
+def video(tmp_path):
+    """4 s a 60 fps, keyframe a cada 30 quadros, cada quadro com um cinza
+    diferente."""
+    path = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 60.0, (64, 48))
+    for index in range(240):
+        writer.write(np.full((48, 64, 3), index, np.uint8))
+    writer.release()
+    return path
+
+
+def test_partes_emendam_sem_buraco_nem_sobreposicao():
+    keyframes = list(range(0, 7200, 120))
+    segments = server.plan_segments(LONG, None, keyframes, 4)
+    step = server.decimation_step(LONG["fps"])
+
+    assert len(segments) == 4
+    assert segments[0]["skip"] == segments[0]["keepFrom"] == 0
+    for previous, segment in zip(segments, segments[1:]):
+        assert previous["end"] == segment["keepFrom"]
+        assert segment["skip"] in keyframes
+        assert segment["keepFrom"] - segment["skip"] == server.SEGMENT_WARMUP_FRAMES * step
+    assert segments[-1]["end"] == server.MAX_FRAMES * step
+
+
+def test_video_curto_nao_divide():
+    assert server.plan_segments({**LONG, "durationMs": 30_000}, None, [], 4) == []
+    assert server.plan_segments(LONG, None, [], 1) == []
+
+
+def test_partes_contam_do_inicio_do_trecho():
+    time_range = {"startMs": 10_000, "endMs": 70_000}
+    segments = server.plan_segments(LONG, time_range, list(range(0, 7200, 120)), 2)
+    # Ideal: começar a aquecer no 1770 do trecho. O keyframe mais próximo é o
+    # 2400 da fonte, 1800 do trecho.
+    assert segments[1]["skip"] == 1800
+    assert [segment["keepFrom"] for segment in segments] == [0, 1830]
+    assert segments[-1]["end"] == 3600
+
+
+@pytest.mark.parametrize("decoder", ["opencv", "ffmpeg"])
+def test_emenda_igual_a_extracao_corrida(tmp_path, video, monkeypatch, decoder):
+    if decoder == "ffmpeg" and shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg ausente")
+    monkeypatch.setattr(server, "DECODER", decoder)
+    monkeypatch.setattr(server, "acquire_pose", lambda complexity=server.MODEL_COMPLEXITY: GrayPose())
+    monkeypatch.setattr(server, "SEGMENT_MIN_SECONDS", 1.0)
+    monkeypatch.setattr(server, "SEGMENT_WARMUP_FRAMES", 5)
+
+    full = tmp_path / "full.ndjson"
+    whole = server.extract_landmarks(str(video), CLIP, str(full))
+
+    segments = server.plan_segments(CLIP, None, list(range(0, 240, 30)), 3)
+    assert len(segments) == 3
+    results, stitched = [], ""
+    for n, segment in enumerate(segments):
+        part = tmp_path / f"part{n}.ndjson"
+        results.append(server.extract_landmarks(str(video), CLIP, str(part), None, None, None, None, segment))
+        stitched += part.read_text()
+
+    assert stitched == full.read_text()
+    merged = server.merge_segments(results)
+    assert merged["frameCount"] == whole["frameCount"] == 120
+    assert merged["usableFrames"] == whole["usableFrames"]
+    assert [child["warmupFrames"] for child in merged["span"]["children"]] == [0, 5, 5]
+
+
+def test_progresso_soma_as_partes():
+    progress = server.new_progress()
+    progress.report(3)
+    first, second = progress.part(), progress.part()
+    first.report(10)
+    second.report(7)
+    assert progress.total == 20
+    progress.cancel.set()
+    with pytest.raises(server.JobCancelled):
+        second.report(8)
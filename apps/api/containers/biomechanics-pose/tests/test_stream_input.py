@@ -0,0 +1,37 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def stalled_url():
+    """Servidor que aceita a conexão e nunca responde — o R2 travado."""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(4)
+    accepted = []
+
+    def accept():
+        try:
+            while True:
+                accepted.append(listener.accept()[0])
+        except OSError:
+            pass
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield f"http://127.0.0.1:{listener.getsockname()[1]}/clip.mp4"
+    listener.close()
+    for conn in accepted:
+        conn.close()
+
+
+def test_opencv_desiste_de_url_parada_no_prazo(stalled_url, monkeypatch):
+    monkeypatch.setattr(server, "STREAM_TIMEOUT_SECONDS", 1)
+    started = time.monotonic()
+    with pytest.raises(RuntimeError):
+        server.OpenCvSource(stalled_url, {"fps": 30.0, "durationMs": 1000})
+    assert time.monotonic() - started < 10
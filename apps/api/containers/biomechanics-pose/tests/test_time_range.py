@@ -0,0 +1,35 @@
+import server
+
+META = {"fps": 60.0, "durationMs": 20_000, "width": 1280, "height": 720}
+
+
+def test_trecho_em_quadros_da_fonte():
+    assert server.range_frames({"startMs": 5000, "endMs": 8000}, 60.0) == (300, 180)
+    assert server.range_frames({"startMs": 5000, "endMs": None}, 60.0) == (300, None)
+
+
+def test_duracao_do_trecho_respeita_o_fim_do_video():
+    assert server.clip_duration_ms(META, None) == 20_000
+    assert server.clip_duration_ms(META, {"startMs": 5000, "endMs": 8000}) == 3000
+    assert server.clip_duration_ms(META, {"startMs": 18_000, "endMs": 60_000}) == 2000
+    assert server.clip_duration_ms(META, {"startMs": 5000, "endMs": None}) == 15_000
+
+
+def test_estimativa_proporcional_ao_trecho():
+    assert server.estimate_frames(META) == 600
+    assert server.estimate_frames(META, {"startMs": 5000, "endMs": 8000}) == 90
+
+
+def test_cabecalho_registra_o_deslocamento():
+    extraction = {
+        "fps": 30.0, "frameCount": 90, "truncated": False,
+        "timeRange": {"startMs": 5000, "endMs": 8000},
+    }
+    header = server.bundle_header(META, extraction, {"view": "frontal", "attempt": 1})
+    assert header["durationMs"] == 3000
+    assert header["sourceRange"] == {"startMs": 5000, "endMs": 8000}
+
+
+def test_payload_sem_trecho_e_o_video_inteiro():
+    assert server.requested_range({}) is None
+    assert server.requested_range({"endMs": 4000}) == {"startMs": 0, "endMs": 4000}
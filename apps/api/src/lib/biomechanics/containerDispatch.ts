@@ -15,6 +15,15 @@ import type { Env } from "../../types/env";
 
 /** Janela do token de callback. Uma extração longa cabe folgada aqui. */
 const CALLBACK_TTL_SECONDS = 3600;
+/**
+ * Validade da URL de leitura do vídeo. Com `POSE_INPUT=stream` o container lê
+ * dela até o último quadro, e cada reconexão refaz a requisição — uma URL que
+ * vence no meio vira 403 e o job falha. A duração máxima útil de um job é a do
+ * token de callback (depois dela o desfecho não seria aceito), então a URL vale
+ * o mesmo — que é também o teto do `R2Service` para vídeo clínico. No modo
+ * download ela só é usada no começo e a folga não custa nada.
+ */
+const VIDEO_URL_TTL_SECONDS = CALLBACK_TTL_SECONDS;
 
 export interface ContainerDispatchInput {
   jobId: string;
@@ -29,6 +38,31 @@ export interface ContainerDispatchInput {
   protocolSlug?: string | null;
   capturedAt?: string | null;
   apiBaseUrl: string;
+  /**
+   * Formato do objeto de resultado. "columnar" é o mesmo `ff-pose-33-v1` em
+   * binário; `decodePoseBundle` reconhece os dois pelo magic number.
+   */
+  bundleFormat?: "ndjson" | "columnar";
+  /**
+   * Codificações aceitas para o objeto, em ordem de preferência. Hoje o
+   * container só emite "gzip", que `decodePoseBundle` abre pelo magic number.
+   */
+  acceptEncoding?: string[];
+  /**
+   * Força a variante do MediaPipe (0 lite, 1 full, 2 heavy) e o maior lado da
+   * entrada; sem eles vale a política do container. A variante usada volta em
+   * `poseEngine.modelVariant`, e o maior lado dos quadros, quando reduzidos,
+   * em `poseEngine.inputLongEdge` — sessões com variantes ou resoluções
+   * diferentes não se comparam pela mesma DMD.
+   */
+  modelComplexity?: 0 | 1 | 2;
+  maxLongEdge?: number;
+  /**
+   * Restringe a extração a um trecho do vídeo, em ms. O bundle registra o
+   * deslocamento em `sourceRange`.
+   */
+  startMs?: number;
+  endMs?: number;
 }
 
 export async function signCallbackToken(
@@ -77,6 +111,42 @@ export async function verifyCallbackToken(
   return diff === 0;
 }
 
+/**
+ * Corpo de um job para o container: URLs assinadas de leitura e escrita e o
+ * token de callback do próprio job.
+ */
+async function containerJobBody(
+  env: Env,
+  secret: string,
+  input: ContainerDispatchInput,
+): Promise<Record<string, unknown>> {
+  const r2 = new R2Service(env);
+  const videoUrl = await r2.getDownloadUrl(input.videoKey, VIDEO_URL_TTL_SECONDS);
+  const resultPutUrl = await r2.getUploadUrl(input.resultKey, "application/x-ndjson");
+
+  const expiresAt = Math.floor(Date.now() / 1000) + CALLBACK_TTL_SECONDS;
+  const callbackToken = await signCallbackToken(secret, input.jobId, input.assessmentId, expiresAt);
+
+  return {
+    jobId: input.jobId,
+    assessmentId: input.assessmentId,
+    videoUrl,
+    resultPutUrl,
+    resultKey: input.resultKey,
+    view: input.view,
+    attempt: input.attempt,
+    protocolSlug: input.protocolSlug ?? undefined,
+    capturedAt: input.capturedAt ?? undefined,
+    bundleFormat: input.bundleFormat,
+    acceptEncoding: input.acceptEncoding,
+    modelComplexity: input.modelComplexity,
+    maxLongEdge: input.maxLongEdge,
+    startMs: input.startMs,
+    endMs: input.endMs,
+    callbackToken,
+  };
+}
+
 /**
  * Entrega o trabalho ao container. Ele responde 202 na hora e avisa por
  * callback quando termina — a extração leva de dezenas de segundos a minutos,
@@ -95,17 +165,7 @@ export async function dispatchToPoseContainer(
     return { dispatched: false, reason: "callback_secret_missing" };
   }
 
-  const r2 = new R2Service(env);
-  const videoUrl = await r2.getDownloadUrl(input.videoKey, 900);
-  const resultPutUrl = await r2.getUploadUrl(input.resultKey, "application/x-ndjson");
-
-  const expiresAt = Math.floor(Date.now() / 1000) + CALLBACK_TTL_SECONDS;
-  const callbackToken = await signCallbackToken(
-    env.BIOMECHANICS_CALLBACK_SECRET,
-    input.jobId,
-    input.assessmentId,
-    expiresAt,
-  );
+  const body = await containerJobBody(env, env.BIOMECHANICS_CALLBACK_SECRET, input);
 
   // Uma instância por job: o próprio id deduplica, então dois pedidos para o
   // mesmo job não viram duas extrações.
@@ -116,17 +176,8 @@ export async function dispatchToPoseContainer(
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({
-      jobId: input.jobId,
-      assessmentId: input.assessmentId,
-      videoUrl,
-      resultPutUrl,
-      resultKey: input.resultKey,
-      view: input.view,
-      attempt: input.attempt,
-      protocolSlug: input.protocolSlug ?? undefined,
-      capturedAt: input.capturedAt ?? undefined,
+      ...body,
       callbackUrl: `${input.apiBaseUrl}/api/biomechanics/internal/jobs/${input.jobId}/pose-callback`,
-      callbackToken,
     }),
   });
 
@@ -137,3 +188,39 @@ export async function dispatchToPoseContainer(
 
   return { dispatched: true };
 }
+
+/**
+ * Pede ao container que pare um job — uma captura substituída, por exemplo.
+ * O cancelamento é cooperativo: a extração para no próximo lote de quadros e
+ * o callback chega como "cancelled", registrado como falha do job.
+ *
+ * Só fala com o container se ele estiver de pé. Qualquer `fetch` numa
+ * instância dormindo a acorda — um `standard-4` subindo do zero só para
+ * responder 404, o contrário de liberar capacidade. `getState()` lê o estado
+ * guardado no Durable Object e não inicia o container.
+ */
+export async function cancelPoseContainerJob(
+  env: Env,
+  jobId: string,
+): Promise<{ cancelled: boolean; reason?: string }> {
+  if (!env.BIOMECHANICS_POSE) {
+    return { cancelled: false, reason: "container_binding_missing" };
+  }
+
+  const id = env.BIOMECHANICS_POSE.idFromName(`bio-pose-${jobId}`);
+  const stub = env.BIOMECHANICS_POSE.get(id);
+  const { status } = await stub.getState();
+  if (status !== "running" && status !== "healthy") {
+    // Parado ou parando: não há extração em curso para interromper.
+    return { cancelled: false, reason: `container_${status}` };
+  }
+
+  const response = await stub.fetch(`http://container/jobs/${encodeURIComponent(jobId)}`, { method: "DELETE" });
+
+  // 404: o container não conhece o job (reiniciou ou nunca recebeu); 409: já
+  // terminou. Nos dois casos não há CPU a liberar.
+  if (response.status !== 202) {
+    return { cancelled: false, reason: `container_status_${response.status}` };
+  }
+  return { cancelled: true };
+}
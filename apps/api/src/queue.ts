@@ -13,6 +13,7 @@ import { sendAutomationTemplate } from "./lib/whatsappAutomations";
 import type { AutomationTemplateKey } from "./lib/whatsappAutomationTemplates";
 import { reindexKbItem, type ReindexKbItemPayload } from "./lib/kbReindex";
 import { backoffDelay } from "./lib/queueBackoff";
+import { dispatchToPoseContainer, type ContainerDispatchInput } from "./lib/biomechanics/containerDispatch";
 import { resolveOrCreateContact } from "./lib/whatsapp-identity";
 import { findOrCreateConversation, addMessage } from "./lib/whatsapp-conversations";
 import { broadcastToOrg } from "./lib/realtime";
@@ -117,6 +118,7 @@ export type QueueTask =
   | { type: "R2_OBJECT_CREATED"; payload: R2NotificationPayload }
   | { type: "PROCESS_EXAM"; payload: ExamProcessPayload }
   | { type: "PROCESS_BIOMECHANICS_MEDIA"; payload: BiomechanicsProcessPayload }
+  | { type: "DISPATCH_POSE_CONTAINER"; payload: ContainerDispatchInput }
   | { type: "GENERATE_TTS"; payload: TTSPayload }
   | { type: "TRIGGER_WORKFLOW"; payload: WorkflowTriggerPayload }
   | { type: "GENERATE_NFSE"; payload: GenerateNFSePayload }
@@ -225,6 +227,10 @@ export async function handleQueue(batch: MessageBatch<QueueTask>, env: Env): Pro
           await processBiomechanicsMedia(task.payload, env);
           break;
 
+        case "DISPATCH_POSE_CONTAINER":
+          await redispatchPoseContainer(task.payload, env);
+          break;
+
         case "GENERATE_TTS":
           await generateTTS(task.payload, env);
           break;
@@ -577,6 +583,20 @@ async function processExamUpload(payload: ExamProcessPayload, env: Env): Promise
 
 // ===== BIOMECHANICS MEDIA PROCESSING =====
 
+/**
+ * Reentrega ao container um job que ele devolveu como `retryable` — a
+ * instância foi encerrada (deploy, escala) antes do fim da extração. O job
+ * continua `queued`; uma recusa aqui (a instância ainda drenando responde 503)
+ * vira retry da mensagem com backoff, sem marcar o job como falho. Esgotados
+ * os retries, a mensagem vai para a DLQ com o job ainda `queued`.
+ */
+async function redispatchPoseContainer(input: ContainerDispatchInput, env: Env): Promise<void> {
+  const dispatch = await dispatchToPoseContainer(env, input);
+  if (!dispatch.dispatched) {
+    throw new Error(`Reenvio do job ${input.jobId} recusado: ${dispatch.reason}`);
+  }
+}
+
 /**
  * Processa uma captura biomecânica a partir dos landmarks REAIS enviados pelo
  * aparelho (ou, na fase 2, extraídos do vídeo por um Container).
@@ -40,7 +40,12 @@ function chainableSelect() {
   return chain;
 }
 
+// Consultas SQL cruas (callback do container), também em ordem.
+const queryMock = vi.fn();
+
 vi.mock("../../lib/db", () => ({
+  createPool: vi.fn(async () => ({ query: queryMock })),
+  createPoolForOrg: vi.fn(async () => ({ query: queryMock })),
   createDb: vi.fn(async () => ({
     select: () => chainableSelect(),
     insert: () => ({
@@ -150,6 +155,7 @@ beforeEach(() => {
   updated = [];
   headMock.mockReset();
   sendMock.mockReset();
+  queryMock.mockReset();
 });
 
 // ── POST /:id/pdf — o buraco original ───────────────────────────────────────
@@ -475,3 +481,158 @@ describe("POST /:id/sign", () => {
     expect(((await res.json()) as any).code).toBe("unvalidated_metrics");
   });
 });
+
+// ── callback do container — interrupção não é falha ─────────────────────────
+
+const CAPTURED_AT = new Date("2026-03-02T13:00:00Z");
+
+describe("POST /internal/jobs/:jobId/pose-callback", () => {
+  const SECRET = "segredo-de-teste";
+  const JOB = {
+    id: "job-001",
+    assessment_id: "assess-001",
+    organization_id: mockOrgId,
+    patient_id: "patient-001",
+    media_id: "media-001",
+  };
+
+  async function callback(body: unknown) {
+    const { signCallbackToken } = await import("../../lib/biomechanics/containerDispatch");
+    const token = await signCallbackToken(SECRET, JOB.id, JOB.assessment_id, Math.floor(Date.now() / 1000) + 600);
+    const app = await buildApp();
+    return app.fetch(
+      new Request(`http://localhost/api/biomechanics/internal/jobs/${JOB.id}/pose-callback`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json", "X-Pose-Callback-Token": token },
+        body: JSON.stringify(body),
+      }),
+      { ...ENV(), BIOMECHANICS_CALLBACK_SECRET: SECRET },
+    );
+  }
+
+  it("job interrompido pelo encerramento do container volta para a fila com atraso", async () => {
+    queryMock
+      .mockResolvedValueOnce({ rows: [JOB] })
+      .mockResolvedValueOnce({
+        rows: [{ r2_key: "orgs/x/video.mp4", view: "frontal", attempt: 2, created_at: CAPTURED_AT }],
+      })
+      .mockResolvedValueOnce({ rows: [{ id: JOB.id }] });
+
+    const res = await callback({ status: "cancelled", retryable: true, error: "Container encerrando" });
+    expect(res.status).toBe(200);
+    expect(((await res.json()) as any).recorded).toBe("requeued");
+
+    const [sql] = queryMock.mock.calls[2];
+    expect(sql).toContain("status = 'queued'");
+    expect(sql).not.toContain("'failed', stage");
+
+    expect(sendMock).toHaveBeenCalledTimes(1);
+    const [task, options] = sendMock.mock.calls[0];
+    expect(task.type).toBe("DISPATCH_POSE_CONTAINER");
+    // O mesmo corpo de um despacho normal: o bundle reenviado não pode sair
+    // com cabeçalho diferente.
+    expect(task.payload).toEqual({
+      jobId: JOB.id,
+      assessmentId: JOB.assessment_id,
+      organizationId: mockOrgId,
+      patientId: JOB.patient_id,
+      mediaId: JOB.media_id,
+      videoKey: "orgs/x/video.mp4",
+      resultKey: expect.stringMatching(/media-001-a2-container-v1\.ndjson$/),
+      view: "frontal",
+      attempt: 2,
+      capturedAt: CAPTURED_AT.toISOString(),
+      apiBaseUrl: "http://localhost",
+    });
+    expect(options.delaySeconds).toBeGreaterThan(0);
+  });
+
+  it("cancelamento sem retryable continua registrado como falha", async () => {
+    queryMock.mockResolvedValueOnce({ rows: [JOB] }).mockResolvedValueOnce({ rows: [{ id: JOB.id }] });
+
+    const res = await callback({ status: "cancelled", error: "Cancelado a pedido." });
+    expect(((await res.json()) as any).recorded).toBe("failed");
+    expect(queryMock.mock.calls[1][0]).toContain("status = 'failed'");
+    expect(sendMock).not.toHaveBeenCalled();
+  });
+
+  it("reenvio do callback de sucesso não enfileira o cálculo de novo", async () => {
+    const SUCCEEDED = { status: "succeeded", key: "orgs/x/a-container-v1.ndjson", sha256: "ab", frameCount: 90 };
+    queryMock
+      .mockResolvedValueOnce({ rows: [JOB] })
+      .mockResolvedValueOnce({ rows: [] })
+      .mockResolvedValueOnce({ rows: [{ id: JOB.id }] })
+      // Reenvio: o job já saiu de container_dispatch.
+      .mockResolvedValueOnce({ rows: [JOB] })
+      .mockResolvedValueOnce({ rows: [] })
+      .mockResolvedValueOnce({ rows: [] });
+
+    const first = await callback(SUCCEEDED);
+    expect(((await first.json()) as any).queued).toBe(true);
+    const again = await callback(SUCCEEDED);
+    expect(again.status).toBe(200);
+    expect(((await again.json()) as any).recorded).toBe("duplicate");
+
+    expect(sendMock).toHaveBeenCalledTimes(1);
+    expect(queryMock.mock.calls[2][0]).toContain("stage = 'container_dispatch'");
+  });
+});
+
+// ── POST /:id/reprocess — a extração anterior da captura é cancelada ─────────
+
+describe("POST /:id/reprocess", () => {
+  it("cancela no container o job pendente da mesma captura e registra a substituição", async () => {
+    const fetchMock = vi.fn(async (_url: string, _init?: RequestInit) => new Response("{}", { status: 202 }));
+    selectQueue = [
+      [ASSESSMENT],
+      [{ ...MEDIA_SEM_LANDMARKS, r2Key: "orgs/x/video.mp4", patientId: "patient-001", createdAt: CAPTURED_AT }],
+      [{ id: "job-antigo", stage: "container_dispatch", status: "queued" }],
+    ];
+    const app = await buildApp();
+    const res = await app.fetch(req("POST", "/api/biomechanics/assess-001/reprocess", {}), {
+      ...ENV(),
+      BIOMECHANICS_CALLBACK_SECRET: "segredo-de-teste",
+      BIOMECHANICS_POSE: {
+        idFromName: (name: string) => name,
+        get: () => ({ fetch: fetchMock, getState: async () => ({ status: "healthy" }) }),
+      },
+    });
+
+    expect(res.status).toBe(200);
+    const [cancelUrl, cancelInit] = fetchMock.mock.calls[0];
+    expect(cancelUrl).toBe("http://container/jobs/job-antigo");
+    expect(cancelInit?.method).toBe("DELETE");
+    expect(fetchMock.mock.calls[1][0]).toBe("http://container/analyze");
+    // Mesmo `capturedAt` que o reenvio depois de uma interrupção usa.
+    expect(JSON.parse(String(fetchMock.mock.calls[1][1]?.body)).capturedAt).toBe(CAPTURED_AT.toISOString());
+
+    expect(updated[0]).toMatchObject({ status: "failed", errorCode: "superseded" });
+    expect(inserted[0]).toMatchObject({ supersedesJobId: "job-antigo", stage: "container_dispatch" });
+  });
+
+  it("não acorda o container dormindo só para cancelar", async () => {
+    const fetchMock = vi.fn(async (_url: string, _init?: RequestInit) => new Response("{}", { status: 202 }));
+    selectQueue = [
+      [ASSESSMENT],
+      [{ ...MEDIA_SEM_LANDMARKS, r2Key: "orgs/x/video.mp4", patientId: "patient-001", createdAt: CAPTURED_AT }],
+      [{ id: "job-antigo", stage: "container_dispatch", status: "queued" }],
+    ];
+    const app = await buildApp();
+    const res = await app.fetch(req("POST", "/api/biomechanics/assess-001/reprocess", {}), {
+      ...ENV(),
+      BIOMECHANICS_CALLBACK_SECRET: "segredo-de-teste",
+      BIOMECHANICS_POSE: {
+        idFromName: (name: string) => name,
+        get: () => ({ fetch: fetchMock, getState: async () => ({ status: "stopped" }) }),
+      },
+    });
+
+    expect(res.status).toBe(200);
+    // Nenhum DELETE: o único fetch é o despacho do job novo.
+    expect(fetchMock).toHaveBeenCalledTimes(1);
+    expect(fetchMock.mock.calls[0][0]).toBe("http://container/analyze");
+    // A substituição vale mesmo sem falar com o container antigo.
+    expect(updated[0]).toMatchObject({ status: "failed", errorCode: "superseded" });
+    expect(inserted[0]).toMatchObject({ supersedesJobId: "job-antigo", stage: "container_dispatch" });
+  });
+});
@@ -2,7 +2,12 @@ import { Hono } from "hono";
 import { asc, eq, and, desc, or, isNull } from "drizzle-orm";
 import { requireAuth, type AuthVariables } from "../lib/auth";
 import { createDb, createPool, createPoolForOrg } from "../lib/db";
-import { dispatchToPoseContainer, verifyCallbackToken } from "../lib/biomechanics/containerDispatch";
+import {
+  cancelPoseContainerJob,
+  dispatchToPoseContainer,
+  verifyCallbackToken,
+  type ContainerDispatchInput,
+} from "../lib/biomechanics/containerDispatch";
 import { R2Service } from "../lib/storage/R2Service";
 import {
   biomechanicsAnnotations,
@@ -1893,6 +1898,57 @@ function r2BiomechanicsLandmarksKey(params: {
   return `orgs/${params.organizationId}/patients/${params.patientId}/videos/biomechanics/${params.assessmentId}/landmarks/${params.mediaId}-a${params.attempt}-v1.ndjson`;
 }
 
+/**
+ * Onde o container grava o bundle reextraído de uma tentativa. Determinística:
+ * reenviar o mesmo job (ou reprocessar a captura) escreve no mesmo objeto.
+ */
+function containerResultKey(params: Parameters<typeof r2BiomechanicsLandmarksKey>[0]) {
+  return r2BiomechanicsLandmarksKey(params).replace("-v1.ndjson", "-container-v1.ndjson");
+}
+
+/**
+ * Corpo do despacho de um job ao container, montado só a partir do que está
+ * no banco. Todo despacho passa por aqui — o reprocessamento, o automático e o
+ * reenvio depois de uma interrupção —, então o mesmo job gera sempre o mesmo
+ * cabeçalho de bundle, seja qual for o caminho.
+ *
+ * `capturedAt` é o registro do vídeo, não o da avaliação: numa retificação a
+ * avaliação é nova, mas a captura é a mesma.
+ */
+function containerDispatchInput(params: {
+  jobId: string;
+  assessmentId: string;
+  organizationId: string;
+  patientId: string;
+  mediaId: string;
+  videoKey: string;
+  view: string | null;
+  attempt: number | null;
+  mediaCreatedAt: Date | string | null;
+  apiBaseUrl: string;
+}): ContainerDispatchInput {
+  const attempt = params.attempt ?? 1;
+  return {
+    jobId: params.jobId,
+    assessmentId: params.assessmentId,
+    organizationId: params.organizationId,
+    patientId: params.patientId,
+    mediaId: params.mediaId,
+    videoKey: params.videoKey,
+    resultKey: containerResultKey({
+      organizationId: params.organizationId,
+      patientId: params.patientId,
+      assessmentId: params.assessmentId,
+      mediaId: params.mediaId,
+      attempt,
+    }),
+    view: params.view ?? "sagittal",
+    attempt,
+    capturedAt: params.mediaCreatedAt ? new Date(params.mediaCreatedAt).toISOString() : null,
+    apiBaseUrl: params.apiBaseUrl,
+  };
+}
+
 /** 3 min a 30 fps. Acima disso é erro de cliente, não captura clínica. */
 const MAX_LANDMARK_FRAMES = 5400;
 /** Teto do corpo do atalho inline. */
@@ -2144,48 +2200,109 @@ function buildPoseEngineLabel(header: Record<string, unknown>): string | null {
 // Rota interna, FORA do escopo de organização: quem chama é o container, que
 // não tem sessão. A autenticação é o token HMAC emitido no despacho, com
 // validade — o container é tratado como não confiável.
-app.post("/internal/jobs/:jobId/pose-callback", async (c) => {
-  const jobId = c.req.param("jobId");
-  const token = c.req.header("X-Pose-Callback-Token") ?? "";
-  const secret = c.env.BIOMECHANICS_CALLBACK_SECRET;
 
-  if (!secret) return c.json({ error: "callback não configurado" }, 503);
+type PoseCallbackBody = {
+  status?: string;
+  key?: string;
+  sha256?: string;
+  frameCount?: number;
+  fps?: number;
+  engine?: string;
+  bytes?: number;
+  error?: string;
+  /** O container foi encerrado no meio do job; reenviar resolve. */
+  retryable?: boolean;
+};
 
-  const body = (await c.req.json().catch(() => ({}))) as {
-    status?: string;
-    key?: string;
-    sha256?: string;
-    frameCount?: number;
-    fps?: number;
-    engine?: string;
-    bytes?: number;
-    error?: string;
-  };
+/** Espera antes de reenviar um job interrompido: dá tempo à instância de sair. */
+const POSE_REDISPATCH_DELAY_SECONDS = 30;
 
+/**
+ * Registra o desfecho de um job do container. Idempotente: o outbox do
+ * container reenvia o callback até receber 200, então só o primeiro desfecho
+ * de um job em `container_dispatch` conta — um reenvio não grava de novo nem
+ * enfileira o cálculo duas vezes.
+ */
+async function recordPoseCallback(
+  env: Env,
+  secret: string,
+  jobId: string,
+  token: string,
+  body: PoseCallbackBody,
+  apiBaseUrl: string,
+): Promise<{ status: 200 | 401 | 404; body: Record<string, unknown> }> {
   // O job é lido sem contexto de organização porque é ele que informa a org.
-  const pool = await createPool(c.env);
+  const pool = await createPool(env);
   const jobResult = await pool.query(
     `SELECT id, assessment_id, organization_id, patient_id, media_id
        FROM biomechanics_jobs WHERE id = $1`,
     [jobId],
   );
   const job = jobResult.rows[0];
-  if (!job) return c.json({ error: "job não encontrado" }, 404);
+  if (!job) return { status: 404, body: { error: "job não encontrado" } };
 
   const valid = await verifyCallbackToken(secret, token, jobId, job.assessment_id, Date.now());
-  if (!valid) return c.json({ error: "token inválido ou expirado" }, 401);
+  if (!valid) return { status: 401, body: { error: "token inválido ou expirado" } };
 
-  const orgPool = await createPoolForOrg(c.env, job.organization_id);
+  const orgPool = await createPoolForOrg(env, job.organization_id);
+
+  // Interrupção não é falha da extração: o job volta para a fila e é
+  // reenviado com atraso — na hora, cairia na mesma instância ainda drenando.
+  if (body.status === "cancelled" && body.retryable === true) {
+    const mediaResult = await orgPool.query(
+      `SELECT r2_key, view, attempt, created_at FROM biomechanics_media
+        WHERE id = $1 AND organization_id = $2`,
+      [job.media_id, job.organization_id],
+    );
+    const media = mediaResult.rows[0];
+    if (media?.r2_key) {
+      const requeued = await orgPool.query(
+        `UPDATE biomechanics_jobs
+            SET status = 'queued', stage = 'container_dispatch', progress = 0,
+                error_code = 'container_interrupted', error_message = $1, updated_at = NOW()
+          WHERE id = $2 AND organization_id = $3 AND stage = 'container_dispatch'
+            AND status NOT IN ('succeeded', 'failed')
+          RETURNING id`,
+        [String(body.error ?? "Container encerrado antes do fim do job.").slice(0, 500), jobId, job.organization_id],
+      );
+      if (requeued.rows.length === 0) {
+        return { status: 200, body: { ok: true, recorded: "duplicate" } };
+      }
+
+      await env.BACKGROUND_QUEUE.send(
+        {
+          type: "DISPATCH_POSE_CONTAINER",
+          payload: containerDispatchInput({
+            jobId,
+            assessmentId: job.assessment_id,
+            organizationId: job.organization_id,
+            patientId: job.patient_id,
+            mediaId: job.media_id,
+            videoKey: media.r2_key,
+            view: media.view,
+            attempt: media.attempt,
+            mediaCreatedAt: media.created_at,
+            apiBaseUrl,
+          }),
+        },
+        { delaySeconds: POSE_REDISPATCH_DELAY_SECONDS },
+      );
+      return { status: 200, body: { ok: true, recorded: "requeued" } };
+    }
+  }
 
   if (body.status !== "succeeded" || !body.key || !body.sha256) {
-    await orgPool.query(
+    const failed = await orgPool.query(
       `UPDATE biomechanics_jobs
           SET status = 'failed', stage = 'failed', error_code = 'container_extraction_failed',
               error_message = $1, completed_at = NOW(), updated_at = NOW()
-        WHERE id = $2 AND organization_id = $3`,
+        WHERE id = $2 AND organization_id = $3 AND stage = 'container_dispatch'
+          AND status NOT IN ('succeeded', 'failed')
+        RETURNING id`,
       [String(body.error ?? "Falha na extração de pose.").slice(0, 500), jobId, job.organization_id],
     );
-    return c.json({ ok: true, recorded: "failed" });
+    if (failed.rows.length === 0) return { status: 200, body: { ok: true, recorded: "duplicate" } };
+    return { status: 200, body: { ok: true, recorded: "failed" } };
   }
 
   await orgPool.query(
@@ -2205,21 +2322,60 @@ app.post("/internal/jobs/:jobId/pose-callback", async (c) => {
     ],
   );
 
+  // O job sai de `container_dispatch` antes de enfileirar: é essa transição
+  // que um reenvio do mesmo callback não consegue repetir. A gravação acima
+  // pode se repetir sem dano — são os mesmos valores.
+  const claimed = await orgPool.query(
+    `UPDATE biomechanics_jobs
+        SET stage = 'container_done', updated_at = NOW()
+      WHERE id = $1 AND organization_id = $2 AND stage = 'container_dispatch'
+        AND status NOT IN ('succeeded', 'failed')
+      RETURNING id`,
+    [jobId, job.organization_id],
+  );
+  if (claimed.rows.length === 0) return { status: 200, body: { ok: true, recorded: "duplicate" } };
+
   // O cálculo das métricas é do Worker, sempre: o container só extrai pose.
   // Uma implementação de matemática clínica, uma suíte de testes.
-  await c.env.BACKGROUND_QUEUE.send({
-    type: "PROCESS_BIOMECHANICS_MEDIA",
-    payload: {
-      jobId,
-      assessmentId: job.assessment_id,
-      mediaId: job.media_id,
-      organizationId: job.organization_id,
-      patientId: job.patient_id,
-      phase: "container",
-    },
-  });
+  try {
+    await env.BACKGROUND_QUEUE.send({
+      type: "PROCESS_BIOMECHANICS_MEDIA",
+      payload: {
+        jobId,
+        assessmentId: job.assessment_id,
+        mediaId: job.media_id,
+        organizationId: job.organization_id,
+        patientId: job.patient_id,
+        phase: "container",
+      },
+    });
+  } catch (error) {
+    // Devolve o job ao estado anterior para o reenvio do callback enfileirar.
+    await orgPool.query(
+      `UPDATE biomechanics_jobs SET stage = 'container_dispatch', updated_at = NOW()
+        WHERE id = $1 AND organization_id = $2`,
+      [jobId, job.organization_id],
+    );
+    throw error;
+  }
 
-  return c.json({ ok: true, queued: true });
+  return { status: 200, body: { ok: true, queued: true } };
+}
+
+app.post("/internal/jobs/:jobId/pose-callback", async (c) => {
+  const secret = c.env.BIOMECHANICS_CALLBACK_SECRET;
+  if (!secret) return c.json({ error: "callback não configurado" }, 503);
+
+  const body = (await c.req.json().catch(() => ({}))) as PoseCallbackBody;
+  const result = await recordPoseCallback(
+    c.env,
+    secret,
+    c.req.param("jobId"),
+    c.req.header("X-Pose-Callback-Token") ?? "",
+    body,
+    new URL(c.req.url).origin,
+  );
+  return c.json(result.body, result.status);
 });
 
 // POST /api/biomechanics/:id/reprocess — reextração de pose em nuvem
@@ -2316,6 +2472,10 @@ app.post("/:id/reprocess", requireAuth, async (c) => {
     });
   }
 
+  // Uma extração ainda em curso da mesma captura perdeu o sentido: pará-la
+  // libera o container em vez de deixá-lo terminar um resultado descartado.
+  const supersededJobId = await supersedeContainerJobs(c.env, db, user.organizationId, media.id);
+
   const [job] = await db
     .insert(biomechanicsJobs)
     .values({
@@ -2327,32 +2487,27 @@ app.post("/:id/reprocess", requireAuth, async (c) => {
       stage: "container_dispatch",
       progress: 0,
       phase: "container",
+      supersedesJobId: supersededJobId,
       createdBy: user.uid,
       algorithmVersion: DEFAULT_ALGORITHM_VERSION,
     })
     .returning();
 
-  const resultKey = r2BiomechanicsLandmarksKey({
-    organizationId: user.organizationId,
-    patientId: assessment.patientId,
-    assessmentId: targetAssessmentId,
-    mediaId: media.id,
-    attempt: media.attempt ?? 1,
-  }).replace("-v1.ndjson", "-container-v1.ndjson");
-
-  const dispatch = await dispatchToPoseContainer(c.env, {
-    jobId: job.id,
-    assessmentId: targetAssessmentId,
-    organizationId: user.organizationId,
-    patientId: assessment.patientId,
-    mediaId: media.id,
-    videoKey: media.r2Key,
-    resultKey,
-    view: media.view ?? "sagittal",
-    attempt: media.attempt ?? 1,
-    capturedAt: assessment.createdAt?.toISOString?.() ?? null,
-    apiBaseUrl: new URL(c.req.url).origin,
-  });
+  const dispatch = await dispatchToPoseContainer(
+    c.env,
+    containerDispatchInput({
+      jobId: job.id,
+      assessmentId: targetAssessmentId,
+      organizationId: user.organizationId,
+      patientId: assessment.patientId,
+      mediaId: media.id,
+      videoKey: media.r2Key,
+      view: media.view,
+      attempt: media.attempt,
+      mediaCreatedAt: media.createdAt,
+      apiBaseUrl: new URL(c.req.url).origin,
+    }),
+  );
 
   if (!dispatch.dispatched) {
     await db
@@ -2383,6 +2538,57 @@ app.post("/:id/reprocess", requireAuth, async (c) => {
   });
 });
 
+/**
+ * Encerra os jobs de container da captura que ainda aguardam o callback e
+ * devolve o mais recente, para o job novo registrar quem substituiu.
+ *
+ * O job é marcado `superseded` antes do callback "cancelled" chegar, que então
+ * é descartado como repetido. Se o container não conhecer o job (reiniciou),
+ * a marcação vale do mesmo jeito: o callback dele, se vier, também é descartado.
+ */
+async function supersedeContainerJobs(
+  env: Env,
+  db: Awaited<ReturnType<typeof createDb>>,
+  organizationId: string,
+  mediaId: string,
+): Promise<string | null> {
+  const pending = await db
+    .select()
+    .from(biomechanicsJobs)
+    .where(
+      and(
+        eq(biomechanicsJobs.organizationId, organizationId),
+        eq(biomechanicsJobs.mediaId, mediaId),
+        eq(biomechanicsJobs.stage, "container_dispatch"),
+        eq(biomechanicsJobs.status, "queued"),
+      ),
+    )
+    .orderBy(desc(biomechanicsJobs.createdAt));
+
+  for (const previous of pending) {
+    await db
+      .update(biomechanicsJobs)
+      .set({
+        status: "failed",
+        stage: "failed",
+        errorCode: "superseded",
+        errorMessage: "Substituído por um reprocessamento mais recente.",
+        completedAt: new Date(),
+      })
+      .where(eq(biomechanicsJobs.id, previous.id));
+
+    const cancel = await cancelPoseContainerJob(env, previous.id).catch((error) => ({
+      cancelled: false,
+      reason: error instanceof Error ? error.message : String(error),
+    }));
+    if (!cancel.cancelled) {
+      console.warn(`[Biomechanics] job ${previous.id} não cancelado no container: ${cancel.reason}`);
+    }
+  }
+
+  return pending[0]?.id ?? null;
+}
+
 /**
  * Enfileira a reextração de pose em nuvem, que é a fonte de verdade das
  * métricas gravadas (ADR-001).
@@ -2422,26 +2628,21 @@ async function dispatchContainerReprocess(
       })
       .returning();
 
-    const resultKey = r2BiomechanicsLandmarksKey({
-      organizationId: input.organizationId,
-      patientId: input.assessment.patientId,
-      assessmentId: input.assessment.id,
-      mediaId: input.media.id,
-      attempt: input.media.attempt ?? 1,
-    }).replace("-v1.ndjson", "-container-v1.ndjson");
-
-    const dispatch = await dispatchToPoseContainer(c.env, {
-      jobId: job.id,
-      assessmentId: input.assessment.id,
-      organizationId: input.organizationId,
-      patientId: input.assessment.patientId,
-      mediaId: input.media.id,
-      videoKey: input.media.r2Key,
-      resultKey,
-      view: input.media.view ?? "sagittal",
-      attempt: input.media.attempt ?? 1,
-      apiBaseUrl: new URL(c.req.url).origin,
-    });
+    const dispatch = await dispatchToPoseContainer(
+      c.env,
+      containerDispatchInput({
+        jobId: job.id,
+        assessmentId: input.assessment.id,
+        organizationId: input.organizationId,
+        patientId: input.assessment.patientId,
+        mediaId: input.media.id,
+        videoKey: input.media.r2Key,
+        view: input.media.view,
+        attempt: input.media.attempt,
+        mediaCreatedAt: input.media.createdAt,
+        apiBaseUrl: new URL(c.req.url).origin,
+      }),
+    );
 
     if (!dispatch.dispatched) {
       await db
@@ -13,6 +13,7 @@ import type {
   AutomationExecutor,
 } from "../workflows";
 import type { EvolutionCollaborationSql } from "../agents/EvolutionCollaboration";
+import type { BiomechanicsPoseContainer } from "../containers/BiomechanicsPoseContainer";
 
 /**
  * Cloudflare Stream binding (GA 2026-05-07).
@@ -175,7 +176,7 @@ export interface Env {
   // Cloudflare R2 Config
   MEDIA_BUCKET: R2Bucket;
   /** Container de reextração de pose (fase 2 da biomecânica). */
-  BIOMECHANICS_POSE?: DurableObjectNamespace;
+  BIOMECHANICS_POSE?: DurableObjectNamespace<BiomechanicsPoseContainer>;
   /** Segredo do HMAC do callback do container. */
   BIOMECHANICS_CALLBACK_SECRET?: string;
   EXAMS_BUCKET?: R2Bucket; // fisioflow-exams: exames, fotos, vídeos clínicos (privado)
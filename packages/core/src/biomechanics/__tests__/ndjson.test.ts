@@ -0,0 +1,103 @@
+import { describe, it, expect } from "vitest";
+import {
+  decodeBundleColumnar,
+  decodeBundleText,
+  decodePoseBundle,
+  encodeBundle,
+  PoseBundleError,
+} from "../ndjson";
+import { emptyLandmarks } from "../landmarks";
+import { LANDMARK_COUNT, type BundleHeader, type LandmarkFrame } from "../types";
+
+const HEADER: BundleHeader = {
+  schema: "ff-pose-33-v1",
+  landmarkCount: 33,
+  order: "blazepose33",
+  fps: 30,
+  frameCount: 3,
+  durationMs: 100,
+  view: "frontal",
+  attempt: 1,
+  capturedAt: "2026-08-05T14:03:11.220Z",
+  coordinateSpace: {
+    origin: "top-left",
+    normalized: true,
+    mirrored: false,
+    rotationDegrees: 0,
+    sourceWidth: 1920,
+    sourceHeight: 1080,
+  },
+  poseEngine: { name: "mediapipe-pose", version: "0.10.21", platform: "container" },
+};
+
+/**
+ * Os mesmos 3 frames, gerados pelo `write_columnar` do container a partir de
+ * valores m/10⁴ pela mesma fórmula de `frames()` abaixo. É o contrato entre o
+ * encoder Python e este decoder: se um dos lados mudar o layout, quebra aqui.
+ */
+const COLUMNAR_FIXTURE = [
+  "RkZQQwECAACJAQAAeyJzY2hlbWEiOiJmZi1wb3NlLTMzLXYxIiwibGFuZG1hcmtDb3VudCI6MzMsIm9yZGVyIjoi",
+  "YmxhemVwb3NlMzMiLCJmcHMiOjMwLCJmcmFtZUNvdW50IjozLCJkdXJhdGlvbk1zIjoxMDAsInZpZXciOiJmcm9u",
+  "dGFsIiwiYXR0ZW1wdCI6MSwiY2FwdHVyZWRBdCI6IjIwMjYtMDgtMDVUMTQ6MDM6MTEuMjIwWiIsImNvb3JkaW5h",
+  "dGVTcGFjZSI6eyJvcmlnaW4iOiJ0b3AtbGVmdCIsIm5vcm1hbGl6ZWQiOnRydWUsIm1pcnJvcmVkIjpmYWxzZSwi",
+  "cm90YXRpb25EZWdyZWVzIjowLCJzb3VyY2VXaWR0aCI6MTkyMCwic291cmNlSGVpZ2h0IjoxMDgwfSwicG9zZUVu",
+  "Z2luZSI6eyJuYW1lIjoibWVkaWFwaXBlLXBvc2UiLCJ2ZXJzaW9uIjoiMC4xMC4yMSIsInBsYXRmb3JtIjoiY29u",
+  "dGFpbmVyIn19AAAAACEAAABDAAAAiBNaGCwdeOwAAEj0AQDZ7JEBffQmADrtIgOy9EsAm+2zBOf0cAD87UQGHPWV",
+  "AF3u1QdR9boAvu5mCYb13wAf7/cKu/UEAYDviAzw9SkB4e8ZDiX2TgFC8KoPWvZzAaPwOxGP9pgBBPHMEsT2vQFl",
+  "8V0U+fbiAcbx7hUu9wcCJ/J/F2P3LAKI8hAZmPdRAunyoRrN93YCSvMyHAL4mwKr88MdN/jAAgz0VB9s+OUCbfTl",
+  "IKH4CgPO9HYi1vgvAy/1ByQL+VQDkPWYJUD5eQPx9SkndfmeA1L2uiiq+cMDs/ZLKt/56AMU99wrFPoNBHX3bS1J",
+  "+jIE1vceAH76VwQ3+K8Bs/p8BJj4QAPo+qEEw+0RAE/0JgAk7qIBhPRLAIXuMwO59HAA5u7EBO70lQBH71UGI/W6",
+  "AKjv5gdY9d8ACfB3CY31BAFq8AgLwvUpAcvwmQz39U4BLPEqDiz2cwGN8bsPYfaYAe7xTBGW9r0BT/LdEsv24gGw",
+  "8m4UAPcHAhHz/xU19ywCcvOQF2r3UQLT8yEZn/d2AjT0shrU95sClfRDHAn4wAL29NQdPvjlAlf1ZR9z+AoDuPX2",
+  "IKj4LwMZ9oci3fhUA3r2GCQS+XkD2/apJUf5ngM89zonfPnDA533yyix+egD/vdcKub5DQRf+O0rG/oyBMD4fi1Q",
+  "+lcEIfkvAIX6fASC+cABuvqhBOP5UQPv+sYEDu8iAFb0SwBv77MBi/RwANDvRAPA9JUAMfDVBPX0ugCS8GYGKvXf",
+  "APPw9wdf9QQBVPGICZT1KQG18RkLyfVOARbyqgz+9XMBd/I7DjP2mAHY8swPaPa9ATnzXRGd9uIBmvPuEtL2BwL7",
+  "838UB/csAlz0EBY891ECvfShF3H3dgIe9TIZpvebAn/1wxrb98AC4PVUHBD45QJB9uUdRfgKA6L2dh96+C8DA/cH",
+  "Ia/4VANk95gi5Ph5A8X3KSQZ+Z4DJvi6JU75wwOH+Esng/noA+j43Ci4+Q0ESfltKu35MgSq+f4rIvpXBAv6jy1X",
+  "+nwEbPpAAIz6oQTN+tEBwfrGBC77YgP2+usE",
+].join("");
+
+function frames(): LandmarkFrame[] {
+  return Array.from({ length: 3 }, (_, n) => {
+    const landmarks = emptyLandmarks();
+    for (let j = 0; j < LANDMARK_COUNT; j++) {
+      landmarks[j] = {
+        x: (((n * 331 + j * 97) % 20000) - 5000) / 1e4,
+        y: ((n * 17 + j * 401) % 12000) / 1e4,
+        z: (((n * 7 + j * 53) % 6000) - 3000) / 1e4,
+        score: (1 + (((n + j) * 37) % 9999)) / 1e4,
+      };
+    }
+    return {
+      frameIndex: n,
+      timeMs: Math.round((n * 1000) / 30),
+      landmarks,
+      confidence: (5000 + n * 1234) / 1e4,
+    };
+  });
+}
+
+function fixtureBytes(): Uint8Array {
+  return Uint8Array.from(atob(COLUMNAR_FIXTURE), (ch) => ch.charCodeAt(0));
+}
+
+describe("bundle colunar", () => {
+  it("devolve exatamente os números do NDJSON equivalente", () => {
+    const fromText = decodeBundleText(encodeBundle(HEADER, frames()));
+    const fromColumnar = decodeBundleColumnar(fixtureBytes());
+
+    expect(fromColumnar.header).toEqual(fromText.header);
+    expect(fromColumnar.frames).toEqual(fromText.frames);
+  });
+
+  it("é detectado pelo magic number em decodePoseBundle", async () => {
+    const decoded = await decodePoseBundle(fixtureBytes());
+    expect(decoded.frames).toHaveLength(3);
+    expect(decoded.frames[2].landmarks[5].x).toBe(frames()[2].landmarks[5].x);
+  });
+
+  it("rejeita arquivo truncado em vez de ler lixo", () => {
+    const bytes = fixtureBytes();
+    expect(() => decodeBundleColumnar(bytes.subarray(0, bytes.length - 2))).toThrow(PoseBundleError);
+  });
+});
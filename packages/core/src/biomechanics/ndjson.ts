@@ -63,15 +63,10 @@ export class PoseBundleError extends Error {
   }
 }
 
-export function decodeBundleText(text: string): { header: BundleHeader; frames: LandmarkFrame[] } {
-  const lines = text.split("\n").filter((line) => line.trim().length > 0);
-  if (lines.length === 0) {
-    throw new PoseBundleError("Bundle vazio.", "empty");
-  }
-
+function parseHeader(raw: string): BundleHeader {
   let header: BundleHeader;
   try {
-    header = JSON.parse(lines[0]) as BundleHeader;
+    header = JSON.parse(raw) as BundleHeader;
   } catch {
     throw new PoseBundleError("Cabeçalho do bundle ilegível.", "bad_header");
   }
@@ -90,6 +85,17 @@ export function decodeBundleText(text: string): { header: BundleHeader; frames:
     );
   }
 
+  return header;
+}
+
+export function decodeBundleText(text: string): { header: BundleHeader; frames: LandmarkFrame[] } {
+  const lines = text.split("\n").filter((line) => line.trim().length > 0);
+  if (lines.length === 0) {
+    throw new PoseBundleError("Bundle vazio.", "empty");
+  }
+
+  const header = parseHeader(lines[0]);
+
   const frames: LandmarkFrame[] = [];
 
   for (let n = 1; n < lines.length; n++) {
@@ -129,12 +135,105 @@ export function decodeBundleText(text: string): { header: BundleHeader; frames:
   return { header, frames };
 }
 
+// ─── Variante colunar ────────────────────────────────────────────────────────
+//
+// O mesmo `ff-pose-33-v1` em binário, emitido pelo container quando o job pede
+// `bundleFormat: "columnar"`. Layout (little-endian), definido em
+// `write_columnar` de `apps/api/containers/biomechanics-pose/server.py`:
+//
+//   "FFPC" | u8 versão | u8 bytes por coordenada (2|4) | u16 0 | u32 len
+//   | cabeçalho JSON | t: i32[n] | c: u16[n] | k: i16|i32[n·33·4]
+//
+// Valores são o quantizado × 10⁴. Dividir por 10⁴ devolve o mesmo double que o
+// JSON.parse do NDJSON daria — a matemática clínica vê números idênticos.
+
+const COLUMNAR_MAGIC = [0x46, 0x46, 0x50, 0x43]; // "FFPC"
+const COLUMNAR_VERSION = 1;
+const COLUMNAR_PREAMBLE = 12;
+
+function isColumnar(bytes: Uint8Array): boolean {
+  return bytes.length >= COLUMNAR_PREAMBLE && COLUMNAR_MAGIC.every((b, i) => bytes[i] === b);
+}
+
+export function decodeBundleColumnar(bytes: Uint8Array): {
+  header: BundleHeader;
+  frames: LandmarkFrame[];
+} {
+  if (!isColumnar(bytes)) {
+    throw new PoseBundleError("Não é um bundle colunar.", "bad_header");
+  }
+
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  const version = view.getUint8(4);
+  const width = view.getUint8(5);
+  const headerLength = view.getUint32(8, true);
+  if (version !== COLUMNAR_VERSION || (width !== 2 && width !== 4)) {
+    throw new PoseBundleError(
+      `Bundle colunar v${version} com largura ${width} não suportado.`,
+      "bad_header",
+    );
+  }
+
+  const header = parseHeader(
+    new TextDecoder().decode(
+      bytes.subarray(COLUMNAR_PREAMBLE, COLUMNAR_PREAMBLE + headerLength),
+    ),
+  );
+
+  const count = header.frameCount;
+  const stride = LANDMARK_COUNT * 4;
+  const timesAt = COLUMNAR_PREAMBLE + headerLength;
+  const confidenceAt = timesAt + 4 * count;
+  const pointsAt = confidenceAt + 2 * count;
+  if (!Number.isInteger(count) || pointsAt + width * stride * count !== bytes.byteLength) {
+    throw new PoseBundleError(
+      `Bundle colunar com tamanho inconsistente para ${count} frames.`,
+      "bad_frame",
+    );
+  }
+
+  const read =
+    width === 2
+      ? (offset: number) => view.getInt16(offset, true)
+      : (offset: number) => view.getInt32(offset, true);
+
+  const frames: LandmarkFrame[] = [];
+  for (let n = 0; n < count; n++) {
+    const landmarks: Landmark[] = emptyLandmarks();
+    const frameAt = pointsAt + n * stride * width;
+    for (let j = 0; j < LANDMARK_COUNT; j++) {
+      const base = frameAt + j * 4 * width;
+      landmarks[j] = {
+        x: read(base) / 1e4,
+        y: read(base + width) / 1e4,
+        z: read(base + 2 * width) / 1e4,
+        score: read(base + 3 * width) / 1e4,
+      };
+    }
+
+    frames.push({
+      frameIndex: n,
+      timeMs: view.getInt32(timesAt + 4 * n, true),
+      landmarks,
+      confidence: view.getUint16(confidenceAt + 2 * n, true) / 1e4,
+    });
+  }
+
+  return { header, frames };
+}
+
 function isGzip(bytes: Uint8Array): boolean {
   return bytes.length > 2 && bytes[0] === 0x1f && bytes[1] === 0x8b;
 }
 
+function decodeUncompressed(bytes: Uint8Array): { header: BundleHeader; frames: LandmarkFrame[] } {
+  return isColumnar(bytes)
+    ? decodeBundleColumnar(bytes)
+    : decodeBundleText(new TextDecoder().decode(bytes));
+}
+
 /**
- * Aceita NDJSON cru ou gzip — detecta pelo magic number.
+ * Aceita NDJSON ou colunar, crus ou em gzip — detecta pelo magic number.
  * Usa `DecompressionStream`, disponível em Workers e em RN moderno; quem não
  * tiver deve descomprimir antes e chamar `decodeBundleText`.
  */
@@ -142,7 +241,7 @@ export async function decodePoseBundle(
   bytes: Uint8Array,
 ): Promise<{ header: BundleHeader; frames: LandmarkFrame[] }> {
   if (!isGzip(bytes)) {
-    return decodeBundleText(new TextDecoder().decode(bytes));
+    return decodeUncompressed(bytes);
   }
 
   if (typeof DecompressionStream === "undefined") {
@@ -155,6 +254,5 @@ export async function decodePoseBundle(
   const stream = new Blob([bytes as unknown as BlobPart])
     .stream()
     .pipeThrough(new DecompressionStream("gzip"));
-  const text = await new Response(stream).text();
-  return decodeBundleText(text);
+  return decodeUncompressed(new Uint8Array(await new Response(stream).arrayBuffer()));
 }
@@ -95,6 +95,12 @@ export interface PoseEngineInfo {
   platform?: string;
   mode?: string;
   modelVariant?: string;
+  /**
+   * "person" quando o modelo recebeu um recorte em volta da pessoa em vez do
+   * quadro inteiro. As coordenadas continuam no quadro inteiro, mas os
+   * valores não são idênticos aos do modo sem recorte.
+   */
+  inputCrop?: string;
 }
 
 export interface BundleHeader {
@@ -114,6 +120,11 @@ export interface BundleHeader {
   calibration?: Record<string, unknown>;
   protocolSlug?: string;
   truncated?: boolean;
+  /**
+   * Trecho do vídeo original que o bundle cobre, quando a extração foi
+   * restrita a ele. Os `t` dos quadros contam do início do trecho.
+   */
+  sourceRange?: { startMs: number; endMs: number };
 }
 
 export type MetricProvenance =